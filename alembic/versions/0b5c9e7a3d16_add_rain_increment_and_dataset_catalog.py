@@ -0,0 +1,34 @@
+"""add rain increment and dataset catalog
+
+Revision ID: 0b5c9e7a3d16
+Revises: 6e1b8d4f2a95
+Create Date: 2026-10-19 19:21:47.630158
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b5c9e7a3d16'
+down_revision: Union[str, None] = '6e1b8d4f2a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('dataset_catalog',
+    sa.Column('dataset_id', sa.String(), nullable=False),
+    sa.Column('rain_mode', sa.String(), nullable=True),
+    sa.Column('last_modified', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('dataset_id')
+    )
+    # Existing readings keep NULL increments, the analysis decodes their rain on the fly
+    op.add_column('dataset', sa.Column('rain_increment', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('dataset', 'rain_increment')
+    op.drop_table('dataset_catalog')
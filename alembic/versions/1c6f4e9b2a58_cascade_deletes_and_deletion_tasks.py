@@ -0,0 +1,58 @@
+"""cascade deletes and deletion tasks
+
+Revision ID: 1c6f4e9b2a58
+Revises: d5e8a1b4c7f2
+Create Date: 2026-10-19 22:31:07.640218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c6f4e9b2a58'
+down_revision: Union[str, None] = 'd5e8a1b4c7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_dataset_dataset_id_date', 'dataset', ['dataset_id', 'date'], unique=False)
+    op.create_index('ix_eto_location_id_date', 'eto', ['location_id', 'date'], unique=False)
+
+    # SQLite databases are created from the models, which already declare the cascade
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('eto_location_id_fkey', 'eto', type_='foreignkey')
+        op.create_foreign_key(
+            'eto_location_id_fkey', 'eto', 'location', ['location_id'], ['id'], ondelete='CASCADE'
+        )
+
+    op.create_table('deletion_task',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('target', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('total_rows', sa.Integer(), nullable=False),
+    sa.Column('deleted_rows', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deletion_task_kind_target', 'deletion_task', ['kind', 'target'], unique=False)
+    op.create_index(op.f('ix_deletion_task_status'), 'deletion_task', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_deletion_task_status'), table_name='deletion_task')
+    op.drop_index('ix_deletion_task_kind_target', table_name='deletion_task')
+    op.drop_table('deletion_task')
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_constraint('eto_location_id_fkey', 'eto', type_='foreignkey')
+        op.create_foreign_key('eto_location_id_fkey', 'eto', 'location', ['location_id'], ['id'])
+
+    op.drop_index('ix_eto_location_id_date', table_name='eto')
+    op.drop_index('ix_dataset_dataset_id_date', table_name='dataset')
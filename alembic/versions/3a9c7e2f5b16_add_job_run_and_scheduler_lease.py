@@ -0,0 +1,46 @@
+"""job runs and scheduler lease
+
+Revision ID: 3a9c7e2f5b16
+Revises: 7b3e5d9a2c41
+Create Date: 2026-10-19 23:48:19.502733
+
+The apscheduler_jobs table of the persistent job store is created by APScheduler itself.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9c7e2f5b16'
+down_revision: Union[str, None] = '7b3e5d9a2c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('job_run',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.String(), nullable=False),
+    sa.Column('worker', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('duration_s', sa.Float(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_run_job_id_started_at', 'job_run', ['job_id', 'started_at'], unique=False)
+    op.create_table('scheduler_lease',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('holder', sa.String(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scheduler_lease')
+    op.drop_index('ix_job_run_job_id_started_at', table_name='job_run')
+    op.drop_table('job_run')
@@ -0,0 +1,50 @@
+"""add location grid cell
+
+Revision ID: 3f9a1c2d7b40
+Revises: 7c78a3ccee81
+Create Date: 2026-10-19 10:12:44.318207
+
+"""
+import math
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c2d7b40'
+down_revision: Union[str, None] = '7c78a3ccee81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Default WEATHER_GRID_RESOLUTION_DEG, the nightly job re-keys locations if the setting differs
+GRID_RESOLUTION = 0.1
+
+
+def upgrade() -> None:
+    op.add_column('location', sa.Column('grid_cell', sa.String(), nullable=True))
+    op.create_index(op.f('ix_location_grid_cell'), 'location', ['grid_cell'], unique=False)
+
+    location = sa.table(
+        'location',
+        sa.column('id', sa.Integer),
+        sa.column('latitude', sa.Float),
+        sa.column('longitude', sa.Float),
+        sa.column('grid_cell', sa.String),
+    )
+
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(location.c.id, location.c.latitude, location.c.longitude)).all()
+    for row in rows:
+        key = "{:g}:{}:{}".format(
+            GRID_RESOLUTION,
+            math.floor(round(row.latitude / GRID_RESOLUTION, 9)),
+            math.floor(round(row.longitude / GRID_RESOLUTION, 9))
+        )
+        conn.execute(location.update().where(location.c.id == row.id).values(grid_cell=key))
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_location_grid_cell'), table_name='location')
+    op.drop_column('location', 'grid_cell')
@@ -0,0 +1,88 @@
+"""add water balance
+
+Revision ID: 5b7c0e3a9d21
+Revises: 9d2e4b6a1f83
+Create Date: 2026-10-19 13:41:05.227381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7c0e3a9d21'
+down_revision: Union[str, None] = '9d2e4b6a1f83'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# FAO-56 rooting depth (m) and depletion fraction of the seeded crops
+CROP_ROOTING = {
+    "potato": (0.5, 0.35),
+    "sugar_beet": (1.0, 0.55),
+}
+
+
+def upgrade() -> None:
+    op.add_column('eto', sa.Column('precipitation', sa.Float(), nullable=True))
+
+    op.add_column('crop_kc', sa.Column('root_depth_m', sa.Float(), nullable=True))
+    op.add_column('crop_kc', sa.Column('depletion_fraction', sa.Float(), nullable=True))
+
+    crop_kc = sa.table(
+        'crop_kc',
+        sa.column('crop', sa.String),
+        sa.column('root_depth_m', sa.Float),
+        sa.column('depletion_fraction', sa.Float),
+    )
+    for crop, (root_depth_m, depletion_fraction) in CROP_ROOTING.items():
+        op.execute(
+            crop_kc.update()
+            .where(crop_kc.c.crop == crop)
+            .values(root_depth_m=root_depth_m, depletion_fraction=depletion_fraction)
+        )
+
+    op.add_column('location', sa.Column('soil_type', sa.String(), nullable=True))
+    op.add_column('location', sa.Column('crop', sa.String(), nullable=True))
+    op.add_column('location', sa.Column('crop_stage', sa.String(), nullable=True))
+    op.create_foreign_key(
+        'location_soil_type_fkey', 'location', 'soil_type_values', ['soil_type'], ['soil_type']
+    )
+    op.create_foreign_key('location_crop_fkey', 'location', 'crop_kc', ['crop'], ['crop'])
+
+    op.create_table('water_balance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('eto', sa.Float(), nullable=True),
+    sa.Column('precipitation', sa.Float(), nullable=True),
+    sa.Column('kc', sa.Float(), nullable=False),
+    sa.Column('ks', sa.Float(), nullable=False),
+    sa.Column('etc_adj', sa.Float(), nullable=True),
+    sa.Column('depletion_mm', sa.Float(), nullable=False),
+    sa.Column('taw_mm', sa.Float(), nullable=False),
+    sa.Column('raw_mm', sa.Float(), nullable=False),
+    sa.Column('irrigation_mm', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['location.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id'),
+    sa.UniqueConstraint('location_id', 'date')
+    )
+    op.create_index(op.f('ix_water_balance_location_id'), 'water_balance', ['location_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_water_balance_location_id'), table_name='water_balance')
+    op.drop_table('water_balance')
+
+    op.drop_constraint('location_crop_fkey', 'location', type_='foreignkey')
+    op.drop_constraint('location_soil_type_fkey', 'location', type_='foreignkey')
+    op.drop_column('location', 'crop_stage')
+    op.drop_column('location', 'crop')
+    op.drop_column('location', 'soil_type')
+
+    op.drop_column('crop_kc', 'depletion_fraction')
+    op.drop_column('crop_kc', 'root_depth_m')
+
+    op.drop_column('eto', 'precipitation')
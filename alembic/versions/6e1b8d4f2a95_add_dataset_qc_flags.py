@@ -0,0 +1,27 @@
+"""add dataset qc flags
+
+Revision ID: 6e1b8d4f2a95
+Revises: a7d3f1c9e5b2
+Create Date: 2026-10-19 18:58:03.116472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1b8d4f2a95'
+down_revision: Union[str, None] = 'a7d3f1c9e5b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing readings keep NULL flags, the analysis checks them on the fly
+    op.add_column('dataset', sa.Column('qc_flags', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('dataset', 'qc_flags')
@@ -0,0 +1,32 @@
+"""gatekeeper route registrations
+
+Revision ID: 7b3e5d9a2c41
+Revises: 1c6f4e9b2a58
+Create Date: 2026-10-19 23:05:52.118406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3e5d9a2c41'
+down_revision: Union[str, None] = '1c6f4e9b2a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('gatekeeper_route',
+    sa.Column('route_hash', sa.String(), nullable=False),
+    sa.Column('endpoint', sa.String(), nullable=False),
+    sa.Column('methods', sa.String(), nullable=False),
+    sa.Column('registered_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('route_hash')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('gatekeeper_route')
@@ -0,0 +1,90 @@
+"""extend dataset catalog
+
+Revision ID: 8f4a2c6e1d39
+Revises: 0b5c9e7a3d16
+Create Date: 2026-10-19 19:52:26.904517
+
+"""
+import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f4a2c6e1d39'
+down_revision: Union[str, None] = '0b5c9e7a3d16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DEPTHS = (10, 20, 30, 40, 50, 60)
+
+
+def upgrade() -> None:
+    op.add_column('dataset_catalog', sa.Column('row_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('dataset_catalog', sa.Column('first_date', sa.Date(), nullable=True))
+    op.add_column('dataset_catalog', sa.Column('last_date', sa.Date(), nullable=True))
+    op.add_column('dataset_catalog', sa.Column('active_depths', sa.JSON(), nullable=True))
+    op.add_column('dataset_catalog', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.create_index(op.f('ix_dataset_catalog_last_modified'), 'dataset_catalog', ['last_modified'], unique=False)
+
+    # Catalog entries of every stored dataset, computed once from the readings
+    dataset = sa.table(
+        'dataset',
+        sa.column('dataset_id', sa.String),
+        sa.column('date', sa.Date),
+        *[sa.column('soil_moisture_{}'.format(d), sa.Float) for d in DEPTHS]
+    )
+    catalog = sa.table(
+        'dataset_catalog',
+        sa.column('dataset_id', sa.String),
+        sa.column('row_count', sa.Integer),
+        sa.column('first_date', sa.Date),
+        sa.column('last_date', sa.Date),
+        sa.column('active_depths', sa.JSON),
+        sa.column('rain_mode', sa.String),
+        sa.column('version', sa.Integer),
+        sa.column('last_modified', sa.DateTime),
+    )
+
+    bind = op.get_bind()
+    rain_modes = dict(bind.execute(sa.select(catalog.c.dataset_id, catalog.c.rain_mode)).all())
+    depth_columns = [dataset.c['soil_moisture_{}'.format(d)] for d in DEPTHS]
+    rows = bind.execute(
+        sa.select(
+            dataset.c.dataset_id,
+            sa.func.count(),
+            sa.func.min(dataset.c.date),
+            sa.func.max(dataset.c.date),
+            *[sa.func.max(sa.case((sa.and_(c.isnot(None), c != 0), 1), else_=0)) for c in depth_columns]
+        )
+        .where(dataset.c.dataset_id.isnot(None))
+        .group_by(dataset.c.dataset_id)
+    ).all()
+
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    op.execute(catalog.delete())
+    if rows:
+        op.bulk_insert(catalog, [
+            {
+                'dataset_id': row[0],
+                'row_count': row[1],
+                'first_date': row[2],
+                'last_date': row[3],
+                'active_depths': [d for d, active in zip(DEPTHS, row[4:]) if active],
+                'rain_mode': rain_modes.get(row[0]),
+                'version': 1,
+                'last_modified': now,
+            }
+            for row in rows
+        ])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_dataset_catalog_last_modified'), table_name='dataset_catalog')
+    op.drop_column('dataset_catalog', 'version')
+    op.drop_column('dataset_catalog', 'active_depths')
+    op.drop_column('dataset_catalog', 'last_date')
+    op.drop_column('dataset_catalog', 'first_date')
+    op.drop_column('dataset_catalog', 'row_count')
@@ -0,0 +1,34 @@
+"""add location elevation and elevation tile cache
+
+Revision ID: 9d2e4b6a1f83
+Revises: 3f9a1c2d7b40
+Create Date: 2026-10-19 11:02:17.604512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2e4b6a1f83'
+down_revision: Union[str, None] = '3f9a1c2d7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('elevation_tile',
+    sa.Column('tile', sa.String(), nullable=False),
+    sa.Column('elevation', sa.Float(), nullable=True),
+    sa.Column('dataset', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('tile'),
+    sa.UniqueConstraint('tile')
+    )
+    op.add_column('location', sa.Column('elevation', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('location', 'elevation')
+    op.drop_table('elevation_tile')
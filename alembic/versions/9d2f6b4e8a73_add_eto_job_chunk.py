@@ -0,0 +1,47 @@
+"""eto job chunk checkpoints
+
+Revision ID: 9d2f6b4e8a73
+Revises: 3a9c7e2f5b16
+Create Date: 2026-10-20 00:26:41.870415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2f6b4e8a73'
+down_revision: Union[str, None] = '3a9c7e2f5b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('eto_job_chunk',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('chunk', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('location_ids', sa.JSON(), nullable=False),
+    sa.Column('failed_location_ids', sa.JSON(), nullable=True),
+    sa.Column('locations', sa.Integer(), nullable=False),
+    sa.Column('stored', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('duration_s', sa.Float(), nullable=True),
+    sa.Column('error', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['job_run.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_id', 'chunk')
+    )
+    op.create_index(op.f('ix_eto_job_chunk_status'), 'eto_job_chunk', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_eto_job_chunk_status'), table_name='eto_job_chunk')
+    op.drop_table('eto_job_chunk')
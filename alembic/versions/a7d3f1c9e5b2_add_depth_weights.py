@@ -0,0 +1,32 @@
+"""add depth weights
+
+Revision ID: a7d3f1c9e5b2
+Revises: e2f9b3c6d814
+Create Date: 2026-10-19 17:35:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3f1c9e5b2'
+down_revision: Union[str, None] = 'e2f9b3c6d814'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('depth_weights',
+    sa.Column('profile', sa.String(), nullable=False),
+    sa.Column('weights', sa.JSON(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('profile')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('depth_weights')
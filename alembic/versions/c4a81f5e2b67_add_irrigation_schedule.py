@@ -0,0 +1,37 @@
+"""add irrigation schedule
+
+Revision ID: c4a81f5e2b67
+Revises: 5b7c0e3a9d21
+Create Date: 2026-10-19 15:20:48.913024
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a81f5e2b67'
+down_revision: Union[str, None] = '5b7c0e3a9d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('irrigation_schedule',
+    sa.Column('location_id', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.Column('state_date', sa.Date(), nullable=False),
+    sa.Column('depletion_mm', sa.Float(), nullable=False),
+    sa.Column('raw_mm', sa.Float(), nullable=False),
+    sa.Column('next_irrigation_date', sa.Date(), nullable=True),
+    sa.Column('dose_mm', sa.Float(), nullable=True),
+    sa.Column('forecast_until', sa.Date(), nullable=False),
+    sa.ForeignKeyConstraint(['location_id'], ['location.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('location_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('irrigation_schedule')
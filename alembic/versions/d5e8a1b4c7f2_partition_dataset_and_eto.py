@@ -0,0 +1,48 @@
+"""partition dataset and eto by month
+
+Revision ID: d5e8a1b4c7f2
+Revises: 8f4a2c6e1d39
+Create Date: 2026-10-19 21:12:40.318204
+
+Only applied on PostgreSQL with PARTITIONED_STORAGE enabled, otherwise a no-op. An existing database is switched
+later with `python -m cli convert-storage --partitioned` (or `--plain`), not by downgrading past this revision.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+from sqlalchemy.orm import Session
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e8a1b4c7f2'
+down_revision: Union[str, None] = '8f4a2c6e1d39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # env.py puts app/ on the path, a module level import would break the commands that only read the scripts
+    from core.config import settings
+    from utils.partitions import PARTITIONED_TABLES, convert_table, is_partitioned
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql' or not settings.PARTITIONED_STORAGE:
+        return
+
+    db = Session(bind=bind)
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(db, table):
+            convert_table(db, table, partitioned=True, premake_months=settings.PARTITION_PREMAKE_MONTHS)
+
+
+def downgrade() -> None:
+    from utils.partitions import PARTITIONED_TABLES, convert_table, is_partitioned
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return
+
+    db = Session(bind=bind)
+    for table in PARTITIONED_TABLES:
+        if is_partitioned(db, table):
+            convert_table(db, table, partitioned=False)
@@ -0,0 +1,53 @@
+"""add crop calendar
+
+Revision ID: e2f9b3c6d814
+Revises: c4a81f5e2b67
+Create Date: 2026-10-19 16:48:31.502779
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f9b3c6d814'
+down_revision: Union[str, None] = 'c4a81f5e2b67'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# FAO-56 stage lengths (initial, development, mid-season, late-season days) of the seeded crops
+CROP_STAGE_LENGTHS = {
+    "potato": (25, 30, 45, 30),
+    "sugar_beet": (50, 40, 50, 40),
+}
+
+
+def upgrade() -> None:
+    for column in ('l_ini', 'l_dev', 'l_mid', 'l_late'):
+        op.add_column('crop_kc', sa.Column(column, sa.Integer(), nullable=True))
+
+    crop_kc = sa.table(
+        'crop_kc',
+        sa.column('crop', sa.String),
+        sa.column('l_ini', sa.Integer),
+        sa.column('l_dev', sa.Integer),
+        sa.column('l_mid', sa.Integer),
+        sa.column('l_late', sa.Integer),
+    )
+    for crop, (l_ini, l_dev, l_mid, l_late) in CROP_STAGE_LENGTHS.items():
+        op.execute(
+            crop_kc.update()
+            .where(crop_kc.c.crop == crop)
+            .values(l_ini=l_ini, l_dev=l_dev, l_mid=l_mid, l_late=l_late)
+        )
+
+    op.add_column('location', sa.Column('planting_date', sa.Date(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('location', 'planting_date')
+
+    for column in ('l_late', 'l_mid', 'l_dev', 'l_ini'):
+        op.drop_column('crop_kc', column)
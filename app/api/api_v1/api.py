@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import login, user, eto, location, dataset
+from .endpoints import login, user, eto, location, dataset, water_balance
 
 api_router = APIRouter()
 api_router.include_router(login.router, prefix="/login", tags=["login"])
@@ -7,3 +7,4 @@ api_router.include_router(user.router, prefix="/user", tags=["user"])
 api_router.include_router(eto.router, prefix="/eto", tags=["eto"])
 api_router.include_router(location.router, prefix="/location", tags=["location"])
 api_router.include_router(dataset.router, prefix="/dataset", tags=["dataset"])
+api_router.include_router(water_balance.router, prefix="/water-balance", tags=["water-balance"])
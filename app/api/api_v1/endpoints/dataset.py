@@ -1,10 +1,14 @@
 import datetime
+import tempfile
 
-from typing import List, Literal, Optional
+from typing import List, Literal, Optional, Tuple, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from api import deps
 from models import User, Dataset, SoilTypeValues
@@ -12,25 +16,82 @@ from schemas import Dataset as DatasetScheme
 from schemas import WeightScheme
 from schemas import Message
 from schemas import IrrigationDatapoints, SoilTypes
-from crud import dataset as crud_dataset
+from schemas import DatasetCatalogEntry, DatasetCatalogList, DeletionTaskDB
+from crud import dataset_async as crud_dataset
+from crud import depth_weights_async as crud_weights
+from crud import deletion_task_async as crud_deletion_task
 from api.deps import get_jwt
+from api.http_cache import make_etag, not_modified, set_cache_headers
 
 from utils import calculate_soil_analysis_metrics, calculate_irrigation_datapoints
 
-from utils import jsonld_get_dataset, jsonld_analyse_soil_moisture
+from utils import jsonld_get_dataset, jsonld_analyse_soil_moisture, run_profiled, DEFAULT_WEIGHTS_PROFILE
+from utils import WeightsSnapshot
+from utils import ingest_readings, readings_frame, normalize_readings_frame
+from utils import DELETION_DATASET
+from utils import EXPORT_MEDIA_TYPES, DATASET_EXPORT_COLUMNS, export_columns, stream_export, read_parquet_batches
 
+from db.session import SessionLocal
 from core.config import settings
+from jobs.background_tasks import run_deletion_tasks
 
 
 router = APIRouter()
 
 
+def _jsonld_dataset_response(db_dataset: list, compact: bool) -> JSONResponse:
+    # The document holds JSON types only, so it is serialized directly, off the event loop, without jsonable_encoder
+    return JSONResponse(jsonld_get_dataset(db_dataset, compact))
+
+
+async def _analysis_inputs(
+        request: Request,
+        response: Response,
+        db: AsyncSession,
+        dataset_id: str,
+        soil: Optional[SoilTypes],
+        profile_mode: Optional[str]
+) -> Tuple[Optional[float], Optional[float], WeightsSnapshot, Optional[Response]]:
+    """
+    Soil values and weights an analysis of the dataset runs with, and the 304 to answer with when the client's
+    result is still current. Derived results carry no Last-Modified, a change of weights or settings has no
+    timestamp of the dataset.
+    """
+
+    entry = await crud_dataset.get_catalog_entry(db, dataset_id)
+
+    field_capacity = None
+    wilting_point = None
+    if soil:
+        query_row = await db.get(SoilTypeValues, soil.value)
+        if query_row is None:
+            raise HTTPException(status_code=404, detail="Soil type not found")
+
+        field_capacity = query_row.field_capacity
+        wilting_point = query_row.wilting_point
+
+    weights = await crud_weights.get_snapshot(db, dataset_id)
+
+    # Profiled requests always run the analysis
+    cached = None
+    if entry is not None and not profile_mode:
+        etag = make_etag(
+            request, entry.version, entry.last_modified, weights.profile, weights.version, field_capacity, wilting_point
+        )
+        cached = not_modified(request, response, etag)
+
+    return field_capacity, wilting_point, weights, cached
+
+
 @router.post("/weights/", response_model=Message, dependencies=[Depends(deps.get_jwt)])
 async def set_weights(
-        weight_scheme: WeightScheme
+        weight_scheme: WeightScheme,
+        db: AsyncSession = Depends(deps.get_async_db),
+        dataset_id: Optional[str] = None
 ):
     """
-    Sets the weights for soil analysis.
+    Sets the weights for soil analysis, of the dataset when dataset_id is given, otherwise the default weights
+    used by every dataset without its own.
     """
 
     new_weights = {
@@ -42,8 +103,7 @@ async def set_weights(
         60: weight_scheme.val_60,
     }
 
-    settings.GLOBAL_WEIGHTS.clear()
-    settings.GLOBAL_WEIGHTS.update(new_weights)
+    await crud_weights.set_profile(db, dataset_id or DEFAULT_WEIGHTS_PROFILE, new_weights)
 
     msg = Message(message="Successfully uploaded weights per depths")
 
@@ -51,80 +111,255 @@ async def set_weights(
 
 @router.get("/weights/", response_model=WeightScheme, dependencies=[Depends(deps.get_jwt)])
 async def get_weights(
-
+        db: AsyncSession = Depends(deps.get_async_db),
+        dataset_id: Optional[str] = None
 ) -> WeightScheme:
     """
-    Gets the weights for soil analysis
+    Gets the weights for soil analysis, with dataset_id the ones its analysis runs with
     """
 
-    weights_for_response = {str(k): v for k, v in settings.GLOBAL_WEIGHTS.items()}
+    snapshot = await crud_weights.get_snapshot(db, dataset_id)
+
+    weights_for_response = {str(k): v for k, v in snapshot.weights.items()}
 
     response_value = WeightScheme.model_validate(weights_for_response)
 
     return response_value
 
 
+@router.delete("/weights/{dataset_id}/", response_model=Message, dependencies=[Depends(deps.get_jwt)])
+async def remove_weights(
+        dataset_id: str,
+        db: AsyncSession = Depends(deps.get_async_db)
+):
+    """
+    Removes the weights of a dataset, its analysis falls back to the default weights.
+    """
+
+    deleted = await crud_weights.delete_profile(db, dataset_id)
+
+    if deleted == 0:
+        raise HTTPException(status_code=404, detail="No weights for given dataset id")
+
+    return Message(message="Successfully deleted weights")
+
+
 @router.get("/", dependencies=[Depends(deps.get_jwt)])
-def get_all_datasets_ids(
-        db: Session = Depends(deps.get_db)
+async def get_all_datasets_ids(
+        db: AsyncSession = Depends(deps.get_async_db),
+        skip: int = Query(default=0, ge=0),
+        limit: int = Query(default=10000, gt=0, le=10000)
 ) -> list[str]:
-    db_ids = crud_dataset.get_all_datasets(db)
-    ids = [row.dataset_id for row in db_ids.all()]
-    return ids
+    return await crud_dataset.get_all_datasets(db, skip=skip, limit=limit)
+
+
+@router.get("/catalog/", response_model=DatasetCatalogList, dependencies=[Depends(deps.get_jwt)])
+async def get_dataset_catalog(
+        db: AsyncSession = Depends(deps.get_async_db),
+        skip: int = Query(default=0, ge=0),
+        limit: int = Query(default=100, gt=0, le=1000),
+        search: Optional[str] = None,
+        rain_mode: Optional[Literal["cumulative", "incremental"]] = None,
+        modified_since: Optional[datetime.datetime] = None,
+        from_date: Optional[datetime.date] = None,
+        to_date: Optional[datetime.date] = None
+):
+    """
+    Datasets with their row count, time span, depths with readings, rain mode and last modification, ordered by id.
+
+    search matches part of the dataset id, from_date/to_date keep the datasets with readings in that interval.
+    """
+
+    total, entries = await crud_dataset.get_catalog(
+        db, skip=skip, limit=limit, search=search, rain_mode=rain_mode, modified_since=modified_since,
+        from_date=from_date, to_date=to_date
+    )
+
+    return DatasetCatalogList(
+        total=total,
+        change_token=await crud_dataset.get_change_token(db),
+        datasets=[DatasetCatalogEntry.model_validate(e) for e in entries]
+    )
+
+
+@router.get("/{dataset_id}/catalog/", response_model=DatasetCatalogEntry, dependencies=[Depends(deps.get_jwt)])
+async def get_dataset_catalog_entry(
+        dataset_id: str,
+        db: AsyncSession = Depends(deps.get_async_db)
+):
+    entry = await crud_dataset.get_catalog_entry(db, dataset_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No datasets with that id")
+
+    return entry
 
 
 @router.post("/", dependencies=[Depends(deps.get_jwt)], response_model=Message)
-def upload_dataset(
+async def upload_dataset(
         dataset: list[DatasetScheme],
-        db: Session = Depends(deps.get_db)
+        db: AsyncSession = Depends(deps.get_async_db)
 ):
     try:
-        for data in dataset:
-            crud_dataset.add_dataset(db, data) # Can be faster!
+        await ingest_readings(db, readings_frame(dataset))
     except:
         raise HTTPException(status_code=400, detail="Could not upload dataset")
 
     return Message(message="Successfully uploaded")
 
 
+@router.get("/export/", dependencies=[Depends(deps.get_jwt)])
+def export_datasets(
+        dataset_id: Optional[List[str]] = Query(default=None),
+        from_date: Optional[datetime.date] = None,
+        to_date: Optional[datetime.date] = None,
+        columns: Optional[str] = None,
+        export_format: Literal["parquet", "arrow"] = Query(default="parquet", alias="format")
+):
+    """
+    Streams the readings as Parquet or an Arrow IPC stream, of the given datasets (all when none) within the
+    interval. columns is a comma separated projection, e.g. "dataset_id,date,soil_moisture_10,rain_increment".
+    """
+
+    try:
+        projection = export_columns(columns, DATASET_EXPORT_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    conditions = []
+    if dataset_id:
+        conditions.append(Dataset.dataset_id.in_(dataset_id))
+    if from_date:
+        conditions.append(Dataset.date >= from_date)
+    if to_date:
+        conditions.append(Dataset.date <= to_date)
+
+    return StreamingResponse(
+        stream_export(SessionLocal(), Dataset, projection, DATASET_EXPORT_COLUMNS, conditions, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": 'attachment; filename="datasets.{}"'.format(export_format)}
+    )
+
+
+@router.post("/import/", dependencies=[Depends(deps.get_jwt)], response_model=Message)
+async def import_datasets(
+        request: Request,
+        db: AsyncSession = Depends(deps.get_async_db)
+):
+    """
+    Imports a Parquet file sent as the request body, with the columns of the dataset upload. The readings go through
+    the same ingestion as uploads (quality control, rain decoding, catalog), IMPORT_BATCH_ROWS rows per transaction.
+    """
+
+    imported = 0
+    # Parquet needs random access, the body is spooled to disk above SpooledTemporaryFile's limit
+    with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as body:
+        async for chunk in request.stream():
+            body.write(chunk)
+        body.seek(0)
+
+        try:
+            batches = await run_in_threadpool(read_parquet_batches, body)
+            while (batch := await run_in_threadpool(next, batches, None)) is not None:
+                imported += await ingest_readings(db, normalize_readings_frame(batch))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail="{} ({} readings imported)".format(e, imported))
+        except Exception:
+            raise HTTPException(
+                status_code=400, detail="Could not import dataset ({} readings imported)".format(imported)
+            )
+
+    return Message(message="Successfully imported {} readings".format(imported))
+
+
 @router.get("/soil-types/", response_model=List[str], dependencies=[Depends(deps.get_jwt)])
-def get_soil_types(
-        db: Session = Depends(deps.get_db)
+async def get_soil_types(
+        db: AsyncSession = Depends(deps.get_async_db)
 ):
     """
     Returns a list of all available soil types (e.g., ['sand', 'loam', ...])
     Used to populate dropdowns in the frontend.
     """
 
-    soil_types = db.query(SoilTypeValues.soil_type).all()
+    soil_types = await db.execute(select(SoilTypeValues.soil_type))
 
-    return [row[0] for row in soil_types]
+    return list(soil_types.scalars().all())
 
 
 @router.get("/{dataset_id}/", dependencies=[Depends(deps.get_jwt)])
 async def get_dataset(
         dataset_id: str,
-        db: Session = Depends(deps.get_db),
-        formatting: Literal["JSON", "JSON-LD"] = "JSON-LD"
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(deps.get_async_db),
+        formatting: Literal["JSON", "JSON-LD"] = "JSON-LD",
+        compact: bool = False
 ):
+    """
+    Readings of the dataset. Answers 304 to If-None-Match/If-Modified-Since while the dataset is unchanged.
+    """
+
+    # The catalog entry is read before the readings, so a tag never claims newer readings than it was sent with
+    entry = await crud_dataset.get_catalog_entry(db, dataset_id)
+    etag = None
+    if entry is not None:
+        etag = make_etag(request, entry.version, entry.last_modified)
+        cached = not_modified(request, response, etag, entry.last_modified)
+        if cached is not None:
+            return cached
 
-    db_dataset = crud_dataset.get_datasets(db, dataset_id)
+    db_dataset = await crud_dataset.get_datasets(db, dataset_id)
     if not db_dataset:
         raise HTTPException(status_code=404, detail="No datasets with that id")
 
     if formatting == "JSON":
         return db_dataset
 
-    return jsonld_get_dataset(db_dataset)
+    jsonld_response = await run_in_threadpool(_jsonld_dataset_response, db_dataset, compact)
+    if etag is not None:
+        set_cache_headers(jsonld_response, etag, entry.last_modified)
+
+    return jsonld_response
 
 
-@router.delete("/{dataset_id}/", dependencies=[Depends(deps.get_jwt)], response_model=Message)
-def remove_dataset(
+@router.get("/deletions/{task_id}/", response_model=DeletionTaskDB, dependencies=[Depends(deps.get_jwt)])
+async def get_dataset_deletion(
+        task_id: int,
+        db: AsyncSession = Depends(deps.get_async_db)
+):
+    """
+    Progress of the background deletion of a large dataset.
+    """
+
+    task = await crud_deletion_task.get_by_kind(db, task_id, DELETION_DATASET)
+    if task is None:
+        raise HTTPException(status_code=404, detail="No dataset deletion with that id")
+
+    return task
+
+
+@router.delete(
+    "/{dataset_id}/", dependencies=[Depends(deps.get_jwt)], response_model=Union[Message, DeletionTaskDB]
+)
+async def remove_dataset(
         dataset_id: str,
-        db: Session = Depends(deps.get_db)
+        response: Response,
+        background_tasks: BackgroundTasks,
+        db: AsyncSession = Depends(deps.get_async_db)
 ):
+    """
+    Deletes the readings of the dataset. Datasets of more than BULK_DELETE_BACKGROUND_ROWS readings are deleted by
+    a chunked background task, the response is then a 202 with the task, see /dataset/deletions/{task_id}/.
+    """
+
+    entry = await crud_dataset.get_catalog_entry(db, dataset_id)
+    if entry is not None and entry.row_count > settings.BULK_DELETE_BACKGROUND_ROWS:
+        task = await crud_deletion_task.schedule(db, DELETION_DATASET, dataset_id, entry.row_count)
+        background_tasks.add_task(run_deletion_tasks)
+        response.status_code = 202
+        return task
+
     try:
-        deleted = crud_dataset.delete_datasets(db, dataset_id)
+        deleted = await crud_dataset.delete_datasets(db, dataset_id)
     except:
         raise HTTPException(status_code=400, detail="Could not delete dataset")
 
@@ -135,63 +370,88 @@ def remove_dataset(
 
 
 @router.get("/{dataset_id}/analysis/", dependencies=[Depends(deps.get_jwt)])
-def analyse_soil_moisture(
+async def analyse_soil_moisture(
         dataset_id: str,
-        db: Session = Depends(deps.get_db),
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(deps.get_async_db),
         soil: Optional[SoilTypes] = None,
-        formatting: Literal["JSON", "JSON-LD"] = "JSON-LD"
+        formatting: Literal["JSON", "JSON-LD"] = "JSON-LD",
+        profile_mode: Optional[str] = Depends(deps.get_profile_mode)
 ):
-    dataset: list[Dataset] = crud_dataset.get_datasets(db, dataset_id)
+    """
+    Soil moisture analysis of a dataset.
+
+    With ?profile=timings (or the X-Debug-Profile header) the response becomes {"result": ..., "profile": ...}
+    with a per-stage timing breakdown. Answers 304 to If-None-Match while the dataset, its weights and the soil
+    values are unchanged, without running the analysis.
+    """
+    field_capacity, wilting_point, weights, cached = await _analysis_inputs(
+        request, response, db, dataset_id, soil, profile_mode
+    )
+    if cached is not None:
+        return cached
+
+    dataset: list[Dataset] = await crud_dataset.get_datasets(db, dataset_id)
     dataset = [DatasetScheme(**data_part.__dict__) for data_part in dataset]
 
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
 
-    field_capacity = None
-    wilting_point = None
-    if soil:
-        query_row = db.query(SoilTypeValues).filter(SoilTypeValues.soil_type == soil.value).first()
-        if query_row is None:
-            raise HTTPException(status_code=404, detail="Soil type not found")
-
-        field_capacity = query_row.field_capacity
-        wilting_point = query_row.wilting_point
-
+    # The analysis is CPU bound, keep it off the event loop
+    if profile_mode:
+        result, profile = await run_in_threadpool(
+            run_profiled, profile_mode, "analysis", calculate_soil_analysis_metrics,
+            dataset, field_capacity, wilting_point, weights.weights
+        )
+    else:
+        result = await run_in_threadpool(
+            calculate_soil_analysis_metrics, dataset, field_capacity, wilting_point, weights.weights
+        )
 
-    result = calculate_soil_analysis_metrics(dataset, field_capacity, wilting_point)
+    if formatting != "JSON":
+        result = jsonld_analyse_soil_moisture(result)
 
-    if formatting == "JSON":
-        return result
+    if profile_mode:
+        return {"result": result, "profile": profile}
 
-    return jsonld_analyse_soil_moisture(result)
+    return result
 
 
 @router.get("/{dataset_id}/irrigation-datapoints/", dependencies=[Depends(deps.get_jwt)])
-def get_irrigation_datapoints(
+async def get_irrigation_datapoints(
         dataset_id: str,
-        db: Session = Depends(deps.get_db),
-        soil: Optional[SoilTypes] = None
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(deps.get_async_db),
+        soil: Optional[SoilTypes] = None,
+        profile_mode: Optional[str] = Depends(deps.get_profile_mode)
 ):
     """
         Returns high dose irrigation datapoints for easier charts representation
     """
-    dataset: list[Dataset] = crud_dataset.get_datasets(db, dataset_id)
+    field_capacity, wilting_point, weights, cached = await _analysis_inputs(
+        request, response, db, dataset_id, soil, profile_mode
+    )
+    if cached is not None:
+        return cached
+
+    dataset: list[Dataset] = await crud_dataset.get_datasets(db, dataset_id)
     dataset = [DatasetScheme(**data_part.__dict__) for data_part in dataset]
 
     if not dataset:
         raise HTTPException(status_code=404, detail="Dataset not found")
 
-    field_capacity = None
-    wilting_point = None
-    if soil:
-        query_row = db.query(SoilTypeValues).filter(SoilTypeValues.soil_type == soil.value).first()
-        if query_row is None:
-            raise HTTPException(status_code=404, detail="Soil type not found")
-
-        field_capacity = query_row.field_capacity
-        wilting_point = query_row.wilting_point
+    if profile_mode:
+        result, profile = await run_in_threadpool(
+            run_profiled, profile_mode, "irrigation-datapoints", calculate_irrigation_datapoints,
+            dataset, field_capacity, wilting_point, weights.weights
+        )
+        return {"result": result, "profile": profile}
 
-    result = calculate_irrigation_datapoints(dataset, field_capacity, wilting_point)
+    result = await run_in_threadpool(
+        calculate_irrigation_datapoints, dataset, field_capacity, wilting_point, weights.weights
+    )
 
     return result
 
@@ -2,30 +2,82 @@ import datetime
 
 from typing import Literal, Optional, List, Dict
 
-from fastapi import APIRouter, Depends, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from api import deps
 import crud
 from api.deps import get_jwt
+from api.http_cache import make_etag, not_modified
+from core.config import settings
 
 from schemas import EToResponse, Calculation, Crop, KcStage
-from models import CropKc
-from utils import jsonld_eto_response, fetch_parcel_by_id, fetch_parcel_lat_lon, TimeUnit, fetch_weather_data, fetch_historical_eto_for_location
+from models import CropKc, Location, Eto
+from db.session import SessionLocal
+from utils import jsonld_eto_response, fetch_parcel_by_id, fetch_parcel_lat_lon, TimeUnit, fetch_weather_data, fetch_historical_eto_for_location, location_index
+from utils.kc_curve import crop_kc_curve, has_crop_calendar
+from utils.arrow_io import EXPORT_MEDIA_TYPES, ETO_EXPORT_COLUMNS, export_columns, stream_export
+from utils.water_balance import stage_kc
 
 router = APIRouter()
 
+
+async def _daily_kc(
+        db: AsyncSession,
+        crop: Optional[Crop],
+        stage: Optional[KcStage],
+        planting_date: Optional[datetime.date],
+        dates: List[datetime.date]
+) -> Optional[np.ndarray]:
+    """
+    Per-day Kc for the dates: the crop's Kc curve when a planting date is known, otherwise the fixed Kc of the
+    stage. None when no crop coefficient was requested.
+    """
+
+    if not crop or (planting_date is None and stage is None):
+        return None
+
+    kc_row = await db.get(CropKc, crop.value)
+    if kc_row is None:
+        raise HTTPException(404, f"No KC coefficients found for crop {crop}")
+
+    if planting_date is not None:
+        if not has_crop_calendar(kc_row):
+            raise HTTPException(400, f"No crop calendar (stage lengths) found for crop {crop}")
+
+        return crop_kc_curve(kc_row, planting_date, dates)
+
+    return np.full(len(dates), stage_kc(kc_row, stage.value))
+
+
+def _apply_kc(eto_response: EToResponse, kc: np.ndarray) -> EToResponse:
+    """
+    ETc = Kc * ETo for the whole range in one array operation, missing ETo values stay missing.
+    """
+
+    values = np.array([c.value for c in eto_response.calculations], dtype=float) * kc
+
+    return EToResponse(calculations=[
+        Calculation(date=c.date, value=None if np.isnan(v) else v)
+        for c, v in zip(eto_response.calculations, values.tolist())
+    ])
+
 @router.get("/option-types/", response_model=Dict[str, List[str]], dependencies=[Depends(deps.get_jwt)])
-def get_crop_types(
-    db: Session = Depends(deps.get_db)
+async def get_crop_types(
+    db: AsyncSession = Depends(deps.get_async_db)
 ):
     """
     Returns Crop types from DB.
     Used to populate dropdowns in the frontend.
     """
 
-    crops_query = db.query(CropKc.crop).all()
-    crops_list = [row[0] for row in crops_query]
+    crops_query = await db.execute(select(CropKc.crop))
+    crops_list = list(crops_query.scalars().all())
 
     stages_list = [stage.value for stage in KcStage]
 
@@ -35,18 +87,59 @@ def get_crop_types(
     }
 
 
+@router.get("/export/", dependencies=[Depends(get_jwt)])
+def export_eto(
+    location_id: Optional[List[int]] = Query(default=None),
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+    columns: Optional[str] = None,
+    export_format: Literal["parquet", "arrow"] = Query(default="parquet", alias="format")
+):
+    """
+    Streams the stored ETo history as Parquet or an Arrow IPC stream, of the given locations (all when none) within
+    the interval. columns is a comma separated projection of location_id, date, value and precipitation.
+    """
+
+    try:
+        projection = export_columns(columns, ETO_EXPORT_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    conditions = []
+    if location_id:
+        conditions.append(Eto.location_id.in_(location_id))
+    if from_date:
+        conditions.append(Eto.date >= from_date)
+    if to_date:
+        conditions.append(Eto.date <= to_date)
+
+    return StreamingResponse(
+        stream_export(SessionLocal(), Eto, projection, ETO_EXPORT_COLUMNS, conditions, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": 'attachment; filename="eto.{}"'.format(export_format)}
+    )
+
+
 @router.get("/get-calculations/{location_id}/from/{from_date}/to/{to_date}/", dependencies=[Depends(get_jwt)])
-def get_calculations(
+async def get_calculations(
     location_id: int,
     from_date: datetime.date,
     to_date: datetime.date,
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(deps.get_async_db),
     crop: Optional[Crop] = None,
     stage: Optional[KcStage] = None,
-    formatting: Literal["JSON", "JSON-LD"] = "JSON"
+    planting_date: Optional[datetime.date] = None,
+    formatting: Literal["JSON", "JSON-LD"] = "JSON",
+    compact: bool = False
 ):
     """
     Returns ETo calculations for the requested days
+
+    With a crop, the values are ETc: following the crop's Kc curve from planting_date (or the location's planting
+    date when no stage is given), otherwise multiplied by the fixed Kc of the stage. Answers 304 to If-None-Match
+    while the stored ETo of the interval and the location's planting date are unchanged.
     """
 
     if from_date > to_date:
@@ -55,7 +148,7 @@ def get_calculations(
             detail="Error, from date can't be later than to date"
         )
 
-    location_db = crud.location.get(db=db, id=location_id)
+    location_db = await db.get(Location, location_id)
 
     if location_db is None:
         raise HTTPException(
@@ -63,22 +156,13 @@ def get_calculations(
             detail="Error, location with ID:{} does not exist.".format(location_id)
         )
 
-    kc_value = None
-    if crop and stage:
-        kc_row = db.query(CropKc).filter(CropKc.crop == crop.value).first()
-        if kc_row is None:
-            raise HTTPException(404, f"No KC coefficients found for crop {crop}")
-
-        if stage == KcStage.kc_init:
-            kc_value = kc_row.kc_init
-        elif stage == KcStage.kc_mid:
-            kc_value = kc_row.kc_mid
-        elif stage == KcStage.kc_end:
-            kc_value = kc_row.kc_end
-
+    count, max_id = await crud.eto_async.get_version(db, from_date, to_date, location_id)
+    cached = not_modified(request, response, make_etag(request, count, max_id, location_db.planting_date))
+    if cached is not None:
+        return cached
 
     eto_response = EToResponse(
-            calculations=crud.eto.get_calculations(
+            calculations=await crud.eto_async.get_calculations(
                 db=db,
                 from_date=from_date,
                 to_date=to_date,
@@ -86,29 +170,31 @@ def get_calculations(
             )
         )
 
-    if kc_value is not None:
-        calculations = eto_response.calculations
+    # The location's planting date applies unless a fixed stage is requested
+    if planting_date is None and stage is None:
+        planting_date = location_db.planting_date
 
-        for c in calculations:
-            if c.value is not None:
-                c.value = c.value * kc_value
+    kc = await _daily_kc(db, crop, stage, planting_date, [c.date for c in eto_response.calculations])
+    if kc is not None:
+        eto_response = _apply_kc(eto_response, kc)
 
     if formatting.lower() == "json":
         return eto_response
     else:
-        jsonld_response = jsonld_eto_response(eto_response)
+        jsonld_response = jsonld_eto_response(eto_response, compact)
         return jsonld_response
 
 
 @router.get("/calculate-gk/")
-def calculate_eto_via_gk(
+async def calculate_eto_via_gk(
         parcel_id: str,
         from_date: datetime.date,
         to_date: datetime.date,
         access_token: str = Depends(get_jwt),
-        db: Session = Depends(deps.get_db),
+        db: AsyncSession = Depends(deps.get_async_db),
         crop: Optional[Crop] = None,
         stage: Optional[KcStage] = None,
+        planting_date: Optional[datetime.date] = None,
         formatting: Literal["JSON", "JSON-LD"] = "JSON"
 ):
     """
@@ -121,7 +207,7 @@ def calculate_eto_via_gk(
             detail="from_date must be later than to_date, from_date: {} | to_date: {}".format(from_date, to_date)
         )
 
-    parcel_fc = fetch_parcel_by_id(access_token=access_token, parcel_id=parcel_id)
+    parcel_fc = await run_in_threadpool(fetch_parcel_by_id, access_token=access_token, parcel_id=parcel_id)
 
     if not parcel_fc:
         raise HTTPException(
@@ -131,7 +217,8 @@ def calculate_eto_via_gk(
 
     lat, lon = fetch_parcel_lat_lon(parcel_fc)
 
-    weather_data = fetch_weather_data(
+    weather_data = await run_in_threadpool(
+        fetch_weather_data,
         latitude=lat, longitude=lon, access_token=access_token, start_date=from_date, end_date=to_date,
         variables=["et0_fao_evapotranspiration"]
     )
@@ -142,20 +229,6 @@ def calculate_eto_via_gk(
             detail="Error during weather data fetch, none found"
         )
 
-    kc_value = None
-    if crop and stage:
-        kc_row = db.query(CropKc).filter(CropKc.crop == crop.value).first()
-        if kc_row is None:
-            raise HTTPException(404, f"No KC coefficients found for crop {crop}")
-
-        if stage == KcStage.kc_init:
-            kc_value = kc_row.kc_init
-        elif stage == KcStage.kc_mid:
-            kc_value = kc_row.kc_mid
-        elif stage == KcStage.kc_end:
-            kc_value = kc_row.kc_end
-
-
     response_json = EToResponse(
         calculations=[
             Calculation(
@@ -165,12 +238,9 @@ def calculate_eto_via_gk(
         ]
     )
 
-    if kc_value is not None:
-        calculations = response_json.calculations
-
-        for c in calculations:
-            if c.value is not None:
-                c.value = c.value * kc_value
+    kc = await _daily_kc(db, crop, stage, planting_date, [c.date for c in response_json.calculations])
+    if kc is not None:
+        response_json = _apply_kc(response_json, kc)
 
     if formatting.lower() == "json":
         return response_json
@@ -180,15 +250,16 @@ def calculate_eto_via_gk(
 
 
 @router.get("/calculate-coordinates/", dependencies=[Depends(get_jwt)])
-def calculate_eto_by_coordinates(
+async def calculate_eto_by_coordinates(
         latitude: float,
         longitude: float,
         from_date: datetime.date,
         to_date: datetime.date,
-        db: Session = Depends(deps.get_db),
+        db: AsyncSession = Depends(deps.get_async_db),
         access_token: str = Depends(get_jwt),
         crop: Optional[Crop] = None,
         stage: Optional[KcStage] = None,
+        planting_date: Optional[datetime.date] = None,
         formatting: Literal["JSON", "JSON-LD"] = "JSON"
 ):
     """
@@ -202,45 +273,46 @@ def calculate_eto_by_coordinates(
         )
 
 
-    weather_data = fetch_weather_data(
-        latitude=latitude,
-        longitude=longitude,
-        access_token=access_token,
-        start_date=from_date,
-        end_date=to_date,
-        variables=["et0_fao_evapotranspiration"]
-    )
-
-    if not weather_data or "data" not in weather_data:
-        raise HTTPException(
-            status_code=404,
-            detail="No weather data found for these coordinates/dates."
+    # Answer from the stored ETo of a close enough location when it covers the whole interval
+    daily_eto = None
+    if settings.ETO_NEAREST_LOCATION_RADIUS_M > 0:
+        nearest = await location_index.nearest_async(
+            db=db, latitude=latitude, longitude=longitude, max_distance_m=settings.ETO_NEAREST_LOCATION_RADIUS_M
+        )
+        if nearest is not None:
+            stored = {
+                e.date: e.value for e in await crud.eto_async.get_calculations(
+                    db=db, from_date=from_date, to_date=to_date, location_id=nearest[0]
+                )
+            }
+            requested_dates = [from_date + datetime.timedelta(days=i) for i in range((to_date - from_date).days + 1)]
+            if all(d in stored for d in requested_dates):
+                daily_eto = [(d, stored[d]) for d in requested_dates]
+
+    if daily_eto is None:
+        weather_data = await run_in_threadpool(
+            fetch_weather_data,
+            latitude=latitude,
+            longitude=longitude,
+            access_token=access_token,
+            start_date=from_date,
+            end_date=to_date,
+            variables=["et0_fao_evapotranspiration"]
         )
 
-    kc_value = None
-    if crop and stage:
-        kc_row = db.query(CropKc).filter(CropKc.crop == crop.value).first()
-        if kc_row is None:
-            raise HTTPException(404, f"No KC coefficients found for crop {crop}")
-
-        if stage == KcStage.kc_init:
-            kc_value = kc_row.kc_init
-        elif stage == KcStage.kc_mid:
-            kc_value = kc_row.kc_mid
-        elif stage == KcStage.kc_end:
-            kc_value = kc_row.kc_end
-
-
-    calculations = []
-    for wd in weather_data["data"]:
-        val = wd["values"].get("et0_fao_evapotranspiration")
+        if not weather_data or "data" not in weather_data:
+            raise HTTPException(
+                status_code=404,
+                detail="No weather data found for these coordinates/dates."
+            )
 
-        if val is not None and kc_value is not None:
-            val = val * kc_value
+        daily_eto = [(wd["date"], wd["values"].get("et0_fao_evapotranspiration")) for wd in weather_data["data"]]
 
-        calculations.append(Calculation(date=wd["date"], value=val))
+    response_obj = EToResponse(calculations=[Calculation(date=date, value=val) for date, val in daily_eto])
 
-    response_obj = EToResponse(calculations=calculations)
+    kc = await _daily_kc(db, crop, stage, planting_date, [c.date for c in response_obj.calculations])
+    if kc is not None:
+        response_obj = _apply_kc(response_obj, kc)
 
     if formatting.lower() == "json":
         return response_obj
@@ -258,6 +330,7 @@ def fetch_and_store_eto(
     db: Session = Depends(deps.get_db),
     crop: Optional[Crop] = None,
     stage: Optional[KcStage] = None,
+    planting_date: Optional[datetime.date] = None,
     formatting: Literal["JSON", "JSON-LD"] = "JSON"
 ):
     if from_date > to_date:
@@ -274,7 +347,8 @@ def fetch_and_store_eto(
         to_date=to_date,
         db=db,
         crop=crop,
-        stage=stage
+        stage=stage,
+        planting_date=planting_date
     )
 
     if response_json is None:
@@ -1,12 +1,21 @@
-import requests
-from fastapi import APIRouter, Depends, HTTPException
-from requests import RequestException
+from typing import Union
+
+import numpy as np
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
 from shapely import wkt, errors
 from sqlalchemy.orm import Session
 
 from api.deps import get_jwt, get_db
-from schemas import Message, LocationCreate, NewLocationWKT, LocationsDB, LocationDB
-from crud import location
+from core.config import settings
+from schemas import Message, LocationCreate, LocationUpdate, NewLocationWKT, LocationsDB, LocationDB, \
+    NewLocationsWKT, ParcelFeatureCollection, RejectedParcel, BulkLocationsResult, NearestLocation, DeletionTaskDB
+from crud import location, eto, deletion_task
+from jobs.background_tasks import run_deletion_tasks
+from utils.deletion import DELETION_LOCATION
+from utils.elevation import lookup_elevations, ElevationLookupError
+from utils.grid import grid_cell_key
+from utils.parcels import wkt_centroids, geojson_centroids, centroid_keys
+from utils.spatial_index import location_index
 
 router = APIRouter()
 
@@ -34,78 +43,251 @@ def add_location_wkt(
     c_latitude = base_geometry.centroid.x
     c_longitude = base_geometry.centroid.y
 
-    # Check whether opentopo returns an elevation
     try:
-        response_otd = requests.get(
-            url="https://api.opentopodata.org/v1/{}?locations={},{}".format("eudem25m", c_latitude, c_longitude)
-        )
-    except RequestException:
+        elevation = lookup_elevations(db=db, points=[(c_latitude, c_longitude)])[0]
+    except ElevationLookupError as ele:
         raise HTTPException(
             status_code=400,
-            detail="Error, can't check topographical location of wkt parcel, please try again later."
+            detail=str(ele)
         )
 
-    if (response_otd.status_code / 100) != 2:
+    if not elevation:
         raise HTTPException(
             status_code=400,
-            detail="Error, topographical api issue, please try again later."
+            detail="Error, wkt coordinates do not point to a European location, only European continental parcels "
+                   "are supported currently."
         )
 
-    body = response_otd.json()
+    location.create(
+        db=db,
+        obj_in=LocationCreate(latitude=float(c_latitude), longitude=float(c_longitude), elevation=elevation)
+    )
+
+    return Message(message="Successfully created new location!")
+
+
+@router.post("/parcels/bulk/", response_model=BulkLocationsResult, dependencies=[Depends(get_jwt)])
+def add_locations_bulk(
+    parcels: Union[NewLocationsWKT, ParcelFeatureCollection],
+    db: Session = Depends(get_db)
+) -> BulkLocationsResult:
+    """
+    Add many locations at once, either as a list of WKT parcels (same format as /parcel-wkt/) or as a GeoJSON
+    FeatureCollection (longitude, latitude order).
 
-    if "results" not in body:
+    Parcels whose centroid is within PARCEL_DEDUP_TOLERANCE_DEG of another parcel of the request or of an existing
+    location are skipped as duplicates. Invalid and non-European parcels are reported back, the rest are inserted
+    in one transaction.
+    """
+
+    if isinstance(parcels, NewLocationsWKT):
+        latitudes, longitudes = wkt_centroids(parcels.coordinates)
+    else:
+        latitudes, longitudes = geojson_centroids(parcels.features)
+
+    if len(latitudes) > settings.BULK_PARCELS_MAX:
         raise HTTPException(
             status_code=400,
-            detail="Error, topographical api failed to return a result, please try again later."
+            detail="Error, at most {} parcels can be registered per request.".format(settings.BULK_PARCELS_MAX)
         )
 
-    if len(body["results"]) == 0:
+    rejected = [
+        RejectedParcel(index=i, reason="Invalid or empty geometry")
+        for i in np.flatnonzero(np.isnan(latitudes) | np.isnan(longitudes)).tolist()
+    ]
+    rejected_indexes = {r.index for r in rejected}
+
+    keys = centroid_keys(latitudes, longitudes, settings.PARCEL_DEDUP_TOLERANCE_DEG)
+    existing = location.get_in_grid_cells(
+        db=db,
+        grid_cells=(grid_cell_key(latitudes[i], longitudes[i]) for i in range(len(keys)) if i not in rejected_indexes)
+    )
+    seen = set(centroid_keys(
+        np.array([l.latitude for l in existing]),
+        np.array([l.longitude for l in existing]),
+        settings.PARCEL_DEDUP_TOLERANCE_DEG
+    ))
+
+    candidates = []
+    duplicates = 0
+    for i, key in enumerate(keys):
+        if i in rejected_indexes:
+            continue
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        candidates.append(i)
+
+    try:
+        elevations = lookup_elevations(db=db, points=[(latitudes[i], longitudes[i]) for i in candidates])
+    except ElevationLookupError as ele:
         raise HTTPException(
             status_code=400,
-            detail="Error, topographical api returned an empty results set, please try again later."
+            detail=str(ele)
+        )
+
+    new_locations = []
+    for i, elevation in zip(candidates, elevations):
+        if not elevation:
+            rejected.append(RejectedParcel(index=i, reason="Not a European continental location"))
+            continue
+        new_locations.append(
+            LocationCreate(latitude=float(latitudes[i]), longitude=float(longitudes[i]), elevation=elevation)
         )
 
-    if "elevation" not in body["results"][0]:
+    created = location.create_multi(db=db, obj_in=new_locations)
+
+    if created is None:
         raise HTTPException(
-            status_code=400,
-            detail="Error, elevation data missing from topographical api call, please try again later."
+            status_code=500,
+            detail="Error, the locations could not be stored, none were created."
         )
 
-    if not body["results"][0]["elevation"]:
+    return BulkLocationsResult(
+        created=created,
+        duplicates=duplicates,
+        rejected=sorted(rejected, key=lambda r: r.index)
+    )
+
+
+@router.get("/nearest/", response_model=NearestLocation, dependencies=[Depends(get_jwt)])
+def get_nearest_location(
+    latitude: float,
+    longitude: float,
+    max_distance_m: float = Query(default=5000, gt=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Closest location to the coordinates within max_distance_m meters.
+    """
+
+    nearest = location_index.nearest(db=db, latitude=latitude, longitude=longitude, max_distance_m=max_distance_m)
+
+    if nearest is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No location within {}m of ({}, {}).".format(max_distance_m, latitude, longitude)
+        )
+
+    location_id, distance_m = nearest
+
+    return NearestLocation(location=location.get(db=db, id=location_id), distance_m=distance_m)
+
+
+@router.get("/bbox/", response_model=LocationsDB, dependencies=[Depends(get_jwt)])
+def get_locations_in_bbox(
+    min_latitude: float,
+    min_longitude: float,
+    max_latitude: float,
+    max_longitude: float,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, gt=0, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Locations inside the bounding box, ordered by ID.
+    """
+
+    if min_latitude > max_latitude or min_longitude > max_longitude:
         raise HTTPException(
             status_code=400,
-            detail="Error, wkt coordinates do not point to a European location, only European continental parcels "
-                   "are supported currently."
+            detail="Error, the minimum coordinates of the bounding box must not exceed the maximum ones."
         )
 
-    location.create(db=db, obj_in=LocationCreate(latitude=float(c_latitude), longitude=float(c_longitude)))
+    ids = location_index.within_bbox(
+        db=db,
+        min_latitude=min_latitude,
+        min_longitude=min_longitude,
+        max_latitude=max_latitude,
+        max_longitude=max_longitude
+    )
 
-    return Message(message="Successfully created new location!")
+    return LocationsDB(locations=location.get_by_ids(db=db, ids=ids[skip:skip + limit]))
+
+
+@router.get("/deletions/{task_id}/", response_model=DeletionTaskDB, dependencies=[Depends(get_jwt)])
+def get_location_deletion(
+    task_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Progress of the background deletion of a location with a long ETo history.
+    """
 
+    task = deletion_task.get_by_kind(db=db, id=task_id, kind=DELETION_LOCATION)
 
-@router.delete("/{location_id}/", response_model=Message, dependencies=[Depends(get_jwt)])
+    if task is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Location deletion with ID:{} does not exist.".format(task_id)
+        )
+
+    return task
+
+
+@router.delete("/{location_id}/", response_model=Union[Message, DeletionTaskDB], dependencies=[Depends(get_jwt)])
 def remove_location(
     location_id: int,
+    response: Response,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Remove a location via ID (this also removes all recordings stored in database for this location)
+
+    Locations with more than BULK_DELETE_BACKGROUND_ROWS ETo values are deleted by a chunked background task, the
+    response is then a 202 with the task, see /location/deletions/{task_id}/.
     """
 
-    location_db = location.get(db=db, id=location_id)
+    rows = eto.count_by_location(db=db, location_id=location_id)
 
-    if location_db is None:
+    if rows > settings.BULK_DELETE_BACKGROUND_ROWS:
+        task = deletion_task.schedule(db=db, kind=DELETION_LOCATION, target=str(location_id), total_rows=rows)
+        background_tasks.add_task(run_deletion_tasks)
+        response.status_code = 202
+        return task
+
+    if location.remove(db=db, id=location_id) == 0:
         raise HTTPException(
             status_code=400,
             detail="Location with ID:{} does not exist.".format(location_id)
         )
 
-    location.remove(db=db, id=location_id)
-
     return Message(
         message="Successfully deleted the location"
     )
 
+@router.patch("/{location_id}/", response_model=LocationDB, dependencies=[Depends(get_jwt)])
+def update_location(
+    location_id: int,
+    location_information: LocationUpdate,
+    db: Session = Depends(get_db)
+):
+    """
+    Set the soil type, crop and crop stage of a location, the inputs of its water balance.
+    """
+
+    location_db = location.get(db=db, id=location_id)
+
+    if location_db is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, Location with ID:{} does not exist.".format(location_id)
+        )
+
+    updated = location.update(
+        db=db, db_obj=location_db, obj_in=location_information.model_dump(exclude_unset=True)
+    )
+
+    if updated is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, soil type or crop missing from the database."
+        )
+
+    return updated
+
 @router.get("/{location_id}/", response_model=LocationDB, dependencies=[Depends(get_jwt)])
 def get_location(
     location_id: int,
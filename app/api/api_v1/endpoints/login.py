@@ -4,6 +4,7 @@ import requests
 from api import deps
 from core.config import settings
 from core.security import *
+from core.metrics import track_outbound
 from crud import user
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
@@ -42,14 +43,15 @@ def login_access_token(
         )
     else:
         try:
-            response = requests.post(
-                url=str(settings.GATEKEEPER_BASE_URL).rstrip("/") + "/api/login/",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "username": "{}".format(form_data.username),
-                    "password": "{}".format(form_data.password),
-                },
-            )
+            with track_outbound("gatekeeper"):
+                response = requests.post(
+                    url=str(settings.GATEKEEPER_BASE_URL).rstrip("/") + "/api/login/",
+                    headers={"Content-Type": "application/json"},
+                    json={
+                        "username": "{}".format(form_data.username),
+                        "password": "{}".format(form_data.password),
+                    },
+                )
         except RequestException:
             raise HTTPException(
                 status_code=400,
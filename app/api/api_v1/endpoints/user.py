@@ -4,6 +4,7 @@ import requests
 from api import deps
 from api.deps import is_not_using_gatekeeper
 from core import settings
+from core.metrics import track_outbound
 from crud import user
 from fastapi import APIRouter, Depends, HTTPException
 from models import User
@@ -32,15 +33,16 @@ def register(
 
     if settings.USING_GATEKEEPER:
         try:
-            response = requests.post(
-                url=str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/register/",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "username": user_information.email,
-                    "email": user_information.email,
-                    "password": user_information.password,
-                },
-            )
+            with track_outbound("gatekeeper"):
+                response = requests.post(
+                    url=str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/register/",
+                    headers={"Content-Type": "application/json"},
+                    json={
+                        "username": user_information.email,
+                        "email": user_information.email,
+                        "password": user_information.password,
+                    },
+                )
         except RequestException:
             raise HTTPException(
                 status_code=400, detail="Error, can't connect to gatekeeper instance."
@@ -0,0 +1,92 @@
+import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from api.deps import get_jwt, get_db
+from crud import location, water_balance, irrigation_schedule
+from schemas import WaterBalanceResponse, WaterBalanceDay, IrrigationScheduleDB, IrrigationSchedules
+
+router = APIRouter()
+
+
+@router.get("/schedule/", response_model=IrrigationSchedules, dependencies=[Depends(get_jwt)])
+def get_irrigation_schedules(
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=1000, gt=0, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Next recommended irrigation date and dose of every location, as computed by the nightly forecast projection.
+    """
+
+    schedules = irrigation_schedule.get_multi(db=db, skip=skip, limit=limit)
+
+    return IrrigationSchedules(schedules=[IrrigationScheduleDB.model_validate(s) for s in schedules])
+
+
+@router.get("/{location_id}/schedule/", response_model=IrrigationScheduleDB, dependencies=[Depends(get_jwt)])
+def get_irrigation_schedule(
+    location_id: int,
+    db: Session = Depends(get_db)
+):
+    """
+    Next recommended irrigation date and dose of a location. A date of null means the root zone stays above the
+    readily available water threshold over the whole forecast.
+    """
+
+    schedule = irrigation_schedule.get(db=db, location_id=location_id)
+
+    if schedule is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Error, no irrigation schedule for location with ID:{}.".format(location_id)
+        )
+
+    return schedule
+
+
+@router.get(
+    "/{location_id}/from/{from_date}/to/{to_date}/",
+    response_model=WaterBalanceResponse,
+    dependencies=[Depends(get_jwt)]
+)
+def get_water_balance(
+    location_id: int,
+    from_date: datetime.date,
+    to_date: datetime.date,
+    db: Session = Depends(get_db)
+):
+    """
+    Daily root zone water balance of a location (FAO-56): crop evapotranspiration, depletion, total and readily
+    available water and the irrigation requirement (the dose refilling the root zone, once depletion exceeds RAW).
+
+    The balance is extended nightly for locations with a soil type and crop, see PATCH /location/{location_id}/.
+    """
+
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, from date can't be later than to date"
+        )
+
+    location_db = location.get(db=db, id=location_id)
+
+    if location_db is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, location with ID:{} does not exist.".format(location_id)
+        )
+
+    if location_db.soil_type is None or location_db.crop is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Error, location with ID:{} has no soil type and crop set.".format(location_id)
+        )
+
+    days = water_balance.get_range(db=db, location_id=location_id, from_date=from_date, to_date=to_date)
+
+    return WaterBalanceResponse(
+        location_id=location_id,
+        days=[WaterBalanceDay.model_validate(d) for d in days]
+    )
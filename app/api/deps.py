@@ -1,7 +1,9 @@
-from typing import Generator
+import importlib.util
+from typing import Generator, AsyncGenerator, Optional, Literal
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Header
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from core.security import decode_token
@@ -9,7 +11,7 @@ from models import User
 from crud import user
 
 from core.config import settings
-from db.session import SessionLocal
+from db.session import SessionLocal, AsyncSessionLocal
 from utils import check_token_for_validity
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="/api/v1/login/access-token/")
@@ -23,6 +25,11 @@ def get_db() -> Generator:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def get_jwt(
         token: str = Depends(reusable_oauth2),
         db: Session = Depends(get_db)
@@ -104,3 +111,27 @@ def is_not_using_gatekeeper():
             status_code=400,
             detail="Can't use this API while connected to a gatekeeper"
         )
+
+
+def get_profile_mode(
+        profile: Optional[Literal["timings", "cprofile", "pyinstrument"]] = None,
+        x_debug_profile: Optional[Literal["timings", "cprofile", "pyinstrument"]] = Header(None)
+) -> Optional[str]:
+    """
+    Profiling of the analysis pipeline, enabled per request via ?profile= or the X-Debug-Profile header.
+    """
+    mode = profile or x_debug_profile
+
+    if mode in ("cprofile", "pyinstrument") and not settings.PROFILING_ENABLED:
+        raise HTTPException(
+            status_code=400,
+            detail="Sampling profilers are disabled, set PROFILING_ENABLED or use the timings mode"
+        )
+
+    if mode == "pyinstrument" and importlib.util.find_spec("pyinstrument") is None:
+        raise HTTPException(
+            status_code=400,
+            detail="pyinstrument is not installed, use the cprofile mode instead"
+        )
+
+    return mode
@@ -0,0 +1,93 @@
+import datetime
+import hashlib
+import json
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+from core.config import settings, INITIAL_KC
+
+# Settings the soil analysis and ETc results depend on, a deployment changing any of them changes every ETag
+CACHED_SETTINGS = (
+    "RAIN_THRESHOLD_MM", "FIELD_CAPACITY_WINDOW_HOURS", "STRESS_THRESHOLD_FRACTION", "LOW_DOSE_THRESHOLD_MM",
+    "HIGH_DOSE_THRESHOLD_MM", "RAIN_ZERO_TOLERANCE", "RAIN_GAP_TOLERANCE_HOURS", "SM_IRRIGATION_JUMP_PCT",
+    "SM_GAUGE_BLACKOUT_DAYS", "QC_SM_MIN_PCT", "QC_SM_MAX_PCT", "QC_SPIKE_PCT", "QC_FLATLINE_WINDOW",
+    "QC_FLATLINE_VARIANCE", "GLOBAL_WEIGHTS",
+)
+
+# Revalidated on every use, the responses depend on the caller's token so shared caches must not keep them
+CACHE_CONTROL = "private, no-cache"
+
+# The crop Kc rows are seeded from INITIAL_KC on startup
+_SETTINGS_VERSION = hashlib.sha256(json.dumps(
+    [{name: getattr(settings, name) for name in CACHED_SETTINGS}, INITIAL_KC], sort_keys=True, default=str
+).encode()).hexdigest()[:16]
+
+
+def make_etag(request: Request, *parts: Any) -> str:
+    """
+    Strong ETag of a response from the version metadata of the data it is built from. The path and query string
+    are part of it, so the variants of a resource (formatting, soil, compact, ...) never share a tag.
+    """
+
+    key = json.dumps(
+        [request.url.path, sorted(request.query_params.multi_items()), _SETTINGS_VERSION, *parts],
+        default=str
+    )
+    return '"{}"'.format(hashlib.sha256(key.encode()).hexdigest()[:32])
+
+
+def _http_date(value: datetime.datetime) -> datetime.datetime:
+    # Timestamps are stored as naive UTC, HTTP dates have a resolution of one second
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc).replace(microsecond=0)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime.datetime] = None) -> bool:
+    """
+    Whether the client's copy is current. If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        # GET compares weakly, a tag the client got back as W/"..." from a proxy still matches
+        return "*" in tags or etag in tags or "W/" + etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    return _http_date(last_modified) <= _http_date(since)
+
+
+def set_cache_headers(response: Response, etag: str, last_modified: Optional[datetime.datetime] = None) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if last_modified is not None:
+        response.headers["Last-Modified"] = format_datetime(_http_date(last_modified), usegmt=True)
+
+
+def not_modified(
+        request: Request, response: Response, etag: str, last_modified: Optional[datetime.datetime] = None
+) -> Optional[Response]:
+    """
+    Sets the validators on the response and returns the 304 to answer with when the client's copy is current,
+    None when the response has to be built.
+    """
+
+    set_cache_headers(response, etag, last_modified)
+
+    if not is_not_modified(request, etag, last_modified):
+        return None
+
+    cached = Response(status_code=304)
+    set_cache_headers(cached, etag, last_modified)
+    return cached
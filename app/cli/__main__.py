@@ -0,0 +1,203 @@
+"""
+Bulk data transfer between environments, the runs of the nightly ETo job and the storage layout, run from app/:
+
+    python -m cli export-datasets --dataset-id field-1 --from 2023-01-01 --output field-1.parquet
+    python -m cli export-eto --location-id 1 --location-id 2 --format arrow --output eto.arrows
+    python -m cli import-datasets field-1.parquet
+    python -m cli eto-runs
+    python -m cli resume-eto-run 42
+    python -m cli convert-storage --partitioned
+"""
+import argparse
+import asyncio
+import datetime
+import sys
+import time
+
+import crud
+from core.config import settings
+from db.session import SessionLocal, AsyncSessionLocal
+from jobs.background_tasks import resume_weather_data
+from models import Dataset, Eto
+from utils.arrow_io import (
+    DATASET_EXPORT_COLUMNS, ETO_EXPORT_COLUMNS, export_columns, stream_export, read_parquet_batches
+)
+from utils.ingest import ingest_readings, normalize_readings_frame
+from utils.job_runs import JOB_FAILED, IncompleteRunError
+from utils.partitions import PARTITIONED_TABLES, convert_table, is_partitioned
+
+
+def _export(args: argparse.Namespace, model, types, conditions) -> None:
+    columns = export_columns(args.columns, types)
+    started = time.perf_counter()
+    written = 0
+
+    with open(args.output, "wb") as output:
+        for chunk in stream_export(SessionLocal(), model, columns, types, conditions, args.format, args.batch_rows):
+            output.write(chunk)
+            written += len(chunk)
+
+    print("Wrote {} bytes to {} in {:.2f}s".format(written, args.output, time.perf_counter() - started))
+
+
+def export_datasets(args: argparse.Namespace) -> None:
+    conditions = []
+    if args.dataset_id:
+        conditions.append(Dataset.dataset_id.in_(args.dataset_id))
+    if args.from_date:
+        conditions.append(Dataset.date >= args.from_date)
+    if args.to_date:
+        conditions.append(Dataset.date <= args.to_date)
+
+    _export(args, Dataset, DATASET_EXPORT_COLUMNS, conditions)
+
+
+def export_eto(args: argparse.Namespace) -> None:
+    conditions = []
+    if args.location_id:
+        conditions.append(Eto.location_id.in_(args.location_id))
+    if args.from_date:
+        conditions.append(Eto.date >= args.from_date)
+    if args.to_date:
+        conditions.append(Eto.date <= args.to_date)
+
+    _export(args, Eto, ETO_EXPORT_COLUMNS, conditions)
+
+
+async def _import(args: argparse.Namespace) -> int:
+    imported = 0
+    async with AsyncSessionLocal() as db:
+        for batch in read_parquet_batches(args.input, args.batch_rows):
+            imported += await ingest_readings(db, normalize_readings_frame(batch))
+            print("{} readings imported".format(imported), file=sys.stderr)
+
+    return imported
+
+
+def import_datasets(args: argparse.Namespace) -> None:
+    started = time.perf_counter()
+    imported = asyncio.run(_import(args))
+
+    print("Imported {} readings from {} in {:.2f}s".format(imported, args.input, time.perf_counter() - started))
+
+
+def eto_runs(args: argparse.Namespace) -> None:
+    session = SessionLocal()
+    try:
+        runs = crud.job_run.get_recent(session, "get_weather_data", args.limit)
+        summaries = crud.eto_job_chunk.summary(session, [run.id for run in runs])
+    finally:
+        session.close()
+
+    for run in runs:
+        summary = summaries[run.id]
+        print("{:>6}  {:%Y-%m-%d %H:%M}  {:<9}  {:>8}  chunks {}  stored {}  failed {}{}".format(
+            run.id, run.started_at, run.status,
+            "{:.1f}s".format(run.duration_s) if run.duration_s is not None else "-",
+            ", ".join("{} {}".format(n, status) for status, n in sorted(summary["chunks"].items())) or "-",
+            summary["stored"], summary["failed"], "  " + run.error if run.error else ""
+        ))
+
+
+def resume_eto_run(args: argparse.Namespace) -> None:
+    session = SessionLocal()
+    try:
+        run = crud.job_run.get(session, args.run_id)
+        if run is None or run.job_id != "get_weather_data":
+            raise ValueError("No run {} of the ETo job".format(args.run_id))
+
+        started = time.perf_counter()
+        try:
+            resume_weather_data(args.run_id)
+        except IncompleteRunError as e:
+            session.refresh(run)
+            crud.job_run.set_status(session, run, JOB_FAILED, str(e))
+            print("Run {} still incomplete: {}".format(args.run_id, e))
+            raise SystemExit(1)
+
+        print("Run {} completed in {:.2f}s".format(args.run_id, time.perf_counter() - started))
+    finally:
+        session.close()
+
+
+def convert_storage(args: argparse.Namespace) -> None:
+    session = SessionLocal()
+    try:
+        if session.get_bind().dialect.name != "postgresql":
+            raise ValueError("Partitioned storage needs PostgreSQL")
+
+        started = time.perf_counter()
+        converted = []
+        for table in PARTITIONED_TABLES:
+            if is_partitioned(session, table) != args.partitioned:
+                convert_table(session, table, args.partitioned, settings.PARTITION_PREMAKE_MONTHS)
+                converted.append(table)
+        # Both tables switch together, or neither does
+        session.commit()
+    finally:
+        session.close()
+
+    print("Converted {} to {} storage in {:.2f}s".format(
+        ", ".join(converted) or "nothing", "partitioned" if args.partitioned else "plain",
+        time.perf_counter() - started
+    ))
+
+
+def _add_export_arguments(parser: argparse.ArgumentParser, default_output: str) -> None:
+    parser.add_argument("--from", dest="from_date", type=datetime.date.fromisoformat)
+    parser.add_argument("--to", dest="to_date", type=datetime.date.fromisoformat)
+    parser.add_argument("--columns", help="Comma separated projection, all columns by default")
+    parser.add_argument("--format", choices=["parquet", "arrow"], default="parquet")
+    parser.add_argument("--batch-rows", type=int, default=None)
+    parser.add_argument("--output", default=default_output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m cli",
+        description="Parquet/Arrow export and import, runs of the nightly ETo job, storage layout"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    datasets = commands.add_parser("export-datasets", help="Export sensor readings")
+    datasets.add_argument("--dataset-id", action="append", help="Repeatable, all datasets by default")
+    _add_export_arguments(datasets, "datasets.parquet")
+    datasets.set_defaults(handler=export_datasets)
+
+    eto = commands.add_parser("export-eto", help="Export the stored ETo history")
+    eto.add_argument("--location-id", action="append", type=int, help="Repeatable, all locations by default")
+    _add_export_arguments(eto, "eto.parquet")
+    eto.set_defaults(handler=export_eto)
+
+    imports = commands.add_parser("import-datasets", help="Import sensor readings from a Parquet file")
+    imports.add_argument("input")
+    imports.add_argument("--batch-rows", type=int, default=None)
+    imports.set_defaults(handler=import_datasets)
+
+    runs = commands.add_parser("eto-runs", help="List the recent runs of the nightly ETo job")
+    runs.add_argument("--limit", type=int, default=20)
+    runs.set_defaults(handler=eto_runs)
+
+    resume = commands.add_parser(
+        "resume-eto-run", help="Compute the unfinished chunks of an ETo job run, only the failed locations"
+    )
+    resume.add_argument("run_id", type=int)
+    resume.set_defaults(handler=resume_eto_run)
+
+    storage = commands.add_parser(
+        "convert-storage", help="Rebuild the dataset and eto tables as monthly partitions, or back as plain tables"
+    )
+    layout = storage.add_mutually_exclusive_group(required=True)
+    layout.add_argument("--partitioned", dest="partitioned", action="store_true")
+    layout.add_argument("--plain", dest="partitioned", action="store_false")
+    storage.set_defaults(handler=convert_storage)
+
+    args = parser.parse_args()
+    try:
+        args.handler(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,9 +23,10 @@ SOIL_WILTING_POINTS = {
     "chalk": [0.18, 0.45]
 }
 
+# Format: "crop": [kc_init, kc_mid, kc_end, root_depth_m, depletion_fraction, l_ini, l_dev, l_mid, l_late]
 INITIAL_KC = {
-    "potato": [0.5, 1.15, 0.75],
-    "sugar_beet": [0.35, 1.2, 0.7]
+    "potato": [0.5, 1.15, 0.75, 0.5, 0.35, 25, 30, 45, 30],
+    "sugar_beet": [0.35, 1.2, 0.7, 1.0, 0.55, 50, 40, 50, 40]
 }
 
 class Settings(BaseSettings):
@@ -56,6 +57,29 @@ class Settings(BaseSettings):
 
         return url
 
+    # Async (asyncpg) stack used by the request path, the sync URI above stays in use for Alembic and jobs
+    ASYNC_SQLALCHEMY_DATABASE_URI: Optional[str] = None
+
+    @field_validator("ASYNC_SQLALCHEMY_DATABASE_URI", mode="before")
+    def assemble_async_db_connection(cls, v: Optional[str], values) -> Any:
+        if isinstance(v, str):
+            return v
+
+        url = values.data.get("SQLALCHEMY_DATABASE_URI") or ""
+
+        for sync_prefix, async_prefix in (
+                ("postgresql://", "postgresql+asyncpg://"),
+                ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+                ("sqlite://", "sqlite+aiosqlite://")
+        ):
+            if url.startswith(sync_prefix):
+                return async_prefix + url[len(sync_prefix):]
+
+        return url
+
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+
     PASSWORD_SCHEMA_OBJ: PasswordValidator = PasswordValidator()
     PASSWORD_SCHEMA_OBJ \
         .min(8) \
@@ -77,10 +101,60 @@ class Settings(BaseSettings):
     HIGH_DOSE_THRESHOLD_MM: float = 5.0
     RAIN_ZERO_TOLERANCE: float = 0.1
     RAIN_GAP_TOLERANCE_HOURS: int = 3
+    # Readings with rain, stored ones included, a dataset needs before its detected rain mode is saved
+    RAIN_MODE_MIN_READINGS: int = 10
 
     SM_IRRIGATION_JUMP_PCT: float = 3.0
     SM_GAUGE_BLACKOUT_DAYS: int = 2
 
+    # Quality control of uploaded soil moisture readings (percent VWC)
+    QC_SM_MIN_PCT: float = 0.0
+    QC_SM_MAX_PCT: float = 60.0
+    QC_SPIKE_PCT: float = 10.0
+    QC_FLATLINE_WINDOW: int = 48
+    QC_FLATLINE_VARIANCE: float = 1e-6
+
+    # Rows per record batch of the Parquet/Arrow exports and per transaction of the Parquet import
+    EXPORT_BATCH_ROWS: int = 50000
+    IMPORT_BATCH_ROWS: int = 50000
+
+    # Deletions of more rows than this run as a chunked background task, BULK_DELETE_CHUNK_ROWS rows per transaction
+    BULK_DELETE_BACKGROUND_ROWS: int = 100000
+    BULK_DELETE_CHUNK_ROWS: int = 10000
+    # A running deletion task without progress for this long (seconds) is resumed by another worker
+    DELETION_TASK_STALE_S: int = 600
+
+    # Monthly partitions of the dataset and eto tables (PostgreSQL only), read by the Alembic migration
+    PARTITIONED_STORAGE: bool = False
+    # Months of partitions the nightly maintenance creates ahead of the current one
+    PARTITION_PREMAKE_MONTHS: int = 3
+    # Months of history kept, older partitions are dropped whole, 0 keeps everything
+    DATASET_RETENTION_MONTHS: int = 0
+    ETO_RETENTION_MONTHS: int = 0
+    # "drop", or "archive" to write every expired partition to Parquet in PARTITION_ARCHIVE_DIR before dropping it
+    PARTITION_RETENTION_ACTION: str = "drop"
+    PARTITION_ARCHIVE_DIR: str = path.join(PROJECT_ROOT, "archive")
+
+    # Scheduled jobs run in the one process holding the scheduler lease, on a pool of SCHEDULER_MAX_WORKERS threads
+    SCHEDULER_MAX_WORKERS: int = 4
+    # Seconds a lease lasts without renewal and between renewals, another process takes over once it expired
+    SCHEDULER_LEASE_TTL_S: int = 60
+    SCHEDULER_LEASE_RENEW_S: int = 15
+    # Runs missed while no process held the lease are still made up for within this many seconds
+    SCHEDULER_MISFIRE_GRACE_S: int = 3600
+
+    # The nightly ETo job stores and checkpoints this many weather grid cells per transaction
+    ETO_JOB_CHUNK_CELLS: int = 50
+    # Unfinished chunks of the runs of this many past days are resumed by the next run, 0 leaves them to the CLI
+    ETO_JOB_RESUME_DAYS: int = 3
+    # A chunk running for this long without a checkpoint is claimed again, its worker is assumed to have stopped
+    ETO_JOB_CHUNK_STALE_S: int = 1800
+
+    # Water balance, locations without stored state start this many days back with a full root zone
+    WATER_BALANCE_MAX_DAYS: int = 180
+    # Forecast horizon (days, including today) of the nightly irrigation scheduling
+    IRRIGATION_FORECAST_DAYS: int = 7
+
     # Weights
     GLOBAL_WEIGHTS: dict[int, float] = {
         10: 0.15,
@@ -91,6 +165,11 @@ class Settings(BaseSettings):
         60: 0.15,
     }
 
+    # Profiling of the analysis pipeline, the timings mode (wall time only) is always available. Enabling it adds
+    # allocation tracking to the timings mode and the sampling profilers, which write to disk
+    PROFILING_ENABLED: bool = False
+    PROFILE_OUTPUT_DIR: str = path.join(PROJECT_ROOT, "profiles")
+
     SERVICE_PORT: int
     JWT_ALGORITHM: str
 
@@ -100,9 +179,38 @@ class Settings(BaseSettings):
     GATEKEEPER_USERNAME: str
     GATEKEEPER_PASSWORD: str
     SERVICE_NAME: str
+    GATEKEEPER_TIMEOUT_S: float = 10
+    # Route registration, runs in the background after startup
+    GATEKEEPER_REGISTRATION_CONCURRENCY: int = 8
+    GATEKEEPER_REGISTRATION_RETRIES: int = 5
+    GATEKEEPER_REGISTRATION_BACKOFF_S: float = 1
+    # Random delay before the first Gatekeeper call, spreads the registrations of replicas restarted together
+    GATEKEEPER_REGISTRATION_JITTER_S: float = 5
 
     # Frontend
     USING_FRONTEND: bool
 
+    # External weather/topography providers, overridable so they can be pointed at local stand-ins
+    OPEN_METEO_BASE_URL: str = "https://api.open-meteo.com"
+    OPEN_METEO_HISTORICAL_BASE_URL: str = "https://historical-forecast-api.open-meteo.com"
+    # Coordinates per multi-location Open-Meteo forecast request
+    OPEN_METEO_MAX_LOCATIONS: int = 100
+    OPENTOPODATA_BASE_URL: str = "https://api.opentopodata.org"
+    OPENTOPODATA_DATASET: str = "eudem25m"
+    OPENTOPODATA_TIMEOUT_S: float = 10
+
+    # Elevation lookups are cached per tile (~1 km at 0.01 degrees), parcels in a known tile need no network call
+    ELEVATION_TILE_RESOLUTION_DEG: float = 0.01
+
+    # Bulk parcel registration
+    BULK_PARCELS_MAX: int = 10000
+    PARCEL_DEDUP_TOLERANCE_DEG: float = 0.00001
+
+    # Coordinate ETo requests are answered from the stored ETo of a location this close (meters), 0 disables
+    ETO_NEAREST_LOCATION_RADIUS_M: float = 1000
+
+    # Locations inside the same cell share one weather fetch and ETo computation (~11 km at 0.1 degrees)
+    WEATHER_GRID_RESOLUTION_DEG: float = 0.1
+
 
 settings = Settings()
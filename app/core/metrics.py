@@ -0,0 +1,122 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List
+
+from prometheus_client import (
+    Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REQUEST_LATENCY = Histogram(
+    "irrigation_http_request_duration_seconds",
+    "Latency of HTTP requests per route template",
+    ["method", "route", "status"]
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "irrigation_http_requests_in_progress",
+    "Number of HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum"
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "irrigation_db_queries_per_request",
+    "Number of SQL statements executed while serving a request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 500)
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "irrigation_db_time_per_request_seconds",
+    "Time spent executing SQL statements while serving a request",
+    ["route"]
+)
+OUTBOUND_HTTP_LATENCY = Histogram(
+    "irrigation_outbound_http_duration_seconds",
+    "Latency of calls to external services (Gatekeeper, Open-Meteo, OpenTopoData, ...)",
+    ["service", "outcome"]
+)
+ANALYSIS_STAGE_LATENCY = Histogram(
+    "irrigation_analysis_stage_duration_seconds",
+    "Wall time of the soil analysis pipeline stages",
+    ["stage"]
+)
+SCHEDULED_JOB_DURATION = Histogram(
+    "irrigation_scheduled_job_duration_seconds",
+    "Wall time of the scheduled jobs",
+    ["job", "outcome"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600)
+)
+
+# [number of statements, seconds spent], one list per request
+_db_stats: ContextVar[Optional[List[float]]] = ContextVar("db_stats", default=None)
+
+
+def start_db_tracking() -> List[float]:
+    stats = [0, 0.0]
+    _db_stats.set(stats)
+    return stats
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Attaches cursor execution hooks to a (sync) engine, for async engines pass `async_engine.sync_engine`.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        stats = _db_stats.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+
+def observe_request(method: str, route: str, status: int, duration: float, db_stats: List[float]) -> None:
+    REQUEST_LATENCY.labels(method, route, str(status)).observe(duration)
+    DB_QUERIES_PER_REQUEST.labels(route).observe(db_stats[0])
+    DB_TIME_PER_REQUEST.labels(route).observe(db_stats[1])
+
+
+@contextmanager
+def track_outbound(service: str):
+    """
+    Times a call to an external service, e.g. `with track_outbound("gatekeeper"): requests.post(...)`
+    """
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        OUTBOUND_HTTP_LATENCY.labels(service, outcome).observe(time.perf_counter() - start)
+
+
+@contextmanager
+def track_stage(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ANALYSIS_STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def render_metrics() -> bytes:
+    # With several uvicorn workers every process writes to PROMETHEUS_MULTIPROC_DIR and the
+    # scrape aggregates them, otherwise the default in-process registry is used
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+
+    return generate_latest(REGISTRY)
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
@@ -2,3 +2,11 @@ from .crud_user import user
 from .location import location
 from .eto import eto
 from .dataset_operations import dataset
+from .eto_async import eto_async
+from .dataset_operations_async import dataset_async
+from .water_balance import water_balance, irrigation_schedule
+from .depth_weights_async import depth_weights_async
+from .deletion_task import deletion_task
+from .deletion_task_async import deletion_task_async
+from .gatekeeper_route_async import gatekeeper_route_async
+from .job_run import job_run, eto_job_chunk, scheduler_lease
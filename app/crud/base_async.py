@@ -0,0 +1,85 @@
+from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import select, delete
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel
+
+from db.base_class import Base
+
+import traceback
+
+ModelType = TypeVar("ModelType", bound=Base)
+CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
+UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+
+
+class AsyncCRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    def __init__(self, model: Type[ModelType]):
+        """
+        Async counterpart of `crud.base.CRUDBase`, used with an `AsyncSession`.
+
+        **Parameters**
+
+        * `model`: A SQLAlchemy model class
+        """
+        self.model = model
+
+    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        result = await db.execute(select(self.model).where(self.model.id == id))
+        return result.scalars().first()
+
+    async def get_multi(
+        self, db: AsyncSession, skip: int = 0, limit: int = 100, **kwargs
+    ) -> List[ModelType]:
+        result = await db.execute(select(self.model).offset(skip).limit(limit))
+        return list(result.scalars().all())
+
+    async def create(self, db: AsyncSession, obj_in: CreateSchemaType, **kwargs) -> Optional[ModelType]:
+        obj_in_data = jsonable_encoder(obj_in)
+        db_obj = self.model(**obj_in_data)  # type: ignore
+        db.add(db_obj)
+        try:
+            await db.commit()
+        except SQLAlchemyError:
+            traceback.print_exc()
+            await db.rollback()
+            return None
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def update(
+        self,
+        db: AsyncSession,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]],
+        **kwargs
+    ) -> Optional[ModelType]:
+        obj_data = jsonable_encoder(db_obj)
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
+        for field in obj_data:
+            if field in update_data:
+                setattr(db_obj, field, update_data[field])
+        db.add(db_obj)
+        try:
+            await db.commit()
+        except SQLAlchemyError:
+            traceback.print_exc()
+            await db.rollback()
+            return None
+        await db.refresh(db_obj)
+        return db_obj
+
+    async def remove(self, db: AsyncSession, id: int, **kwargs) -> int:
+        result = await db.execute(delete(self.model).where(self.model.id == id))
+        try:
+            await db.commit()
+        except SQLAlchemyError:
+            traceback.print_exc()
+            await db.rollback()
+            return 0
+        return result.rowcount
@@ -1,8 +1,13 @@
+import datetime
+from typing import List
+
+from sqlalchemy import and_, case, func, select
 from sqlalchemy.orm import Session
 
 from crud.base import CRUDBase
-from models import Dataset as DM
+from models import Dataset as DM, DatasetCatalog
 from schemas import Dataset as DS
+from utils.quality_control import QC_DEPTHS, sm_column
 
 
 class CrudDataset(CRUDBase[DM, DS, dict]):
@@ -36,5 +41,50 @@ class CrudDataset(CRUDBase[DM, DS, dict]):
         db.commit()
         return deleted
 
+    def refresh_catalog(self, db: Session, dataset_ids: List[str]) -> None:
+        """
+        Recomputes the catalog entries of the datasets from their stored readings after readings were removed in
+        bulk, in the caller's transaction. Datasets without readings left lose their entry.
+        """
+
+        if not dataset_ids:
+            return
+
+        depth_columns = [getattr(DM, sm_column(d)) for d in QC_DEPTHS]
+        rows = db.execute(
+            select(
+                DM.dataset_id,
+                func.count(),
+                func.min(DM.date),
+                func.max(DM.date),
+                *[func.max(case((and_(c.isnot(None), c != 0), 1), else_=0)) for c in depth_columns]
+            )
+            .where(DM.dataset_id.in_(dataset_ids))
+            .group_by(DM.dataset_id)
+        ).all()
+
+        entries = {
+            entry.dataset_id: entry
+            for entry in db.execute(
+                select(DatasetCatalog).where(DatasetCatalog.dataset_id.in_(dataset_ids)).with_for_update()
+            ).scalars().all()
+        }
+
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        for row in rows:
+            entry = entries.pop(row[0], None)
+            if entry is None:
+                continue
+
+            entry.row_count = row[1]
+            entry.first_date = row[2]
+            entry.last_date = row[3]
+            entry.active_depths = [d for d, active in zip(QC_DEPTHS, row[4:]) if active]
+            entry.version += 1
+            entry.last_modified = now
+
+        for entry in entries.values():
+            db.delete(entry)
+
 
 dataset = CrudDataset(DM)
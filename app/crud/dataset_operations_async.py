@@ -0,0 +1,194 @@
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, desc, func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.base_async import AsyncCRUDBase
+from db.upsert import upsert_insert
+from models import Dataset as DM, DatasetCatalog
+from schemas import Dataset as DS
+
+
+class CrudDatasetAsync(AsyncCRUDBase[DM, DS, dict]):
+
+    async def add_datasets(
+            self,
+            db: AsyncSession,
+            rows: List[Dict[str, Any]],
+            stats: Dict[str, Dict[str, Any]],
+            rain_modes: Optional[Dict[str, Optional[str]]] = None,
+            corrections: Optional[Dict[int, Dict[str, Any]]] = None
+    ) -> int:
+        """
+        Inserts the prepared readings (utils.ingest) in a single transaction and updates the catalog entries of their
+        datasets in the same transaction, together with the corrected columns of stored readings (id -> {column:
+        value}): the qc_flags the batch adds and the rain_increment once the rain mode of their dataset is known.
+        """
+        try:
+            if rows:
+                await db.execute(insert(DM), rows)
+            if corrections:
+                await db.execute(update(DM), [{"id": id_, **values} for id_, values in corrections.items()])
+            await self._update_catalog(db, stats, rain_modes or {})
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return len(rows)
+
+    async def _update_catalog(
+            self, db: AsyncSession, stats: Dict[str, Dict[str, Any]], rain_modes: Dict[str, Optional[str]]
+    ) -> None:
+        """
+        Adds the batch statistics (rows, first/last day, depths) to the catalog entries of their datasets. The
+        entries are locked, so concurrent uploads to the same dataset are counted one after the other.
+        """
+
+        entries = await self.lock_catalog(db, list(stats))
+
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        for dataset_id, batch in stats.items():
+            entry = entries[dataset_id]
+            entry.row_count += batch["rows"]
+            entry.first_date = min(entry.first_date, batch["first"]) if entry.first_date else batch["first"]
+            entry.last_date = max(entry.last_date, batch["last"]) if entry.last_date else batch["last"]
+            entry.active_depths = sorted(set(entry.active_depths) | batch["depths"])
+            if rain_modes.get(dataset_id) is not None:
+                entry.rain_mode = rain_modes[dataset_id]
+            entry.version += 1
+            entry.last_modified = now
+
+    async def lock_catalog(self, db: AsyncSession, dataset_ids: List[str]) -> Dict[str, DatasetCatalog]:
+        """
+        Catalog entries of the datasets, locked until the transaction ends. Missing entries are inserted empty first,
+        a SELECT ... FOR UPDATE alone locks nothing for a row that does not exist yet and two first uploads of a
+        dataset would both add it. Entries are locked in dataset id order, uploads of several datasets do not
+        deadlock.
+        """
+
+        dataset_ids = sorted(set(dataset_ids))
+        if not dataset_ids:
+            return {}
+
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        await db.execute(upsert_insert(db, DatasetCatalog).values([
+            {"dataset_id": dataset_id, "row_count": 0, "active_depths": [], "version": 0, "last_modified": now}
+            for dataset_id in dataset_ids
+        ]).on_conflict_do_nothing(index_elements=["dataset_id"]))
+
+        result = await db.execute(
+            select(DatasetCatalog)
+            .where(DatasetCatalog.dataset_id.in_(dataset_ids))
+            .order_by(DatasetCatalog.dataset_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return {entry.dataset_id: entry for entry in result.scalars().all()}
+
+    async def get_datasets(self, db: AsyncSession, dataset_id: str) -> List[DM]:
+        result = await db.execute(select(DM).where(DM.dataset_id == dataset_id))
+        return list(result.scalars().all())
+
+    async def get_preceding(
+            self, db: AsyncSession, dataset_id: str, through: datetime.date, limit: int
+    ) -> List[DM]:
+        """
+        The last `limit` stored readings of the dataset up to and including the day, in time order. Readings are
+        stored without their time of day, the ones of the same day are in upload (id) order.
+        """
+        result = await db.execute(
+            select(DM)
+            .where(DM.dataset_id == dataset_id, DM.date <= through)
+            .order_by(desc(DM.date), desc(DM.id))
+            .limit(limit)
+        )
+        return list(reversed(result.scalars().all()))
+
+    async def get_rain_history(
+            self, db: AsyncSession, dataset_id: str
+    ) -> List[Tuple[int, float, Optional[float], Optional[float]]]:
+        """
+        (id, rain, rain of the reading before, rain_increment) of the stored readings with rain of the dataset, in
+        time order. Readings without rain have no increment in either rain mode, so only these are transferred.
+        """
+        readings = select(
+            DM.id,
+            DM.date,
+            DM.rain,
+            func.lag(DM.rain).over(order_by=(DM.date, DM.id)).label("previous"),
+            DM.rain_increment
+        ).where(DM.dataset_id == dataset_id).subquery()
+
+        result = await db.execute(
+            select(readings.c.id, readings.c.rain, readings.c.previous, readings.c.rain_increment)
+            .where(readings.c.rain > 0)
+            .order_by(readings.c.date, readings.c.id)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def get_all_datasets(self, db: AsyncSession, skip: int = 0, limit: Optional[int] = None) -> List[str]:
+        result = await db.execute(
+            select(DatasetCatalog.dataset_id).order_by(DatasetCatalog.dataset_id).offset(skip).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def get_catalog(
+            self,
+            db: AsyncSession,
+            skip: int = 0,
+            limit: int = 100,
+            search: Optional[str] = None,
+            rain_mode: Optional[str] = None,
+            modified_since: Optional[datetime.datetime] = None,
+            from_date: Optional[datetime.date] = None,
+            to_date: Optional[datetime.date] = None
+    ) -> Tuple[int, List[DatasetCatalog]]:
+        """
+        Catalog entries matching the filters, ordered by dataset id, and their total count. from_date/to_date keep
+        the datasets with readings overlapping that interval.
+        """
+
+        conditions = []
+        if search:
+            conditions.append(DatasetCatalog.dataset_id.contains(search, autoescape=True))
+        if rain_mode:
+            conditions.append(DatasetCatalog.rain_mode == rain_mode)
+        if modified_since:
+            conditions.append(DatasetCatalog.last_modified >= modified_since)
+        if from_date:
+            conditions.append(DatasetCatalog.last_date >= from_date)
+        if to_date:
+            conditions.append(DatasetCatalog.first_date <= to_date)
+
+        total = await db.scalar(select(func.count()).select_from(DatasetCatalog).where(*conditions))
+        result = await db.execute(
+            select(DatasetCatalog).where(*conditions).order_by(DatasetCatalog.dataset_id).offset(skip).limit(limit)
+        )
+
+        return total, list(result.scalars().all())
+
+    async def get_catalog_entry(self, db: AsyncSession, dataset_id: str) -> Optional[DatasetCatalog]:
+        return await db.get(DatasetCatalog, dataset_id)
+
+    async def get_change_token(self, db: AsyncSession) -> str:
+        """
+        Token that changes whenever any dataset is uploaded to or deleted, read from the catalog alone.
+        """
+
+        count, versions, last_modified = (await db.execute(
+            select(
+                func.count(), func.coalesce(func.sum(DatasetCatalog.version), 0), func.max(DatasetCatalog.last_modified)
+            )
+        )).one()
+
+        return "{}-{}-{}".format(count, versions, last_modified.isoformat() if last_modified else "")
+
+    async def delete_datasets(self, db: AsyncSession, dataset_id: str) -> int:
+        result = await db.execute(delete(DM).where(DM.dataset_id == dataset_id))
+        await db.execute(delete(DatasetCatalog).where(DatasetCatalog.dataset_id == dataset_id))
+        await db.commit()
+        return result.rowcount
+
+
+dataset_async = CrudDatasetAsync(DM)
@@ -0,0 +1,98 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from crud.base import CRUDBase
+from models import DeletionTask
+from schemas import DeletionTaskDB
+from utils.deletion import DELETION_PENDING, DELETION_RUNNING
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class CrudDeletionTask(CRUDBase[DeletionTask, DeletionTaskDB, dict]):
+
+    def get_by_kind(self, db: Session, id: int, kind: str) -> Optional[DeletionTask]:
+        return db.query(DeletionTask).filter(DeletionTask.id == id, DeletionTask.kind == kind).first()
+
+    def schedule(self, db: Session, kind: str, target: str, total_rows: int) -> DeletionTask:
+        """
+        Creates the deletion task of the target, or returns the one still pending or running for it.
+        """
+
+        task = db.query(DeletionTask).filter(
+            DeletionTask.kind == kind,
+            DeletionTask.target == target,
+            DeletionTask.status.in_([DELETION_PENDING, DELETION_RUNNING])
+        ).first()
+
+        if task is None:
+            now = _now()
+            task = DeletionTask(
+                kind=kind, target=target, status=DELETION_PENDING, total_rows=total_rows, deleted_rows=0,
+                created_at=now, updated_at=now
+            )
+            db.add(task)
+            db.commit()
+            db.refresh(task)
+
+        return task
+
+    def claim_next(self, db: Session) -> Optional[DeletionTask]:
+        """
+        Marks the oldest pending task, or a running one nobody updated for DELETION_TASK_STALE_S (its worker
+        stopped), as running and returns it. The conditional update lets only one worker claim a task.
+        """
+
+        while True:
+            stale = _now() - datetime.timedelta(seconds=settings.DELETION_TASK_STALE_S)
+            candidate = db.execute(
+                select(DeletionTask.id, DeletionTask.status, DeletionTask.updated_at)
+                .where(or_(
+                    DeletionTask.status == DELETION_PENDING,
+                    and_(DeletionTask.status == DELETION_RUNNING, DeletionTask.updated_at < stale)
+                ))
+                .order_by(DeletionTask.id)
+                .limit(1)
+            ).first()
+
+            if candidate is None:
+                return None
+
+            claimed = db.execute(
+                update(DeletionTask)
+                .where(
+                    DeletionTask.id == candidate.id,
+                    DeletionTask.status == candidate.status,
+                    DeletionTask.updated_at == candidate.updated_at
+                )
+                .values(status=DELETION_RUNNING, updated_at=_now())
+            ).rowcount
+            db.commit()
+
+            if claimed == 1:
+                return db.get(DeletionTask, candidate.id)
+
+    def record_progress(
+            self, db: Session, task: DeletionTask, deleted_rows: int, status: Optional[str] = None,
+            error: Optional[str] = None
+    ) -> None:
+        """
+        Adds the rows deleted since the last call and commits them with the task's progress.
+        """
+
+        task.deleted_rows += deleted_rows
+        task.updated_at = _now()
+        if status is not None:
+            task.status = status
+        if error is not None:
+            task.error = error
+        db.commit()
+
+
+deletion_task = CrudDeletionTask(DeletionTask)
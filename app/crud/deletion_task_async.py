@@ -0,0 +1,43 @@
+import datetime
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.base_async import AsyncCRUDBase
+from models import DeletionTask
+from schemas import DeletionTaskDB
+from utils.deletion import DELETION_PENDING, DELETION_RUNNING
+
+
+class CrudDeletionTaskAsync(AsyncCRUDBase[DeletionTask, DeletionTaskDB, dict]):
+
+    async def get_by_kind(self, db: AsyncSession, id: int, kind: str) -> Optional[DeletionTask]:
+        result = await db.execute(select(DeletionTask).where(DeletionTask.id == id, DeletionTask.kind == kind))
+        return result.scalars().first()
+
+    async def schedule(self, db: AsyncSession, kind: str, target: str, total_rows: int) -> DeletionTask:
+        """
+        Creates the deletion task of the target, or returns the one still pending or running for it.
+        """
+
+        result = await db.execute(select(DeletionTask).where(
+            DeletionTask.kind == kind,
+            DeletionTask.target == target,
+            DeletionTask.status.in_([DELETION_PENDING, DELETION_RUNNING])
+        ))
+        task = result.scalars().first()
+
+        if task is None:
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            task = DeletionTask(
+                kind=kind, target=target, status=DELETION_PENDING, total_rows=total_rows, deleted_rows=0,
+                created_at=now, updated_at=now
+            )
+            db.add(task)
+            await db.commit()
+
+        return task
+
+
+deletion_task_async = CrudDeletionTaskAsync(DeletionTask)
@@ -0,0 +1,71 @@
+import datetime
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import DepthWeights
+from utils.depth_weights import DEFAULT_WEIGHTS_PROFILE, WeightsSnapshot, weights_snapshot, default_weights_snapshot
+
+
+class CrudDepthWeightsAsync:
+
+    async def get_profile(self, db: AsyncSession, profile: str) -> Optional[DepthWeights]:
+        return await db.get(DepthWeights, profile)
+
+    async def get_snapshot(self, db: AsyncSession, dataset_id: Optional[str] = None) -> WeightsSnapshot:
+        """
+        Weights an analysis of the dataset runs with: its own profile, else the stored default profile, else the
+        built-in GLOBAL_WEIGHTS. Read in one query, so a concurrent change never mixes two versions.
+        """
+
+        profiles = [DEFAULT_WEIGHTS_PROFILE] if dataset_id is None else [dataset_id, DEFAULT_WEIGHTS_PROFILE]
+        result = await db.execute(select(DepthWeights).where(DepthWeights.profile.in_(profiles)))
+        rows = {row.profile: row for row in result.scalars().all()}
+
+        for profile in profiles:
+            if profile in rows:
+                return weights_snapshot(profile, rows[profile].version, rows[profile].weights)
+
+        return default_weights_snapshot()
+
+    async def set_profile(self, db: AsyncSession, profile: str, weights: Dict[int, float]) -> int:
+        """
+        Stores the weights of the profile and returns its new version.
+        """
+
+        values = {
+            "weights": {str(depth): weight for depth, weight in weights.items()},
+            "updated_at": datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None),
+        }
+
+        # Bump the version in the UPDATE itself so concurrent writers from other workers never reuse one
+        result = await db.execute(
+            update(DepthWeights)
+            .where(DepthWeights.profile == profile)
+            .values(version=DepthWeights.version + 1, **values)
+            .returning(DepthWeights.version)
+        )
+        version = result.scalar_one_or_none()
+
+        if version is None:
+            db.add(DepthWeights(profile=profile, version=1, **values))
+            version = 1
+
+        try:
+            await db.commit()
+        except IntegrityError:
+            # Another worker created the profile first
+            await db.rollback()
+            return await self.set_profile(db, profile, weights)
+
+        return version
+
+    async def delete_profile(self, db: AsyncSession, profile: str) -> int:
+        result = await db.execute(delete(DepthWeights).where(DepthWeights.profile == profile))
+        await db.commit()
+        return result.rowcount
+
+
+depth_weights_async = CrudDepthWeightsAsync()
@@ -1,7 +1,7 @@
 import datetime
 from typing import Optional, List
 
-from sqlalchemy import desc
+from sqlalchemy import desc, func
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
@@ -33,6 +33,14 @@ class CrudEto(CRUDBase[Eto, EtoCreate, EtoUpdate]):
     def get_calculations(self, db: Session, from_date:datetime.date, to_date: datetime.date, location_id: int):
         return db.query(Eto).filter(Eto.location_id == location_id, Eto.date >= from_date, Eto.date <= to_date).order_by(desc(Eto.date)).all()
 
+    def count_by_location(self, db: Session, location_id: int) -> int:
+        return db.query(func.count(Eto.id)).filter(Eto.location_id == location_id).scalar()
+
+    def get_calculations_for_locations(
+            self, db: Session, from_date: datetime.date, to_date: datetime.date, location_ids: List[int]
+    ) -> List[Eto]:
+        return db.query(Eto).filter(Eto.location_id.in_(location_ids), Eto.date >= from_date, Eto.date <= to_date).all()
+
     def batch_create(self, db: Session, obj_in: List[EtoCreate], **kwargs) -> Optional[List[Eto]]:
         db_objects = []
 
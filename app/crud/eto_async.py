@@ -0,0 +1,77 @@
+import datetime
+from typing import Optional, List, Tuple
+
+from sqlalchemy import desc, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from crud.base_async import AsyncCRUDBase
+from models import Eto, Location
+from schemas import EtoCreate, EtoUpdate
+
+
+class CrudEtoAsync(AsyncCRUDBase[Eto, EtoCreate, EtoUpdate]):
+
+    async def create(self, db: AsyncSession, obj_in: EtoCreate, **kwargs) -> Optional[Eto]:
+        location_db = await db.get(Location, obj_in.location_id)
+
+        if not location_db:
+            return None
+
+        db_obj = Eto(**obj_in.model_dump())
+        db.add(db_obj)
+        try:
+            await db.commit()
+        except SQLAlchemyError:
+            await db.rollback()
+            return None
+        await db.refresh(db_obj)
+
+        return db_obj
+
+    async def get_calculations(
+            self, db: AsyncSession, from_date: datetime.date, to_date: datetime.date, location_id: int
+    ) -> List[Eto]:
+        result = await db.execute(
+            select(Eto)
+            .where(Eto.location_id == location_id, Eto.date >= from_date, Eto.date <= to_date)
+            .order_by(desc(Eto.date))
+        )
+        return list(result.scalars().all())
+
+    async def get_version(
+            self, db: AsyncSession, from_date: datetime.date, to_date: datetime.date, location_id: int
+    ) -> Tuple[int, Optional[int]]:
+        """
+        Row count and highest id of the ETo of the location in the interval. ETo rows are only ever inserted or
+        deleted, so any change to the calculations changes one of the two.
+        """
+
+        count, max_id = (await db.execute(
+            select(func.count(), func.max(Eto.id))
+            .where(Eto.location_id == location_id, Eto.date >= from_date, Eto.date <= to_date)
+        )).one()
+
+        return count, max_id
+
+    async def batch_create(self, db: AsyncSession, obj_in: List[EtoCreate], **kwargs) -> Optional[List[Eto]]:
+        result = await db.execute(
+            select(Location.id).where(Location.id.in_({x.location_id for x in obj_in}))
+        )
+        location_ids = set(result.scalars().all())
+
+        # Same as the sync version, skip rows whose location was removed in the meantime
+        db_objects = [Eto(**obj.model_dump()) for obj in obj_in if obj.location_id in location_ids]
+
+        db.add_all(db_objects)
+
+        try:
+            await db.commit()
+        except SQLAlchemyError:
+            await db.rollback()
+            return None
+
+        return db_objects
+
+
+eto_async = CrudEtoAsync(Eto)
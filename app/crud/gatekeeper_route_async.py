@@ -0,0 +1,42 @@
+import datetime
+from typing import Dict, Iterable, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.upsert import upsert_insert
+from models import GatekeeperRoute
+
+
+class CrudGatekeeperRouteAsync:
+
+    async def get_registered(self, db: AsyncSession, route_hashes: Iterable[str]) -> Set[str]:
+        result = await db.execute(
+            select(GatekeeperRoute.route_hash).where(GatekeeperRoute.route_hash.in_(list(route_hashes)))
+        )
+        return set(result.scalars().all())
+
+    async def mark_registered(self, db: AsyncSession, routes: Dict[str, Dict]) -> None:
+        """
+        Records the routes (route hash -> registration payload) as registered, replicas registering the same routes
+        concurrently do not conflict.
+        """
+
+        if not routes:
+            return
+
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        statement = upsert_insert(db, GatekeeperRoute).values([
+            {
+                "route_hash": route_hash,
+                "endpoint": payload["endpoint"],
+                "methods": ",".join(payload["methods"]),
+                "registered_at": now
+            }
+            for route_hash, payload in routes.items()
+        ])
+        await db.execute(statement.on_conflict_do_nothing(index_elements=["route_hash"]))
+        await db.commit()
+
+
+gatekeeper_route_async = CrudGatekeeperRouteAsync()
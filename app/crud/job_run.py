@@ -0,0 +1,215 @@
+import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from db.upsert import upsert_insert
+from models import Eto, EtoJobChunk, JobRun, SchedulerLease
+from utils.job_runs import CHUNK_DONE, CHUNK_FAILED, CHUNK_PENDING, CHUNK_RUNNING
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _db_now(db: Session) -> datetime.datetime:
+    # Naive UTC like the stored timestamps, PostgreSQL answers in the session time zone
+    now = db.execute(select(func.now())).scalar()
+    if now.tzinfo is not None:
+        now = now.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return now
+
+
+class CrudJobRun:
+
+    def start(self, db: Session, job_id: str, worker: str, status: str) -> JobRun:
+        run = JobRun(job_id=job_id, worker=worker, status=status, started_at=_now())
+        db.add(run)
+        db.commit()
+        db.refresh(run)
+        return run
+
+    def finish(self, db: Session, run: JobRun, status: str, duration_s: float, error: Optional[str] = None) -> None:
+        run.status = status
+        run.finished_at = _now()
+        run.duration_s = duration_s
+        run.error = error
+        db.commit()
+
+    def discard(self, db: Session, run: JobRun) -> None:
+        db.delete(run)
+        db.commit()
+
+    def get(self, db: Session, id: int) -> Optional[JobRun]:
+        return db.get(JobRun, id)
+
+    def get_recent(self, db: Session, job_id: str, limit: int = 20) -> List[JobRun]:
+        return db.query(JobRun).filter(JobRun.job_id == job_id).order_by(JobRun.id.desc()).limit(limit).all()
+
+    def set_status(self, db: Session, run: JobRun, status: str, error: Optional[str] = None) -> None:
+        run.status = status
+        run.error = error
+        db.commit()
+
+
+class CrudEtoJobChunk:
+
+    def plan(self, db: Session, run_id: int, date: datetime.date, chunks: List[List[int]]) -> List[EtoJobChunk]:
+        planned = [
+            EtoJobChunk(
+                run_id=run_id, chunk=i, date=date, status=CHUNK_PENDING, location_ids=location_ids,
+                locations=len(location_ids), stored=0, failed=0, attempts=0
+            )
+            for i, location_ids in enumerate(chunks)
+        ]
+        db.add_all(planned)
+        db.commit()
+        return planned
+
+    def get_unfinished(
+            self, db: Session, run_id: Optional[int] = None, since: Optional[datetime.date] = None
+    ) -> List[EtoJobChunk]:
+        """
+        Chunks not done, of the run or of the runs for days from since on, in run and chunk order.
+        """
+
+        query = db.query(EtoJobChunk).filter(EtoJobChunk.status != CHUNK_DONE)
+        if run_id is not None:
+            query = query.filter(EtoJobChunk.run_id == run_id)
+        if since is not None:
+            query = query.filter(EtoJobChunk.date >= since)
+
+        return query.order_by(EtoJobChunk.run_id, EtoJobChunk.chunk).all()
+
+    def summary(self, db: Session, run_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Chunks per status and stored/failed locations of the runs.
+        """
+
+        summaries = {run_id: {"chunks": {}, "stored": 0, "failed": 0} for run_id in run_ids}
+        rows = db.execute(
+            select(
+                EtoJobChunk.run_id, EtoJobChunk.status, func.count(), func.sum(EtoJobChunk.stored),
+                func.sum(EtoJobChunk.failed)
+            )
+            .where(EtoJobChunk.run_id.in_(run_ids))
+            .group_by(EtoJobChunk.run_id, EtoJobChunk.status)
+        ).all()
+
+        for run_id, status, chunks, stored, failed in rows:
+            summaries[run_id]["chunks"][status] = chunks
+            summaries[run_id]["stored"] += stored or 0
+            summaries[run_id]["failed"] += failed or 0
+
+        return summaries
+
+    def claim(self, db: Session, chunk: EtoJobChunk) -> Optional[int]:
+        """
+        Marks a pending or failed chunk, or a running one without a checkpoint for ETO_JOB_CHUNK_STALE_S (its worker
+        stopped), as running by this caller and returns the number of the attempt, None when it is not claimable.
+        The conditional update lets only one run, resume or CLI call compute it.
+        """
+
+        now = _now()
+        stale = now - datetime.timedelta(seconds=settings.ETO_JOB_CHUNK_STALE_S)
+        claimed = db.execute(
+            update(EtoJobChunk)
+            .where(
+                EtoJobChunk.id == chunk.id,
+                or_(
+                    EtoJobChunk.status.in_([CHUNK_PENDING, CHUNK_FAILED]),
+                    and_(EtoJobChunk.status == CHUNK_RUNNING, EtoJobChunk.started_at < stale)
+                )
+            )
+            .values(status=CHUNK_RUNNING, attempts=EtoJobChunk.attempts + 1, started_at=now, finished_at=None)
+            .returning(EtoJobChunk.attempts)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        db.commit()
+        db.refresh(chunk)
+
+        return claimed
+
+    def _checkpoint(self, db: Session, chunk: EtoJobChunk, attempt: int, **values) -> bool:
+        # Only the attempt that claimed the chunk last checkpoints it, a stale one that was taken over is refused
+        return db.execute(
+            update(EtoJobChunk)
+            .where(EtoJobChunk.id == chunk.id, EtoJobChunk.status == CHUNK_RUNNING, EtoJobChunk.attempts == attempt)
+            .values(finished_at=_now(), **values)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+
+    def complete(
+            self, db: Session, chunk: EtoJobChunk, attempt: int, rows: List[Dict[str, Any]],
+            failed_location_ids: List[int], duration_s: float
+    ) -> bool:
+        """
+        Stores the ETo rows of the chunk and its checkpoint in one transaction, nothing when the claim was lost.
+        """
+
+        if not self._checkpoint(
+                db, chunk, attempt, status=CHUNK_FAILED if failed_location_ids else CHUNK_DONE,
+                failed_location_ids=failed_location_ids, stored=EtoJobChunk.stored + len(rows),
+                failed=len(failed_location_ids), duration_s=duration_s, error=None
+        ):
+            db.rollback()
+            return False
+
+        if rows:
+            db.execute(insert(Eto), rows)
+        db.commit()
+        db.refresh(chunk)
+        return True
+
+    def fail(
+            self, db: Session, chunk: EtoJobChunk, attempt: int, location_ids: List[int], duration_s: float, error: str
+    ) -> bool:
+        failed = self._checkpoint(
+            db, chunk, attempt, status=CHUNK_FAILED, failed_location_ids=location_ids, failed=len(location_ids),
+            duration_s=duration_s, error=error
+        )
+        db.commit()
+        db.refresh(chunk)
+        return failed
+
+
+class CrudSchedulerLease:
+
+    def acquire(self, db: Session, name: str, holder: str, ttl_s: float) -> bool:
+        """
+        Takes or renews the lease for ttl_s seconds. The conditional update lets only one process hold it, another
+        one gets it once the holder stopped renewing it. Expiry is judged by the database clock, the clocks of the
+        workers and replicas may disagree.
+        """
+
+        db.execute(upsert_insert(db, SchedulerLease).values(
+            name=name, holder=None, expires_at=datetime.datetime.min
+        ).on_conflict_do_nothing(index_elements=["name"]))
+
+        now = _db_now(db)
+        acquired = db.execute(
+            update(SchedulerLease)
+            .where(
+                SchedulerLease.name == name,
+                or_(SchedulerLease.holder == holder, SchedulerLease.holder.is_(None), SchedulerLease.expires_at < now)
+            )
+            .values(holder=holder, expires_at=now + datetime.timedelta(seconds=ttl_s))
+        ).rowcount
+        db.commit()
+
+        return acquired == 1
+
+    def release(self, db: Session, name: str, holder: str) -> None:
+        db.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+            .values(holder=None, expires_at=_db_now(db))
+        )
+        db.commit()
+
+
+job_run = CrudJobRun()
+eto_job_chunk = CrudEtoJobChunk()
+scheduler_lease = CrudSchedulerLease()
@@ -1,16 +1,117 @@
-from typing import List
+from typing import List, Dict, Iterable, Optional
 
+from sqlalchemy import delete, insert
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from crud.base import CRUDBase
 from models.location import Location
+from models.eto import CropKc
 from schemas import LocationCreate, LocationUpdate
+from utils.grid import grid_cell_key, group_by_grid_cell
 
 
 class CrudLocation(CRUDBase[Location, LocationCreate, LocationUpdate]):
 
+    def create(self, db: Session, obj_in: LocationCreate, **kwargs) -> Location:
+        db_obj = Location(
+            **obj_in.model_dump(),
+            grid_cell=grid_cell_key(obj_in.latitude, obj_in.longitude)
+        )
+        db.add(db_obj)
+        try:
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+        db.refresh(db_obj)
+
+        return db_obj
+
+    def create_multi(self, db: Session, obj_in: List[LocationCreate]) -> Optional[int]:
+        """
+        Insert all locations in one transaction, returns how many were inserted (None on failure).
+        """
+
+        if not obj_in:
+            return 0
+
+        try:
+            db.execute(insert(Location), [
+                {**obj.model_dump(), "grid_cell": grid_cell_key(obj.latitude, obj.longitude)} for obj in obj_in
+            ])
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+
+        return len(obj_in)
+
+    def remove(self, db: Session, id: int, **kwargs) -> int:
+        """
+        Set-based delete, the database removes the location's ETo, water balance and schedule (ON DELETE CASCADE)
+        without loading them. Returns how many locations were deleted.
+        """
+
+        result = db.execute(delete(Location).where(Location.id == id))
+        try:
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return 0
+
+        return result.rowcount
+
     def get_all(self, db: Session) -> List[Location]:
         return db.query(Location).all()
 
+    def get_with_water_balance_inputs(self, db: Session) -> List[Location]:
+        """
+        Locations with a soil type and a crop with rooting parameters, the ones a water balance can be computed for.
+        """
+
+        return db.query(Location).join(CropKc, Location.crop == CropKc.crop).filter(
+            Location.soil_type.isnot(None),
+            CropKc.root_depth_m.isnot(None),
+            CropKc.depletion_fraction.isnot(None)
+        ).order_by(Location.id).all()
+
+    def get_by_ids(self, db: Session, ids: List[int]) -> List[Location]:
+        return db.query(Location).filter(Location.id.in_(ids)).order_by(Location.id).all()
+
+    def get_by_grid_cell(self, db: Session, grid_cell: str) -> List[Location]:
+        return db.query(Location).filter(Location.grid_cell == grid_cell).all()
+
+    def get_in_grid_cells(self, db: Session, grid_cells: Iterable[str]) -> List[Location]:
+        return db.query(Location).filter(Location.grid_cell.in_(set(grid_cells))).all()
+
+    def get_grouped_by_grid_cell(
+            self, db: Session, location_ids: Optional[Iterable[int]] = None
+    ) -> Dict[str, List[Location]]:
+        """
+        All locations (or the existing ones of location_ids) grouped by weather grid cell. Locations without a cell,
+        or with a cell of another resolution (after WEATHER_GRID_RESOLUTION_DEG changed), are (re)assigned first.
+        """
+
+        if location_ids is None:
+            locations = self.get_all(db)
+        else:
+            locations = db.query(Location).filter(Location.id.in_(list(location_ids))).all()
+
+        stale = False
+        for l in locations:
+            key = grid_cell_key(l.latitude, l.longitude)
+            if l.grid_cell != key:
+                l.grid_cell = key
+                stale = True
+
+        if stale:
+            try:
+                db.commit()
+            except SQLAlchemyError:
+                db.rollback()
+
+        return group_by_grid_cell(locations)
+
 
 location = CrudLocation(Location)
@@ -0,0 +1,90 @@
+import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from models import WaterBalance, IrrigationSchedule
+
+
+class CrudWaterBalance:
+
+    def get_range(
+            self, db: Session, location_id: int, from_date: datetime.date, to_date: datetime.date
+    ) -> List[WaterBalance]:
+        return db.query(WaterBalance).filter(
+            WaterBalance.location_id == location_id, WaterBalance.date >= from_date, WaterBalance.date <= to_date
+        ).order_by(WaterBalance.date).all()
+
+    def get_last_states(self, db: Session, location_ids: List[int]) -> Dict[int, Tuple[datetime.date, float]]:
+        """
+        Last stored (date, depletion_mm) per location, the starting state of the next incremental run.
+        """
+
+        last_dates = (
+            select(WaterBalance.location_id, func.max(WaterBalance.date).label("date"))
+            .where(WaterBalance.location_id.in_(location_ids))
+            .group_by(WaterBalance.location_id)
+            .subquery()
+        )
+        rows = db.execute(
+            select(WaterBalance.location_id, WaterBalance.date, WaterBalance.depletion_mm).join(
+                last_dates,
+                (WaterBalance.location_id == last_dates.c.location_id) & (WaterBalance.date == last_dates.c.date)
+            )
+        ).all()
+
+        return {r[0]: (r[1], r[2]) for r in rows}
+
+    def replace(
+            self, db: Session, location_ids: List[int], from_date: datetime.date, rows: List[Dict[str, Any]]
+    ) -> Optional[int]:
+        """
+        Replace the stored days from from_date onwards of the locations with the rows, in one transaction.
+        """
+
+        try:
+            db.execute(
+                delete(WaterBalance).where(WaterBalance.location_id.in_(location_ids), WaterBalance.date >= from_date)
+            )
+            if rows:
+                db.execute(insert(WaterBalance), rows)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+
+        return len(rows)
+
+
+class CrudIrrigationSchedule:
+
+    def get(self, db: Session, location_id: int) -> Optional[IrrigationSchedule]:
+        return db.get(IrrigationSchedule, location_id)
+
+    def get_multi(self, db: Session, skip: int = 0, limit: int = 1000) -> List[IrrigationSchedule]:
+        return db.query(IrrigationSchedule).order_by(IrrigationSchedule.location_id).offset(skip).limit(limit).all()
+
+    def replace(self, db: Session, location_ids: List[int], rows: List[Dict[str, Any]]) -> Optional[int]:
+        """
+        Store the rows of the latest run in one transaction. Schedules of locations outside location_ids (which no
+        longer have a water balance) are dropped, those of locations without a new row are kept.
+        """
+
+        try:
+            db.execute(delete(IrrigationSchedule).where(
+                IrrigationSchedule.location_id.not_in(location_ids)
+                | IrrigationSchedule.location_id.in_([r["location_id"] for r in rows])
+            ))
+            if rows:
+                db.execute(insert(IrrigationSchedule), rows)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            return None
+
+        return len(rows)
+
+water_balance = CrudWaterBalance()
+irrigation_schedule = CrudIrrigationSchedule()
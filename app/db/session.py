@@ -1,7 +1,33 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 
 from core.config import settings
+from core.metrics import instrument_engine
 
 engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Request path, concurrency is bounded by the connection pool rather than by the threadpool
+async_pool_options = {}
+if not settings.ASYNC_SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+    async_pool_options = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+
+async_engine = create_async_engine(settings.ASYNC_SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, **async_pool_options)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only enforces foreign keys, and their ON DELETE CASCADE, when asked to on every connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+if settings.SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+    event.listen(engine, "connect", _enable_sqlite_foreign_keys)
+if settings.ASYNC_SQLALCHEMY_DATABASE_URI.startswith("sqlite"):
+    event.listen(async_engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
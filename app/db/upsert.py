@@ -0,0 +1,18 @@
+from typing import Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+def upsert_insert(db: Union[Session, AsyncSession], model):
+    """
+    INSERT of the model with the ON CONFLICT clauses (on_conflict_do_nothing/on_conflict_do_update) of the
+    session's database, PostgreSQL in production and SQLite for development and load tests.
+    """
+
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    return insert(model)
@@ -1,70 +1,180 @@
-import requests
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import random
+from typing import Any, Dict, Optional
+
+import httpx
 from fastapi import APIRouter
-from requests import RequestException
+from sqlalchemy.exc import SQLAlchemyError
 
+import crud
 from core.config import settings
+from core.metrics import track_outbound
+from db.session import AsyncSessionLocal
 
-from api.api_v1.endpoints import dataset, eto, location
+from api.api_v1.endpoints import dataset, eto, location, water_balance
 
-def register_apis_to_gatekeeper():
+logger = logging.getLogger(__name__)
 
-    try:
-        at = requests.post(
-            url=str(settings.GATEKEEPER_BASE_URL) + "/api/login/",
-            headers={"Content-Type": "application/json"},
-            json={
-                "username": "{}".format(settings.GATEKEEPER_USERNAME),
-                "password": "{}".format(settings.GATEKEEPER_PASSWORD)
-            }
-        )
-    except RequestException:
-        return
+REGISTRATION_DISABLED = "disabled"
+REGISTRATION_PENDING = "pending"
+REGISTRATION_RUNNING = "running"
+REGISTRATION_DONE = "done"
+REGISTRATION_FAILED = "failed"
+
+# Registration state of this process, served by GET /gatekeeper/status
+_status: Dict[str, Any] = {
+    "status": REGISTRATION_PENDING if settings.USING_GATEKEEPER else REGISTRATION_DISABLED,
+    "route_table_hash": None,
+    "routes": 0,
+    "registered": 0,
+    "skipped": 0,
+    "failed": 0,
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+}
 
-    temp = at.json()
 
-    access = temp["access"]
-    refresh = temp["refresh"]
+def registration_status() -> Dict[str, Any]:
+    return dict(_status)
 
 
-    # Registration
+def gatekeeper_routes() -> Dict[str, Dict[str, Any]]:
+    """
+    Registration payloads of the routes exposed through Gatekeeper, by the hash of the payload and Gatekeeper URL.
+    """
 
     apis_to_register = APIRouter()
 
     apis_to_register.include_router(dataset.router, prefix="/dataset")
     apis_to_register.include_router(eto.router, prefix="/eto")
     apis_to_register.include_router(location.router, prefix="/location")
+    apis_to_register.include_router(water_balance.router, prefix="/water-balance")
 
+    routes = {}
     for api in apis_to_register.routes:
+        payload = {
+            "base_url": "http://{}:{}/".format(settings.SERVICE_NAME, settings.SERVICE_PORT),
+            "service_name": settings.SERVICE_NAME,
+            "endpoint": "api/v1/" + api.path.strip("/"),
+            "methods": sorted(api.methods)
+        }
+        # A route registered with another Gatekeeper instance is registered again
+        key = json.dumps(dict(payload, gatekeeper=str(settings.GATEKEEPER_BASE_URL)), sort_keys=True)
+        routes[hashlib.sha256(key.encode()).hexdigest()] = payload
+
+    return routes
+
+
+def route_table_hash(routes: Dict[str, Dict[str, Any]]) -> str:
+    return hashlib.sha256("".join(sorted(routes)).encode()).hexdigest()
 
+
+async def _post(
+        client: httpx.AsyncClient, path: str, payload: Dict[str, Any], access: Optional[str] = None
+) -> httpx.Response:
+    """
+    POST to Gatekeeper, retried with exponential backoff and full jitter on network errors, 429 and 5xx.
+    """
+
+    headers = {"Authorization": "Bearer {}".format(access)} if access else {}
+
+    for attempt in range(settings.GATEKEEPER_REGISTRATION_RETRIES + 1):
         try:
-            requests.post(
-                url=str(settings.GATEKEEPER_BASE_URL) + "/api/register_service/",
-                headers={"Content-Type": "application/json", "Authorization" : "Bearer {}".format(access)},
-                json={
-                    "base_url": "http://{}:{}/".format(settings.SERVICE_NAME, settings.SERVICE_PORT),
-                    "service_name": settings.SERVICE_NAME,
-                    "endpoint": "api/v1/" + api.path.strip("/"),
-                    "methods": list(api.methods)
-                }
+            with track_outbound("gatekeeper"):
+                response = await client.post(path, json=payload, headers=headers)
+            if response.status_code != 429 and response.status_code < 500:
+                break
+            error = httpx.HTTPStatusError(
+                "{} answered {}".format(path, response.status_code), request=response.request, response=response
             )
-        except RequestException:
+        except httpx.TransportError as e:
+            error = e
+
+        if attempt == settings.GATEKEEPER_REGISTRATION_RETRIES:
+            raise error
+        await asyncio.sleep(random.uniform(0, settings.GATEKEEPER_REGISTRATION_BACKOFF_S * 2 ** attempt))
+
+    response.raise_for_status()
+    return response
+
+
+async def _register(routes: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Registers the routes concurrently over one pooled client and one Gatekeeper session, returns the ones that
+    were registered. A route failing after all retries does not stop the others.
+    """
+
+    async with httpx.AsyncClient(
+            base_url=str(settings.GATEKEEPER_BASE_URL),
+            headers={"Content-Type": "application/json"},
+            timeout=settings.GATEKEEPER_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=settings.GATEKEEPER_REGISTRATION_CONCURRENCY)
+    ) as client:
+        tokens = (await _post(client, "/api/login/", {
+            "username": "{}".format(settings.GATEKEEPER_USERNAME),
+            "password": "{}".format(settings.GATEKEEPER_PASSWORD)
+        })).json()
+
+        semaphore = asyncio.Semaphore(settings.GATEKEEPER_REGISTRATION_CONCURRENCY)
+
+        async def register(route_hash: str, payload: Dict[str, Any]) -> Optional[str]:
+            async with semaphore:
+                try:
+                    await _post(client, "/api/register_service/", payload, tokens["access"])
+                except httpx.HTTPError as e:
+                    logger.warning("Gatekeeper registration of %s failed: %s", payload["endpoint"], e)
+                    _status["failed"] += 1
+                    return None
+
+            _status["registered"] += 1
+            return route_hash
+
+        try:
+            done = await asyncio.gather(*(register(h, p) for h, p in routes.items()))
+        finally:
             try:
-                requests.post(
-                    url=str(settings.GATEKEEPER_BASE_URL) + "/api/logout/",
-                    headers={"Content-Type": "application/json"},
-                    json={"refresh": refresh}
-                )
-            except RequestException:
-                return
-            return
+                await client.post("/api/logout/", json={"refresh": tokens["refresh"]})
+            except httpx.HTTPError:
+                pass
+
+    return {route_hash: routes[route_hash] for route_hash in done if route_hash is not None}
+
+
+async def register_apis_to_gatekeeper() -> None:
+    """
+    Registers the routes with Gatekeeper, run as a background task after startup. Routes recorded in the
+    gatekeeper_route table are skipped, so restarts with an unchanged route table make no Gatekeeper call at all.
+    Replicas starting together wait a random GATEKEEPER_REGISTRATION_JITTER_S before calling Gatekeeper.
+    Routes that still fail are retried on the next start.
+    """
+
+    routes = gatekeeper_routes()
+    _status.update(
+        status=REGISTRATION_RUNNING, route_table_hash=route_table_hash(routes), routes=len(routes), registered=0,
+        skipped=0, failed=0, started_at=datetime.datetime.now(datetime.timezone.utc), finished_at=None, error=None
+    )
 
     try:
-        requests.post(
-            url=str(settings.GATEKEEPER_BASE_URL) + "/api/logout/",
-            headers={"Content-Type": "application/json"},
-            json={"refresh": refresh}
-        )
-    except RequestException:
-        return
+        async with AsyncSessionLocal() as db:
+            registered = await crud.gatekeeper_route_async.get_registered(db, routes)
+
+        pending = {route_hash: payload for route_hash, payload in routes.items() if route_hash not in registered}
+        _status["skipped"] = len(routes) - len(pending)
+
+        if pending:
+            await asyncio.sleep(random.uniform(0, settings.GATEKEEPER_REGISTRATION_JITTER_S))
+            done = await _register(pending)
+            async with AsyncSessionLocal() as db:
+                await crud.gatekeeper_route_async.mark_registered(db, done)
 
-    return
\ No newline at end of file
+        _status["status"] = REGISTRATION_FAILED if _status["failed"] else REGISTRATION_DONE
+    except (httpx.HTTPError, SQLAlchemyError, ValueError, KeyError) as e:
+        logger.warning("Gatekeeper registration failed: %s", e)
+        _status.update(status=REGISTRATION_FAILED, error=str(e))
+    finally:
+        _status["finished_at"] = datetime.datetime.now(datetime.timezone.utc)
@@ -1,32 +1,47 @@
+from sqlalchemy import func
+
 from models import CropKc
 
 from core.config import INITIAL_KC
 from db.session import SessionLocal
-from api import deps
+from db.upsert import upsert_insert
+
+# Added after the first release, filled in on rows created before them
+_LATER_COLUMNS = ("root_depth_m", "depletion_fraction", "l_ini", "l_dev", "l_mid", "l_late")
 
 
 def insert_crop_kc_into_db():
     """
-    Inserts default KC values into DB only if missing.
+    Inserts default KC values into DB only if missing, in one statement. Existing crops keep their values and only
+    get the ones they are missing.
     """
     db = SessionLocal()
 
     try:
-        for crop_name, kc_values in INITIAL_KC.items():
-            kc_init, kc_mid, kc_end = kc_values
-
-            exists = db.query(CropKc).filter_by(crop=crop_name).first()
-            if exists:
-                continue
-
-            entry = CropKc(
-                crop=crop_name,
-                kc_init=kc_init,
-                kc_mid=kc_mid,
-                kc_end=kc_end
-            )
-            db.add(entry)
-
+        statement = upsert_insert(db, CropKc).values([
+            {
+                "crop": crop_name,
+                "kc_init": kc_init,
+                "kc_mid": kc_mid,
+                "kc_end": kc_end,
+                "root_depth_m": root_depth_m,
+                "depletion_fraction": depletion_fraction,
+                "l_ini": l_ini,
+                "l_dev": l_dev,
+                "l_mid": l_mid,
+                "l_late": l_late
+            }
+            for crop_name, (
+                kc_init, kc_mid, kc_end, root_depth_m, depletion_fraction, l_ini, l_dev, l_mid, l_late
+            ) in INITIAL_KC.items()
+        ])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["crop"],
+            set_={
+                column: func.coalesce(getattr(CropKc, column), getattr(statement.excluded, column))
+                for column in _LATER_COLUMNS
+            }
+        ))
         db.commit()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -2,28 +2,21 @@ from models import SoilTypeValues
 
 from core.config import SOIL_WILTING_POINTS
 from db.session import SessionLocal
-from api import deps
+from db.upsert import upsert_insert
+
 
 def insert_soil_values_into_db():
     """
-    Inserts default WP values into DB only if missing.
+    Inserts default WP values into DB only if missing, in one statement.
     """
     db = SessionLocal()
 
     try:
-        for soil_type, soil_values in SOIL_WILTING_POINTS.items():
-            fc, wp = soil_values
-            exists = db.query(SoilTypeValues).filter_by(soil_type=soil_type).first()
-            if exists:
-                continue
-
-            entry = SoilTypeValues(
-                soil_type=soil_type,
-                field_capacity=fc,
-                wilting_point=wp
-            )
-            db.add(entry)
-
+        statement = upsert_insert(db, SoilTypeValues).values([
+            {"soil_type": soil_type, "field_capacity": fc, "wilting_point": wp}
+            for soil_type, (fc, wp) in SOIL_WILTING_POINTS.items()
+        ])
+        db.execute(statement.on_conflict_do_nothing(index_elements=["soil_type"]))
         db.commit()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,75 +1,369 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
 from eto import ETo
 from requests import RequestException
-from models import Location
-from schemas import EToInputData, EtoCreate
-from crud import eto
+from sqlalchemy.exc import SQLAlchemyError
+from schemas import EToInputData
+from crud import location, water_balance, irrigation_schedule, deletion_task, eto_job_chunk, job_run
+from models import EtoJobChunk
+from utils.grid import grid_cell_center, grid_cell_key, group_by_grid_cell
+from utils.elevation import lookup_elevations, ElevationLookupError
+from utils.water_balance import compute_water_balance, location_parameters, project_next_irrigation
+from utils.omutils import fetch_daily_forecasts
+from utils.partitions import manage_partitions
+from utils.deletion import DELETION_FAILED, run_deletion_task
+from utils.job_runs import CHUNK_DONE, JOB_SUCCEEDED, IncompleteRunError, plan_chunks
+from core.config import settings
+from core.metrics import track_outbound
 
 import datetime
+import logging
+import time
 import db.session
 import requests
+import numpy as np
 import pandas as pd
 
-def get_weather_data():
-    session = db.session.SessionLocal()
+logger = logging.getLogger(__name__)
 
-    locations = session.query(Location).all()
 
-    if len(locations) == 0:
-        session.close()
-        return
-
-    weather_info = []
-    for l in locations:
-        try:
+def _fetch_cell_weather(cell: str, date: datetime.date) -> Optional[Tuple[EToInputData, Optional[float], float]]:
+    """
+    Daily weather of the day at the center of the grid cell, with its precipitation and model elevation, None when
+    the fetch or the response failed.
+    """
+    latitude, longitude = grid_cell_center(cell)
+    try:
+        with track_outbound("open_meteo"):
             response = requests.get(
-                url="https://api.open-meteo.com/v1/forecast?latitude={}&longitude={}&daily=temperature_2m_max,"
+                url="{}/v1/forecast?latitude={}&longitude={}&daily=temperature_2m_max,"
                     "temperature_2m_mean,relative_humidity_2m_mean,pressure_msl_mean,surface_pressure_mean,"
-                    "wind_speed_10m_mean,temperature_2m_min&timezone=auto&past_days=1&forecast_days=1".format(
-                    l.latitude,
-                    l.longitude),
+                    "wind_speed_10m_mean,temperature_2m_min,precipitation_sum"
+                    "&timezone=auto&start_date={}&end_date={}".format(
+                    settings.OPEN_METEO_BASE_URL.rstrip("/"),
+                    latitude,
+                    longitude,
+                    date.isoformat(),
+                    date.isoformat()),
                 timeout=120
             )
-        except RequestException:
+    except RequestException:
+        return None
+
+    if (response.status_code / 100) != 2:
+        return None
+
+    body = response.json()
+
+    # Attempt to extract information
+    try:
+        weather = EToInputData(
+            t_min=body["daily"]["temperature_2m_min"][0],
+            t_max=body["daily"]["temperature_2m_max"][0],
+            t_mean=body["daily"]["temperature_2m_mean"][0],
+            rh_mean=body["daily"]["relative_humidity_2m_mean"][0],
+            u_z=body["daily"]["wind_speed_10m_mean"][0],
+            p=body["daily"]["surface_pressure_mean"][0] / 10,
+            sea_level=int(body["daily"]["pressure_msl_mean"][0])
+        )
+    except Exception:
+        return None
+
+    return weather, body["daily"].get("precipitation_sum", [None])[0], body["elevation"]
+
+
+def _eto_rows(
+        session, cells: Dict[str, list], date: datetime.date
+) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    ETo rows of the day for the locations of the cells, one fetch and ETo computation per cell, and the ids of the
+    locations whose cell could not be fetched.
+    """
+
+    # Locations created before elevations were stored get theirs from the tile cache
+    without_elevation = [l for members in cells.values() for l in members if l.elevation is None]
+    if without_elevation:
+        try:
+            elevations = lookup_elevations(db=session, points=[(l.latitude, l.longitude) for l in without_elevation])
+            for l, elevation in zip(without_elevation, elevations):
+                l.elevation = elevation
+            session.commit()
+        except (ElevationLookupError, SQLAlchemyError):
+            session.rollback()
+
+    rows = []
+    failed = []
+    for cell, members in cells.items():
+        fetched = _fetch_cell_weather(cell, date)
+        if fetched is None:
+            failed.extend(l.id for l in members)
             continue
 
-        if (response.status_code / 100) != 2:
+        weather, precipitation, model_elevation = fetched
+        latitude, longitude = grid_cell_center(cell)
+
+        # The weather is shared by the cell, ETo is computed once per distinct stored elevation of its members
+        by_elevation = defaultdict(list)
+        for l in members:
+            by_elevation[l.elevation if l.elevation is not None else model_elevation].append(l.id)
+
+        for elevation, location_ids in by_elevation.items():
+            df = pd.DataFrame(data={
+                "T_min": [weather.t_min],
+                "T_max": [weather.t_max],
+                "T_mean": [weather.t_mean],
+                "RH_mean": [weather.rh_mean],
+                "U_z": [weather.u_z],
+                "P": [weather.p]
+            }, index=[datetime.datetime.combine(date, datetime.time())])
+
+            value = ETo(df=df, lat=latitude, lon=longitude, freq="D", z_msl=elevation, z_u=10).eto_fao().iloc[0]
+            rows.extend(
+                {"date": date, "value": value, "precipitation": precipitation, "location_id": location_id}
+                for location_id in location_ids
+            )
+
+    return rows, failed
+
+
+def run_eto_chunks(session, chunks: List[EtoJobChunk], current_run_id: Optional[int] = None) -> None:
+    """
+    Computes and stores the chunks one after the other, each with its checkpoint in its own transaction. A chunk
+    that failed before only computes its failed locations, locations deleted meanwhile are left out. Chunks another
+    run, resume or CLI call is computing are skipped. Raises IncompleteRunError when chunks still have failed
+    locations.
+    """
+
+    incomplete = 0
+    resumed_runs = {chunk.run_id for chunk in chunks} - {current_run_id}
+    for chunk in chunks:
+        attempt = eto_job_chunk.claim(session, chunk)
+        if attempt is None:
             continue
 
-        body = response.json()
+        location_ids = chunk.failed_location_ids if chunk.failed_location_ids is not None else chunk.location_ids
+        started = time.perf_counter()
 
-        # Attempt to extract information
         try:
-            weather = EToInputData(
-                t_min=body["daily"]["temperature_2m_min"][1],
-                t_max=body["daily"]["temperature_2m_max"][1],
-                t_mean=body["daily"]["temperature_2m_mean"][1],
-                rh_mean=body["daily"]["relative_humidity_2m_mean"][1],
-                u_z=body["daily"]["wind_speed_10m_mean"][1],
-                p=body["daily"]["surface_pressure_mean"][1] / 10,
-                sea_level=int(body["daily"]["pressure_msl_mean"][1])
+            cells = location.get_grouped_by_grid_cell(db=session, location_ids=location_ids)
+            rows, failed = _eto_rows(session, cells, chunk.date)
+            checkpointed = eto_job_chunk.complete(
+                session, chunk, attempt, rows, failed, time.perf_counter() - started
             )
-        except Exception:
-            continue
+        except SQLAlchemyError as e:
+            session.rollback()
+            checkpointed = eto_job_chunk.fail(
+                session, chunk, attempt, location_ids, time.perf_counter() - started, str(e).splitlines()[0]
+            )
+
+        if not checkpointed:
+            logger.warning("Chunk %s of ETo run %s was taken over by another worker", chunk.chunk, chunk.run_id)
+        elif chunk.status != CHUNK_DONE:
+            incomplete += 1
+
+    # Earlier runs (failed, or interrupted while running) whose chunks are all done now count as succeeded
+    for run_id in resumed_runs:
+        run = job_run.get(session, run_id)
+        if run.status != JOB_SUCCEEDED and not eto_job_chunk.get_unfinished(session, run_id=run_id):
+            job_run.set_status(session, run, JOB_SUCCEEDED)
+
+    if incomplete:
+        raise IncompleteRunError("{} of {} chunks have locations without ETo".format(incomplete, len(chunks)))
 
-        weather_info.append((weather, l.latitude, l.longitude, l.id, body["elevation"]))
 
-    eto_calculations = []
+def get_weather_data(run_id: int):
+    """
+    Nightly ETo of every location, checkpointed per chunk of ETO_JOB_CHUNK_CELLS weather grid cells in
+    eto_job_chunk under the job run. Unfinished chunks of the runs of the last ETO_JOB_RESUME_DAYS days are
+    resumed first, so an outage only costs the chunks it interrupted.
+    """
+    session = db.session.SessionLocal()
+
+    try:
+        today = datetime.date.today()
+        chunks = []
+        if settings.ETO_JOB_RESUME_DAYS > 0:
+            chunks = eto_job_chunk.get_unfinished(
+                session, since=today - datetime.timedelta(days=settings.ETO_JOB_RESUME_DAYS)
+            )
 
-    for wi in weather_info:
-        df_dict = {
-            "T_min": [wi[0].t_min],
-            "T_max": [wi[0].t_max],
-            "T_mean": [wi[0].t_mean],
-            "RH_mean": [wi[0].rh_mean],
-            "U_z": [wi[0].u_z],
-            "P": [wi[0].p]
-        }
-        df = pd.DataFrame(data=df_dict, index=[datetime.datetime.now()])
+        # One fetch and ETo computation per weather grid cell, fanned out to every location in it
+        cells = location.get_grouped_by_grid_cell(db=session)
+        chunks += eto_job_chunk.plan(session, run_id, today, plan_chunks(cells, settings.ETO_JOB_CHUNK_CELLS))
+
+        run_eto_chunks(session, chunks, current_run_id=run_id)
+    finally:
+        session.close()
 
-        eto_obj = ETo(df=df, lat=wi[1], lon=wi[2], freq="D", z_msl=wi[4], z_u=10)
 
-        eto_calculations.append((wi, eto_obj.eto_fao()))
+def resume_weather_data(run_id: int):
+    """
+    Computes the unfinished chunks of the run again, only their failed locations for chunks that completed.
+    """
+    session = db.session.SessionLocal()
+
+    try:
+        run_eto_chunks(session, eto_job_chunk.get_unfinished(session, run_id=run_id))
+    finally:
+        session.close()
+
 
-    eto.batch_create(db=session, obj_in=[EtoCreate(date=datetime.date.today(), value=c[1].iloc[0], location_id=c[0][3]) for c in eto_calculations])
+def update_water_balance():
+    """
+    Extend the stored water balance of every location with a soil type and crop up to today, starting from the
+    last stored day (or WATER_BALANCE_MAX_DAYS back with a full root zone). Locations are grouped by start date
+    so each group runs as one vectorized pass.
+    """
+    session = db.session.SessionLocal()
+
+    try:
+        locations = location.get_with_water_balance_inputs(db=session)
+
+        if len(locations) == 0:
+            return
+
+        today = datetime.date.today()
+        last_states = water_balance.get_last_states(db=session, location_ids=[l.id for l in locations])
+
+        groups = defaultdict(list)
+        for l in locations:
+            last_date, depletion = last_states.get(
+                l.id, (today - datetime.timedelta(days=settings.WATER_BALANCE_MAX_DAYS + 1), 0.0)
+            )
+            if last_date < today:
+                groups[last_date + datetime.timedelta(days=1)].append((l, depletion))
+
+        for from_date, members in groups.items():
+            group_locations = [m[0] for m in members]
+            rows = compute_water_balance(
+                db=session,
+                locations=group_locations,
+                from_date=from_date,
+                to_date=today,
+                initial_depletion=np.array([m[1] for m in members])
+            )
+            water_balance.replace(
+                db=session, location_ids=[l.id for l in group_locations], from_date=from_date, rows=rows
+            )
+    finally:
+        session.close()
+
+
+def schedule_irrigation():
+    """
+    Project the depletion of every location with a water balance over the Open-Meteo ET0/precipitation forecast
+    and store its next irrigation date and dose. Forecasts are fetched once per weather grid cell, in batched
+    multi-coordinate requests, and the projection runs vectorized across all locations.
+    """
+    session = db.session.SessionLocal()
+
+    try:
+        last_states = {}
+        locations = location.get_with_water_balance_inputs(db=session)
+        if locations:
+            last_states = water_balance.get_last_states(db=session, location_ids=[l.id for l in locations])
+        locations = [l for l in locations if l.id in last_states]
+
+        eligible_ids = [l.id for l in locations]
+
+        if len(locations) == 0:
+            irrigation_schedule.replace(db=session, location_ids=[], rows=[])
+            return
+
+        today = datetime.date.today()
+        forecast_dates = [today + datetime.timedelta(days=i) for i in range(settings.IRRIGATION_FORECAST_DAYS)]
+        date_index = {d.isoformat(): i for i, d in enumerate(forecast_dates)}
+
+        cells = group_by_grid_cell(locations, key=lambda l: l.grid_cell or grid_cell_key(l.latitude, l.longitude))
+        cell_keys = list(cells)
+        forecasts = fetch_daily_forecasts(
+            [grid_cell_center(k) for k in cell_keys],
+            variables=["et0_fao_evapotranspiration", "precipitation_sum"],
+            forecast_days=settings.IRRIGATION_FORECAST_DAYS
+        )
+
+        cell_eto = np.full((len(cell_keys), len(forecast_dates)), np.nan)
+        cell_precipitation = np.full((len(cell_keys), len(forecast_dates)), np.nan)
+        for c, daily in enumerate(forecasts):
+            if not daily:
+                continue
+            for t, eto_value, rain in zip(
+                    daily.get("time", []),
+                    daily.get("et0_fao_evapotranspiration", []),
+                    daily.get("precipitation_sum", [])
+            ):
+                if t in date_index:
+                    cell_eto[c, date_index[t]] = np.nan if eto_value is None else eto_value
+                    cell_precipitation[c, date_index[t]] = np.nan if rain is None else rain
+
+        # Locations in cells without a forecast keep their previous schedule
+        forecasted = {cell_keys[c] for c in range(len(cell_keys)) if forecasts[c]}
+        locations = [l for k in cell_keys if k in forecasted for l in cells[k]]
+
+        cell_row = {k: c for c, k in enumerate(cell_keys)}
+        rows = np.array([cell_row[l.grid_cell or grid_cell_key(l.latitude, l.longitude)] for l in locations])
+        state_dates = np.array([last_states[l.id][0] for l in locations], dtype="datetime64[D]")
+
+        # Days already covered by the stored balance are not projected again
+        eto = np.where(
+            np.array(forecast_dates, dtype="datetime64[D]")[None, :] > state_dates[:, None], cell_eto[rows], np.nan
+        )
+        kc, taw, raw = location_parameters(session, locations, forecast_dates)
+        depletion = np.array([last_states[l.id][1] for l in locations])
+
+        first_day, dose = project_next_irrigation(eto, cell_precipitation[rows], kc, taw, raw, depletion)
+
+        computed_at = datetime.datetime.now()
+        irrigation_schedule.replace(db=session, location_ids=eligible_ids, rows=[
+            {
+                "location_id": l.id,
+                "computed_at": computed_at,
+                "state_date": last_states[l.id][0],
+                "depletion_mm": float(depletion[i]),
+                "raw_mm": float(raw[i]),
+                "next_irrigation_date": forecast_dates[first_day[i]] if first_day[i] >= 0 else None,
+                "dose_mm": float(dose[i]) if first_day[i] >= 0 else None,
+                "forecast_until": forecast_dates[-1]
+            }
+            for i, l in enumerate(locations)
+        ])
+    finally:
+        session.close()
+
+
+def maintain_partitions():
+    """
+    Create the coming monthly partitions of the dataset and eto tables and drop (or archive) the ones past their
+    retention, a no-op unless the tables are partitioned (PARTITIONED_STORAGE).
+    """
+    session = db.session.SessionLocal()
+
+    try:
+        manage_partitions(db=session)
+    finally:
+        session.close()
+
+
+def run_deletion_tasks():
+    """
+    Run the pending chunked deletions of large datasets and locations one after the other, and resume the ones
+    whose worker stopped midway. Returns False when there was none.
+    """
+    session = db.session.SessionLocal()
+    ran = False
+
+    try:
+        while (task := deletion_task.claim_next(db=session)) is not None:
+            ran = True
+            try:
+                run_deletion_task(session, task)
+            except SQLAlchemyError as e:
+                session.rollback()
+                deletion_task.record_progress(
+                    session, task, 0, status=DELETION_FAILED, error=str(e).splitlines()[0]
+                )
+    finally:
+        session.close()
 
-    session.close()
+    return ran
@@ -0,0 +1,150 @@
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, Tuple
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy.exc import SQLAlchemyError
+
+import crud
+import db.session
+from core.config import settings
+from core.metrics import SCHEDULED_JOB_DURATION
+from utils.job_runs import JOB_FAILED, JOB_RUNNING, JOB_SUCCEEDED
+from jobs.background_tasks import (
+    get_weather_data, update_water_balance, schedule_irrigation, maintain_partitions, run_deletion_tasks
+)
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "scheduler"
+WORKER_ID = "{}:{}".format(socket.gethostname(), os.getpid())
+
+# job id -> (function, trigger, trigger arguments)
+JOBS: Dict[str, Tuple[Callable[[], Any], str, Dict[str, Any]]] = {
+    "get_weather_data": (get_weather_data, "cron", {"hour": 22, "minute": 0, "second": 0}),
+    "update_water_balance": (update_water_balance, "cron", {"hour": 22, "minute": 30, "second": 0}),
+    "schedule_irrigation": (schedule_irrigation, "cron", {"hour": 22, "minute": 45, "second": 0}),
+    "maintain_partitions": (maintain_partitions, "cron", {"hour": 21, "minute": 30, "second": 0}),
+    # Started right away by the delete endpoints, the interval picks up tasks left behind by a stopped worker
+    "run_deletion_tasks": (run_deletion_tasks, "interval", {"minutes": 5}),
+}
+
+
+def run_job(job_id: str) -> None:
+    """
+    Runs the scheduled job and records the run, its duration and outcome in job_run. Jobs taking a run_id get the
+    id of the run. A job returning False found nothing to do, its run is not kept.
+    """
+
+    function = JOBS[job_id][0]
+    session = db.session.SessionLocal()
+
+    try:
+        run = crud.job_run.start(session, job_id, WORKER_ID, JOB_RUNNING)
+        start = time.perf_counter()
+        try:
+            # Checkpointed jobs record their progress under the run
+            if "run_id" in inspect.signature(function).parameters:
+                result = function(run_id=run.id)
+            else:
+                result = function()
+        except Exception as e:
+            duration = time.perf_counter() - start
+            SCHEDULED_JOB_DURATION.labels(job_id, "error").observe(duration)
+            logger.exception("Scheduled job %s failed", job_id)
+            crud.job_run.finish(session, run, JOB_FAILED, duration, error=str(e).splitlines()[0] if str(e) else repr(e))
+            return
+
+        duration = time.perf_counter() - start
+        SCHEDULED_JOB_DURATION.labels(job_id, "ok").observe(duration)
+        # The polling jobs would add a row every few minutes
+        if result is False:
+            crud.job_run.discard(session, run)
+        else:
+            crud.job_run.finish(session, run, JOB_SUCCEEDED, duration)
+    finally:
+        session.close()
+
+
+def create_scheduler() -> AsyncIOScheduler:
+    """
+    Scheduler with the jobs in the database (apscheduler_jobs), so their next run times survive restarts, and a
+    thread pool of its own running them off the event loop.
+    """
+
+    return AsyncIOScheduler(
+        jobstores={"default": SQLAlchemyJobStore(engine=db.session.engine)},
+        executors={"default": ThreadPoolExecutor(settings.SCHEDULER_MAX_WORKERS)},
+        job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_S}
+    )
+
+
+def _store_jobs(scheduler: AsyncIOScheduler) -> None:
+    # Stored jobs with an unchanged trigger keep their next run time, a run missed during a restart is made up for
+    for job_id, (_, trigger, trigger_args) in JOBS.items():
+        trigger = (CronTrigger if trigger == "cron" else IntervalTrigger)(**trigger_args)
+        stored = scheduler.get_job(job_id)
+        if stored is None or str(stored.trigger) != str(trigger):
+            scheduler.add_job(run_job, trigger, args=[job_id], id=job_id, name=job_id, replace_existing=True)
+
+
+def _acquire_lease() -> bool:
+    session = db.session.SessionLocal()
+    try:
+        return crud.scheduler_lease.acquire(session, LEASE_NAME, WORKER_ID, settings.SCHEDULER_LEASE_TTL_S)
+    finally:
+        session.close()
+
+
+def _release_lease() -> None:
+    session = db.session.SessionLocal()
+    try:
+        crud.scheduler_lease.release(session, LEASE_NAME, WORKER_ID)
+    finally:
+        session.close()
+
+
+async def lead_scheduler(scheduler: AsyncIOScheduler) -> None:
+    """
+    Leader election among the workers and replicas sharing the database: every process starts the scheduler
+    paused and only the holder of the scheduler lease resumes it, so each job runs once cluster-wide. The lease is
+    renewed every SCHEDULER_LEASE_RENEW_S, a process failing to renew it pauses its scheduler, and another one takes
+    over once it expired (SCHEDULER_LEASE_TTL_S). Run as a task for the lifetime of the process.
+    """
+
+    scheduler.start(paused=True)
+
+    leader = False
+    try:
+        while True:
+            try:
+                acquired = await asyncio.to_thread(_acquire_lease)
+            except SQLAlchemyError as e:
+                logger.warning("Scheduler lease renewal failed: %s", e)
+                acquired = False
+
+            if acquired and not leader:
+                logger.info("%s holds the scheduler lease, running the scheduled jobs", WORKER_ID)
+                await asyncio.to_thread(_store_jobs, scheduler)
+                scheduler.resume()
+            elif leader and not acquired:
+                logger.warning("%s lost the scheduler lease, pausing the scheduled jobs", WORKER_ID)
+                scheduler.pause()
+            leader = acquired
+
+            await asyncio.sleep(settings.SCHEDULER_LEASE_RENEW_S)
+    finally:
+        scheduler.shutdown(wait=False)
+        if leader:
+            try:
+                await asyncio.to_thread(_release_lease)
+            except SQLAlchemyError:
+                pass
@@ -1,15 +1,19 @@
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager, suppress
 
 from api.api_v1.api import api_router
-from apscheduler.jobstores.memory import MemoryJobStore
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from core.config import settings
-from fastapi import FastAPI
-from init.init_gatekeeper import register_apis_to_gatekeeper
+from core.metrics import (
+    REQUESTS_IN_PROGRESS, METRICS_CONTENT_TYPE, start_db_tracking, observe_request, render_metrics
+)
+from fastapi import FastAPI, Response
+from init.init_gatekeeper import register_apis_to_gatekeeper, registration_status
 from init.init_soil_values import insert_soil_values_into_db
 from init.init_kc import insert_crop_kc_into_db
 
-from jobs.background_tasks import get_weather_data
+from jobs.scheduler import create_scheduler, lead_scheduler
 from logging_config import configure_logging
 from starlette.middleware.cors import CORSMiddleware
 from starlette.requests import Request
@@ -20,12 +24,18 @@ async def lifespan(fa: FastAPI):
     configure_logging()
     insert_soil_values_into_db()
     insert_crop_kc_into_db()
-    scheduler.add_job(get_weather_data, 'cron', day_of_week='*', hour=22, minute=0, second=0)
-    scheduler.start()
+    # Every worker and replica runs one, the jobs only run in the one holding the scheduler lease
+    leadership = asyncio.create_task(lead_scheduler(scheduler))
+    registration = None
     if settings.USING_GATEKEEPER:
-        register_apis_to_gatekeeper()
+        # Background task, the service serves requests meanwhile
+        registration = asyncio.create_task(register_apis_to_gatekeeper())
     yield
-    scheduler.shutdown()
+    if registration is not None:
+        registration.cancel()
+    leadership.cancel()
+    with suppress(asyncio.CancelledError):
+        await leadership
 
 
 app = FastAPI(
@@ -33,9 +43,7 @@ app = FastAPI(
 )
 
 
-jobstores = {"default": MemoryJobStore()}
-
-scheduler = AsyncIOScheduler(jobstores=jobstores)
+scheduler = create_scheduler()
 
 
 if settings.CORS_ORIGINS:
@@ -52,14 +60,44 @@ logger = logging.getLogger(__name__)
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """log request response"""
-    start_time = time.time()
-    response = await call_next(request)
-    duration = time.time() - start_time
+    """log request response, and record latency/db metrics per route template"""
+    start_time = time.perf_counter()
+    db_stats = start_db_tracking()
+    REQUESTS_IN_PROGRESS.labels(request.method).inc()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        REQUESTS_IN_PROGRESS.labels(request.method).dec()
+        duration = time.perf_counter() - start_time
+
+        # Label by the matched route template (/dataset/{dataset_id}/) to keep cardinality bounded
+        route = request.scope.get("route")
+        route_path = route.path if route is not None else "unmatched"
+        observe_request(request.method, route_path, status_code, duration, db_stats)
+
     logger.info(
-        f"{request.method} {request.url.path} - {response.status_code} - {duration:.4f}s"
+        f"{request.method} {request.url.path} - {status_code} - {duration:.4f}s - "
+        f"{db_stats[0]} queries in {db_stats[1]:.4f}s"
     )
     return response
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """
+    Prometheus scrape endpoint
+    """
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/gatekeeper/status", include_in_schema=False)
+def gatekeeper_status() -> dict:
+    """
+    State of the Gatekeeper route registration of this process
+    """
+    return registration_status()
+
+
 app.include_router(api_router, prefix="/api/v1")
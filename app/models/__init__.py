@@ -1,6 +1,11 @@
 from .user import User
 from .location import Location
+from .elevation import ElevationTile
+from .water_balance import WaterBalance, IrrigationSchedule
+from .deletion_task import DeletionTask
+from .gatekeeper_route import GatekeeperRoute
+from .job_run import JobRun, SchedulerLease, EtoJobChunk
 from .eto import Eto
-from .dataset_model import Dataset, SoilTypeValues
+from .dataset_model import Dataset, DatasetCatalog, SoilTypeValues, DepthWeights
 from .eto import Eto, CropKc
 from .dataset_model import Dataset
\ No newline at end of file
@@ -1,10 +1,12 @@
-from sqlalchemy import Column, Integer, Float, Date, String
+from sqlalchemy import Column, Integer, Float, Date, DateTime, String, JSON, Index
 
 from db.base_class import Base
 
 
 class Dataset(Base):
     __tablename__ = "dataset"
+    # Readings are read and deleted per dataset, usually over a date interval
+    __table_args__ = (Index("ix_dataset_dataset_id_date", "dataset_id", "date"),)
 
     id = Column(Integer, primary_key=True)
     dataset_id = Column(String)
@@ -19,6 +21,29 @@ class Dataset(Base):
     temperature = Column(Float)
     humidity = Column(Float)
 
+    # Bitmask of the failed quality checks (utils.quality_control), set at upload
+    qc_flags = Column(Integer, nullable=True)
+    # Rain of the interval, decoded at upload when the dataset reports a cumulative counter
+    rain_increment = Column(Float, nullable=True)
+
+
+class DatasetCatalog(Base):
+    __tablename__ = "dataset_catalog"
+
+    dataset_id = Column(String, primary_key=True, nullable=False)
+
+    row_count = Column(Integer, nullable=False, default=0)
+    first_date = Column(Date, nullable=True)
+    last_date = Column(Date, nullable=True)
+    # Depths (cm) with at least one soil moisture reading, e.g. [10, 30]
+    active_depths = Column(JSON, nullable=False, default=list)
+
+    # utils.rain.RAIN_MODE_*, None until the dataset reported any rain
+    rain_mode = Column(String, nullable=True)
+    # Incremented on every upload, results derived from an older version are stale
+    version = Column(Integer, nullable=False, default=1)
+    last_modified = Column(DateTime, nullable=False, index=True)
+
 
 class SoilTypeValues(Base):
     __tablename__ = "soil_type_values"
@@ -27,3 +52,16 @@ class SoilTypeValues(Base):
 
     field_capacity = Column(Float, nullable=False)
     wilting_point = Column(Float, nullable=False)
+
+
+class DepthWeights(Base):
+    __tablename__ = "depth_weights"
+
+    # Dataset the weights apply to, DEFAULT_WEIGHTS_PROFILE for the profile used by datasets without their own
+    profile = Column(String, primary_key=True, nullable=False)
+
+    # {"10": 0.15, "20": 0.2, ...}, depth (cm) -> weight
+    weights = Column(JSON, nullable=False)
+    # Incremented on every change, analysis results computed with an older version are stale
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False)
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+
+from db.base_class import Base
+
+
+class DeletionTask(Base):
+    __tablename__ = 'deletion_task'
+    __table_args__ = (Index('ix_deletion_task_kind_target', 'kind', 'target'),)
+
+    id = Column(Integer, primary_key=True, nullable=False)
+
+    # utils.deletion.DELETION_DATASET (target is the dataset id) or DELETION_LOCATION (target is the location id)
+    kind = Column(String, nullable=False)
+    target = Column(String, nullable=False)
+
+    # utils.deletion.DELETION_PENDING/RUNNING/DONE/FAILED
+    status = Column(String, nullable=False, index=True)
+    # Rows to delete when the task was created, the ones deleted so far
+    total_rows = Column(Integer, nullable=False, default=0)
+    deleted_rows = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime, nullable=False)
+    # Touched after every chunk, a running task not updated for DELETION_TASK_STALE_S is picked up again
+    updated_at = Column(DateTime, nullable=False)
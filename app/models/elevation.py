@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Float, String
+
+from db.base_class import Base
+
+
+class ElevationTile(Base):
+    __tablename__ = 'elevation_tile'
+
+    # Tile key as produced by utils.grid.grid_cell_key with ELEVATION_TILE_RESOLUTION_DEG
+    tile = Column(String, primary_key=True, unique=True, nullable=False)
+
+    # None when the provider has no coverage for the tile (e.g. outside of Europe)
+    elevation = Column(Float, nullable=True)
+    dataset = Column(String, nullable=False)
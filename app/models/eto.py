@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date, ForeignKey, Float, String
+from sqlalchemy import Column, Integer, Date, ForeignKey, Float, String, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from db.base_class import Base
@@ -12,13 +12,25 @@ class CropKc(Base):
     kc_mid = Column(Float, nullable=False)
     kc_end = Column(Float, nullable=False)
 
+    # Rooting depth (m) and the fraction p of TAW that can be depleted before stress (FAO-56 table 22)
+    root_depth_m = Column(Float, nullable=True)
+    depletion_fraction = Column(Float, nullable=True)
+
+    # Crop calendar, lengths (days) of the initial, development, mid-season and late-season stages (FAO-56 table 11)
+    l_ini = Column(Integer, nullable=True)
+    l_dev = Column(Integer, nullable=True)
+    l_mid = Column(Integer, nullable=True)
+    l_late = Column(Integer, nullable=True)
+
 
 class Eto(Base):
     __tablename__ = 'eto'
+    __table_args__ = (Index('ix_eto_location_id_date', 'location_id', 'date'),)
     id = Column(Integer, primary_key=True, unique=True, nullable=False)
 
     date = Column(Date, nullable=False)
     value = Column(Float, nullable=False)
+    precipitation = Column(Float, nullable=True)
 
-    location_id: Mapped[int] = mapped_column(ForeignKey("location.id"))
+    location_id: Mapped[int] = mapped_column(ForeignKey("location.id", ondelete="CASCADE"))
     location: Mapped["Location"] = relationship(back_populates="calculations")
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime
+
+from db.base_class import Base
+
+
+class GatekeeperRoute(Base):
+    __tablename__ = 'gatekeeper_route'
+
+    # Hash of the registration payload (service, base url, endpoint, methods) and the Gatekeeper URL, any change
+    # is a new route
+    route_hash = Column(String, primary_key=True, nullable=False)
+    endpoint = Column(String, nullable=False)
+    methods = Column(String, nullable=False)
+
+    registered_at = Column(DateTime, nullable=False)
@@ -0,0 +1,59 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, ForeignKey, Index, JSON, UniqueConstraint
+
+from db.base_class import Base
+
+
+class JobRun(Base):
+    __tablename__ = 'job_run'
+    __table_args__ = (Index('ix_job_run_job_id_started_at', 'job_id', 'started_at'),)
+
+    id = Column(Integer, primary_key=True, nullable=False)
+
+    # Id of the scheduled job (jobs.scheduler.JOBS) and the process that ran it (host:pid)
+    job_id = Column(String, nullable=False)
+    worker = Column(String, nullable=False)
+
+    # utils.job_runs.JOB_RUNNING/SUCCEEDED/FAILED
+    status = Column(String, nullable=False)
+    started_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    duration_s = Column(Float, nullable=True)
+    error = Column(String, nullable=True)
+
+
+class SchedulerLease(Base):
+    __tablename__ = 'scheduler_lease'
+
+    name = Column(String, primary_key=True, nullable=False)
+
+    # The process running the scheduled jobs, until expires_at unless it renews the lease
+    holder = Column(String, nullable=True)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class EtoJobChunk(Base):
+    __tablename__ = 'eto_job_chunk'
+    __table_args__ = (UniqueConstraint('run_id', 'chunk'),)
+
+    id = Column(Integer, primary_key=True, nullable=False)
+
+    run_id = Column(Integer, ForeignKey("job_run.id", ondelete="CASCADE"), nullable=False)
+    chunk = Column(Integer, nullable=False)
+    # Day the ETo is computed for, a resumed chunk keeps the day of its run
+    date = Column(Date, nullable=False)
+
+    # utils.job_runs.CHUNK_PENDING/RUNNING/DONE/FAILED
+    status = Column(String, nullable=False, index=True)
+    location_ids = Column(JSON, nullable=False)
+    # Locations still without ETo after the last attempt, the only ones a resumed chunk computes, null before one
+    failed_location_ids = Column(JSON, nullable=True)
+
+    locations = Column(Integer, nullable=False)
+    stored = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_s = Column(Float, nullable=True)
+    error = Column(String, nullable=True)
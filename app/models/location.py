@@ -1,6 +1,6 @@
 from typing import List
 
-from sqlalchemy import Column, Integer, Float
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, Date
 from sqlalchemy.orm import relationship, Mapped
 
 from db.base_class import Base
@@ -13,4 +13,20 @@ class Location(Base):
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
 
-    calculations: Mapped[List["Eto"]] = relationship(back_populates="location", cascade="all, delete-orphan")
+    # Weather grid cell (see utils.grid), locations sharing a cell share the weather fetch and ETo computation
+    grid_cell = Column(String, nullable=True, index=True)
+
+    # Meters above sea level, resolved through the elevation tile cache (utils.elevation) at creation
+    elevation = Column(Float, nullable=True)
+
+    # Inputs of the water balance, locations without a soil type and crop are skipped by it
+    soil_type = Column(String, ForeignKey("soil_type_values.soil_type"), nullable=True)
+    crop = Column(String, ForeignKey("crop_kc.crop"), nullable=True)
+    crop_stage = Column(String, nullable=True)
+    # With a planting date the crop's Kc curve is used instead of the fixed crop_stage Kc
+    planting_date = Column(Date, nullable=True)
+
+    # The database deletes the ETo of a deleted location (ON DELETE CASCADE), they are never loaded for it
+    calculations: Mapped[List["Eto"]] = relationship(
+        back_populates="location", cascade="all, delete-orphan", passive_deletes=True
+    )
@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, Date, DateTime, Float, ForeignKey, UniqueConstraint
+
+from db.base_class import Base
+
+
+class WaterBalance(Base):
+    __tablename__ = 'water_balance'
+    __table_args__ = (UniqueConstraint('location_id', 'date'),)
+
+    id = Column(Integer, primary_key=True, unique=True, nullable=False)
+
+    location_id = Column(Integer, ForeignKey("location.id", ondelete="CASCADE"), nullable=False, index=True)
+    date = Column(Date, nullable=False)
+
+    eto = Column(Float, nullable=True)
+    precipitation = Column(Float, nullable=True)
+    kc = Column(Float, nullable=False)
+    ks = Column(Float, nullable=False)
+    etc_adj = Column(Float, nullable=True)
+
+    # Root zone depletion below field capacity, total/readily available water and the refill dose, all in mm
+    depletion_mm = Column(Float, nullable=False)
+    taw_mm = Column(Float, nullable=False)
+    raw_mm = Column(Float, nullable=False)
+    irrigation_mm = Column(Float, nullable=False)
+
+
+class IrrigationSchedule(Base):
+    __tablename__ = 'irrigation_schedule'
+
+    location_id = Column(Integer, ForeignKey("location.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+
+    computed_at = Column(DateTime, nullable=False)
+    # Last water balance day the projection starts from and its depletion (mm)
+    state_date = Column(Date, nullable=False)
+    depletion_mm = Column(Float, nullable=False)
+    raw_mm = Column(Float, nullable=False)
+
+    # None when the depletion stays below RAW over the whole forecast
+    next_irrigation_date = Column(Date, nullable=True)
+    dose_mm = Column(Float, nullable=True)
+    forecast_until = Column(Date, nullable=False)
@@ -4,3 +4,5 @@ from .token import *
 from .generic import *
 from .location import *
 from .dataset_scheme import *
+from .water_balance import *
+from .deletion_task import *
@@ -2,7 +2,7 @@ import math
 
 from pydantic import BaseModel, ConfigDict, Field, model_validator
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, date as date_type
 
 from enum import Enum
 
@@ -43,6 +43,28 @@ class Dataset(BaseModel):
     rain: float
     temperature: float
     humidity: float
+    qc_flags: Optional[int] = None
+    rain_increment: Optional[float] = None
+
+
+class DatasetCatalogEntry(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    dataset_id: str
+    row_count: int
+    first_date: Optional[date_type]
+    last_date: Optional[date_type]
+    active_depths: List[int]
+    rain_mode: Optional[str]
+    version: int
+    last_modified: datetime
+
+
+class DatasetCatalogList(BaseModel):
+    total: int
+    # Changes whenever any dataset is uploaded to or deleted
+    change_token: str
+    datasets: List[DatasetCatalogEntry]
 
 
 class DatasetAnalysis(BaseModel):
@@ -42,6 +42,7 @@ class EToInputData(BaseModel):
 class EtoCreate(BaseModel):
     date: datetime.date
     value: float
+    precipitation: Optional[float] = None
 
     location_id: int
 
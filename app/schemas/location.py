@@ -1,16 +1,42 @@
-from typing import List
+import datetime
+from typing import List, Optional, Literal, Dict, Any
 
 from pydantic import BaseModel, ConfigDict
 
+from schemas.eto import Crop, KcStage
+from schemas.dataset_scheme import SoilTypes
+
 class NewLocationWKT(BaseModel):
     coordinates: str
 
+class NewLocationsWKT(BaseModel):
+    coordinates: List[str]
+
+class ParcelFeatureCollection(BaseModel):
+    type: Literal["FeatureCollection"]
+    features: List[Dict[str, Any]]
+
+class RejectedParcel(BaseModel):
+    index: int
+    reason: str
+
+class BulkLocationsResult(BaseModel):
+    created: int
+    duplicates: int
+    rejected: List[RejectedParcel]
+
 class LocationCreate(BaseModel):
     latitude: float
     longitude: float
+    elevation: Optional[float] = None
 
 class LocationUpdate(BaseModel):
-    pass
+    model_config = ConfigDict(use_enum_values=True)
+
+    soil_type: Optional[SoilTypes] = None
+    crop: Optional[Crop] = None
+    crop_stage: Optional[KcStage] = None
+    planting_date: Optional[datetime.date] = None
 
 class LocationDB(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -18,6 +44,16 @@ class LocationDB(BaseModel):
     id: int
     latitude: float
     longitude: float
+    grid_cell: Optional[str] = None
+    elevation: Optional[float] = None
+    soil_type: Optional[str] = None
+    crop: Optional[str] = None
+    crop_stage: Optional[str] = None
+    planting_date: Optional[datetime.date] = None
 
 class LocationsDB(BaseModel):
     locations: List[LocationDB]
+
+class NearestLocation(BaseModel):
+    location: LocationDB
+    distance_m: float
@@ -0,0 +1,41 @@
+import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class WaterBalanceDay(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    date: datetime.date
+    eto: Optional[float]
+    precipitation: Optional[float]
+    kc: float
+    ks: float
+    etc_adj: Optional[float]
+    depletion_mm: float
+    taw_mm: float
+    raw_mm: float
+    irrigation_mm: float
+
+
+class WaterBalanceResponse(BaseModel):
+    location_id: int
+    days: List[WaterBalanceDay]
+
+
+class IrrigationScheduleDB(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    location_id: int
+    computed_at: datetime.datetime
+    state_date: datetime.date
+    depletion_mm: float
+    raw_mm: float
+    next_irrigation_date: Optional[datetime.date]
+    dose_mm: Optional[float]
+    forecast_until: datetime.date
+
+
+class IrrigationSchedules(BaseModel):
+    schedules: List[IrrigationScheduleDB]
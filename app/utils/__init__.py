@@ -1,7 +1,90 @@
-from .custom_schemas import *
-from .jsonld_utils import *
-from .soil_analysis import *
-from .gkutils import *
-from .fcutils import *
-from .wdutil import *
-from .omutils import *
\ No newline at end of file
+"""
+Helpers of the endpoints and jobs, grouped by submodule.
+
+Names are imported from the package (`from utils import preprocess_dataset`) as before, but a submodule is only
+loaded on first use of one of its names, so importing `utils.grid` or the token check does not pull in pandas,
+shapely or the Open-Meteo client.
+"""
+import importlib
+
+# Submodule -> the names it provides at package level
+_EXPORTS = {
+    "custom_schemas": ("context",),
+    "jsonld_utils": ("jsonld_get_dataset", "jsonld_analyse_soil_moisture", "jsonld_eto_response"),
+    "profiling": ("PROFILE_MODES", "StageRecord", "AnalysisTrace", "trace_stage", "run_profiled"),
+    "grid": ("grid_cell_key", "grid_cell_center", "group_by_grid_cell"),
+    "elevation": (
+        "OPENTOPODATA_MAX_LOCATIONS", "ElevationLookupError", "elevation_tile_key", "fetch_elevations",
+        "lookup_elevations",
+    ),
+    "parcels": ("wkt_centroids", "geojson_centroids", "centroid_keys"),
+    "spatial_index": ("EARTH_RADIUS_M", "METERS_PER_DEGREE", "haversine_m", "LocationIndex", "location_index"),
+    "kc_curve": ("kc_curves", "has_crop_calendar", "crop_kc_curve"),
+    "depth_weights": (
+        "DEFAULT_WEIGHTS_PROFILE", "WeightsSnapshot", "weights_snapshot", "default_weights_snapshot",
+        "resolve_weights",
+    ),
+    "water_balance": (
+        "total_available_water", "run_water_balance", "pivot_daily", "stage_kc", "location_parameters",
+        "compute_water_balance", "project_next_irrigation",
+    ),
+    "quality_control": (
+        "QC_DEPTHS", "QC_BITS_PER_DEPTH", "QC_RANGE", "QC_SPIKE", "QC_FLATLINE", "QC_DUPLICATE_TIMESTAMP",
+        "QC_TIMESTAMP_ORDER", "depth_flag", "depth_rejected_mask", "sm_column", "quality_control_flags",
+        "apply_qc_flags",
+    ),
+    "rain": (
+        "RAIN_MODE_CUMULATIVE", "RAIN_MODE_INCREMENTAL", "is_cumulative_rain", "detect_rain_mode",
+        "detect_rain_mode_of_readings", "decode_rain_increments", "decode_tipping_bucket_rain",
+    ),
+    "soil_analysis": (
+        "preprocess_dataset", "weighted_average", "calculate_field_capacity", "detect_weighted_moisture",
+        "detect_irrigation_from_sm_resposne", "detect_weighted_stress_days", "detect_weighted_oversaturation",
+        "suggest_wilting_point_fraction", "suggest_stress_threshold_fraction", "calculate_soil_analysis_metrics",
+        "calculate_irrigation_datapoints",
+    ),
+    "gkutils": ("gatekeeper_logout", "check_token_for_validity"),
+    "fcutils": ("fetch_parcel_by_id", "fetch_parcel_lat_lon"),
+    "wdutil": ("WEATHER_DATA_API_CALL_URL", "TimeUnit", "fetch_weather_data"),
+    "omutils": ("fetch_historical_eto_for_location", "fetch_daily_forecasts"),
+    "arrow_io": (
+        "EXPORT_MEDIA_TYPES", "DATASET_EXPORT_COLUMNS", "ETO_EXPORT_COLUMNS", "export_columns", "stream_export",
+        "read_parquet_batches",
+    ),
+    "ingest": (
+        "READING_REQUIRED_COLUMNS", "READING_COLUMNS", "readings_frame", "context_frame", "normalize_readings_frame",
+        "prepare_readings", "ingest_readings",
+    ),
+    "partitions": (
+        "RETENTION_DROP", "RETENTION_ARCHIVE", "PARTITIONED_TABLES", "add_months", "partition_name", "is_partitioned",
+        "list_partitions", "create_partition", "archive_rows", "expire_partitions", "manage_partitions",
+    ),
+    "deletion": (
+        "DELETION_DATASET", "DELETION_LOCATION", "DELETION_PENDING", "DELETION_RUNNING", "DELETION_DONE",
+        "DELETION_FAILED", "delete_chunk", "run_deletion_task",
+    ),
+    "job_runs": (
+        "JOB_RUNNING", "JOB_SUCCEEDED", "JOB_FAILED", "CHUNK_PENDING", "CHUNK_RUNNING", "CHUNK_DONE", "CHUNK_FAILED",
+        "IncompleteRunError", "plan_chunks",
+    ),
+}
+
+_OWNERS = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_OWNERS)
+
+
+def __getattr__(name: str):
+    if name in _EXPORTS:
+        return importlib.import_module("." + name, __name__)
+
+    if name not in _OWNERS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    value = getattr(importlib.import_module("." + _OWNERS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_OWNERS) | set(_EXPORTS))
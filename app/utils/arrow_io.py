@@ -0,0 +1,134 @@
+import io
+from typing import Dict, Iterator, List, Optional, Sequence, Type
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from db.base_class import Base
+from utils.quality_control import QC_DEPTHS, sm_column
+
+EXPORT_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+DATASET_EXPORT_COLUMNS: Dict[str, pa.DataType] = {
+    "dataset_id": pa.string(),
+    "date": pa.date32(),
+    **{sm_column(d): pa.float64() for d in QC_DEPTHS},
+    "rain": pa.float64(),
+    "rain_increment": pa.float64(),
+    "temperature": pa.float64(),
+    "humidity": pa.float64(),
+    "qc_flags": pa.int64(),
+}
+
+ETO_EXPORT_COLUMNS: Dict[str, pa.DataType] = {
+    "location_id": pa.int64(),
+    "date": pa.date32(),
+    "value": pa.float64(),
+    "precipitation": pa.float64(),
+}
+
+
+def export_columns(requested: Optional[str], available: Dict[str, pa.DataType]) -> List[str]:
+    """
+    Projected columns from a comma separated list, all columns when none were requested.
+    """
+
+    if not requested:
+        return list(available)
+
+    columns = [c.strip() for c in requested.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError("Unknown columns: {}".format(", ".join(unknown)))
+
+    return columns
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write target of the Parquet/Arrow writers, collects the written bytes until they are drained into the response.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_export(
+        db: Session,
+        model: Type[Base],
+        columns: Sequence[str],
+        types: Dict[str, pa.DataType],
+        conditions: Sequence,
+        export_format: str = "parquet",
+        batch_rows: Optional[int] = None
+) -> Iterator[bytes]:
+    """
+    Streams the rows of the model matching the conditions as Parquet (one row group per batch) or as an Arrow IPC
+    stream, reading batch_rows rows at a time by primary key so memory stays flat for any history length.
+    The session is closed when the stream ends.
+    """
+
+    batch_rows = batch_rows or settings.EXPORT_BATCH_ROWS
+    schema = pa.schema([(column, types[column]) for column in columns])
+    sink = _ChunkSink()
+
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = ipc.new_stream(sink, schema)
+
+    try:
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(model.id, *[getattr(model, column) for column in columns])
+                .where(*conditions, model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_rows)
+            ).all()
+            if not rows:
+                break
+
+            last_id = rows[-1][0]
+            values = list(zip(*rows))[1:]
+            writer.write_batch(pa.record_batch(
+                [pa.array(column_values, type=field.type) for column_values, field in zip(values, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+
+        writer.close()
+        yield sink.drain()
+    finally:
+        db.close()
+
+
+def read_parquet_batches(source, batch_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Record batches of a Parquet file (path or binary file object) as frames, batch_rows rows at a time.
+    """
+
+    parquet_file = pq.ParquetFile(source)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows or settings.IMPORT_BATCH_ROWS):
+        yield batch.to_pandas()
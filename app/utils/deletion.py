@@ -0,0 +1,57 @@
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+import crud
+from core.config import settings
+from models import Dataset, DatasetCatalog, DeletionTask, Eto, Location
+
+DELETION_DATASET = "dataset"
+DELETION_LOCATION = "location"
+
+DELETION_PENDING = "pending"
+DELETION_RUNNING = "running"
+DELETION_DONE = "done"
+DELETION_FAILED = "failed"
+
+
+def delete_chunk(db: Session, model, condition, chunk_rows: int) -> int:
+    """
+    Deletes up to chunk_rows rows of the model matching the condition, picked by id, returns how many.
+    """
+
+    result = db.execute(
+        delete(model)
+        .where(model.id.in_(select(model.id).where(condition).limit(chunk_rows)))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def run_deletion_task(db: Session, task: DeletionTask) -> None:
+    """
+    Deletes the readings of a dataset, or the ETo of a location and then the location itself, BULK_DELETE_CHUNK_ROWS
+    rows per transaction. The progress is stored after every chunk, a task stopped midway resumes with the rows left.
+
+    A dataset leaves the catalog with the first chunk so listings no longer show it while it is being deleted.
+    """
+
+    if task.kind == DELETION_DATASET:
+        model, condition = Dataset, Dataset.dataset_id == task.target
+        db.execute(delete(DatasetCatalog).where(DatasetCatalog.dataset_id == task.target))
+    else:
+        model, condition = Eto, Eto.location_id == int(task.target)
+
+    while True:
+        deleted = delete_chunk(db, model, condition, settings.BULK_DELETE_CHUNK_ROWS)
+        crud.deletion_task.record_progress(db, task, deleted)
+        if deleted < settings.BULK_DELETE_CHUNK_ROWS:
+            break
+
+    if task.kind == DELETION_DATASET:
+        # Readings uploaded while the task ran were deleted with the rest, so is the entry they created
+        db.execute(delete(DatasetCatalog).where(DatasetCatalog.dataset_id == task.target))
+    else:
+        # Water balance and irrigation schedule rows, one per day at most, go with the location (ON DELETE CASCADE)
+        db.execute(delete(Location).where(Location.id == int(task.target)))
+
+    crud.deletion_task.record_progress(db, task, 0, status=DELETION_DONE)
@@ -0,0 +1,50 @@
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from core.config import settings
+
+# Profile key of the weights used by datasets without their own profile
+DEFAULT_WEIGHTS_PROFILE = "__default__"
+
+
+@dataclass(frozen=True)
+class WeightsSnapshot:
+    """
+    Immutable depth weights (depth in cm -> weight) handed to one analysis run.
+
+    Version 0 is the built-in GLOBAL_WEIGHTS fallback, stored profiles start at 1. The key identifies the weights
+    an analysis result was computed with, e.g. for caching.
+    """
+
+    profile: str
+    version: int
+    weights: Mapping[int, float] = field(default_factory=lambda: MappingProxyType({}))
+
+    @property
+    def key(self) -> str:
+        return "{}:{}".format(self.profile, self.version)
+
+
+def weights_snapshot(profile: str, version: int, weights: Mapping[Any, float]) -> WeightsSnapshot:
+    """
+    Snapshot of stored weights, the JSON keys are depths as strings.
+    """
+
+    return WeightsSnapshot(
+        profile=profile,
+        version=version,
+        weights=MappingProxyType({int(depth): float(weight) for depth, weight in weights.items()})
+    )
+
+
+def default_weights_snapshot() -> WeightsSnapshot:
+    return weights_snapshot(DEFAULT_WEIGHTS_PROFILE, 0, settings.GLOBAL_WEIGHTS)
+
+
+def resolve_weights(weights: Optional[Mapping[int, float]]) -> Mapping[int, float]:
+    """
+    Weights an analysis function runs with, the built-in defaults when the caller passed none.
+    """
+
+    return default_weights_snapshot().weights if weights is None else weights
@@ -0,0 +1,100 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import requests
+from requests import RequestException
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.metrics import track_outbound
+from models import ElevationTile
+from utils.grid import grid_cell_key, grid_cell_center
+
+# Public OpenTopoData API limit of locations per request
+OPENTOPODATA_MAX_LOCATIONS = 100
+
+
+class ElevationLookupError(Exception):
+    pass
+
+
+def elevation_tile_key(latitude: float, longitude: float) -> str:
+    return grid_cell_key(latitude, longitude, settings.ELEVATION_TILE_RESOLUTION_DEG)
+
+
+def fetch_elevations(points: Sequence[Tuple[float, float]]) -> List[Optional[float]]:
+    """
+    Elevations of the points from OpenTopoData, in batches of OPENTOPODATA_MAX_LOCATIONS.
+    None for points outside the dataset's coverage, raises ElevationLookupError when the provider fails.
+    """
+
+    elevations = []
+    for i in range(0, len(points), OPENTOPODATA_MAX_LOCATIONS):
+        batch = points[i:i + OPENTOPODATA_MAX_LOCATIONS]
+
+        try:
+            with track_outbound("opentopodata"):
+                response = requests.get(
+                    url="{}/v1/{}".format(settings.OPENTOPODATA_BASE_URL.rstrip("/"), settings.OPENTOPODATA_DATASET),
+                    params={"locations": "|".join("{},{}".format(lat, lon) for lat, lon in batch)},
+                    timeout=settings.OPENTOPODATA_TIMEOUT_S
+                )
+        except RequestException:
+            raise ElevationLookupError(
+                "Error, can't check topographical location of wkt parcel, please try again later."
+            )
+
+        if (response.status_code / 100) != 2:
+            raise ElevationLookupError("Error, topographical api issue, please try again later.")
+
+        body = response.json()
+
+        if "results" not in body:
+            raise ElevationLookupError("Error, topographical api failed to return a result, please try again later.")
+
+        if len(body["results"]) != len(batch):
+            raise ElevationLookupError(
+                "Error, topographical api returned an empty results set, please try again later."
+            )
+
+        for result in body["results"]:
+            if "elevation" not in result:
+                raise ElevationLookupError(
+                    "Error, elevation data missing from topographical api call, please try again later."
+                )
+            elevations.append(result["elevation"])
+
+    return elevations
+
+
+def lookup_elevations(db: Session, points: Sequence[Tuple[float, float]]) -> List[Optional[float]]:
+    """
+    Elevations of the points, resolved through the elevation_tile cache. Only tiles that were never looked up
+    are fetched (at the tile center, so the cached value stands for the whole tile) and then cached, including
+    tiles without coverage.
+    """
+
+    keys = [elevation_tile_key(lat, lon) for lat, lon in points]
+    unique_keys = set(keys)
+
+    cached: Dict[str, Optional[float]] = {
+        t.tile: t.elevation
+        for t in db.query(ElevationTile).filter(ElevationTile.tile.in_(unique_keys)).all()
+    }
+
+    missing = sorted(unique_keys - cached.keys())
+    if missing:
+        fetched = fetch_elevations([grid_cell_center(k) for k in missing])
+        cached.update(zip(missing, fetched))
+
+        db.add_all([
+            ElevationTile(tile=k, elevation=e, dataset=settings.OPENTOPODATA_DATASET)
+            for k, e in zip(missing, fetched)
+        ])
+        try:
+            db.commit()
+        except SQLAlchemyError:
+            # A concurrent request cached (some of) the same tiles, the values are the same
+            db.rollback()
+
+    return [cached[k] for k in keys]
@@ -4,6 +4,7 @@ from requests import RequestException
 from shapely import wkt, errors
 
 from core import settings
+from core.metrics import track_outbound
 
 
 def fetch_parcel_by_id(
@@ -12,10 +13,11 @@ def fetch_parcel_by_id(
 ):
 
     try:
-        response_json = requests.get(
-            url=str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/proxy/farmcalendar/api/v1/FarmParcels/{}/?format=json".format(parcel_id),
-            headers={"Content-Type": "application/json", "Authorization": "Bearer {}".format(access_token)}
-        )
+        with track_outbound("farmcalendar"):
+            response_json = requests.get(
+                url=str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/proxy/farmcalendar/api/v1/FarmParcels/{}/?format=json".format(parcel_id),
+                headers={"Content-Type": "application/json", "Authorization": "Bearer {}".format(access_token)}
+            )
     except RequestException:
         raise HTTPException(
             status_code=400,
@@ -3,19 +3,21 @@ from fastapi import HTTPException
 from requests import RequestException
 
 from core import settings
+from core.metrics import track_outbound
 
 
 def gatekeeper_logout(
         refresh_token: str
 ):
     try:
-        response = requests.post(
-            url=str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/logout/",
-            headers={"Content-Type": "application/json"},
-            json={
-                "refresh": "{}".format(refresh_token)
-            }
-        )
+        with track_outbound("gatekeeper"):
+            response = requests.post(
+                url=str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/logout/",
+                headers={"Content-Type": "application/json"},
+                json={
+                    "refresh": "{}".format(refresh_token)
+                }
+            )
     except RequestException as re:
         raise HTTPException(
             status_code=400,
@@ -39,14 +41,15 @@ def check_token_for_validity(
         token_type: str
 ):
     try:
-        response = requests.post(
-            url=str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/validate_token/",
-            headers={"Content-Type": "application/json"},
-            json={
-                "token": token,
-                "token_type": token_type # Can be either access or refresh
-            }
-        )
+        with track_outbound("gatekeeper"):
+            response = requests.post(
+                url=str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/validate_token/",
+                headers={"Content-Type": "application/json"},
+                json={
+                    "token": token,
+                    "token_type": token_type # Can be either access or refresh
+                }
+            )
     except RequestException as re:
         raise HTTPException(
             status_code=400,
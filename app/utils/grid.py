@@ -0,0 +1,44 @@
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple, TypeVar
+
+from core.config import settings
+
+T = TypeVar("T")
+
+
+def grid_cell_key(latitude: float, longitude: float, resolution: float = None) -> str:
+    """
+    Key of the weather model grid cell a coordinate falls in, e.g. "0.1:451:203".
+    The resolution is part of the key, so cells computed with a different resolution never match.
+    """
+
+    resolution = resolution or settings.WEATHER_GRID_RESOLUTION_DEG
+
+    return "{:g}:{}:{}".format(
+        resolution,
+        math.floor(round(latitude / resolution, 9)),
+        math.floor(round(longitude / resolution, 9))
+    )
+
+
+def grid_cell_center(key: str) -> Tuple[float, float]:
+    """
+    Coordinates (latitude, longitude) of the center of a grid cell, used as the shared fetch point of its members.
+    """
+
+    resolution, lat_index, lon_index = key.split(":")
+    resolution = float(resolution)
+
+    return (
+        round((int(lat_index) + 0.5) * resolution, 6),
+        round((int(lon_index) + 0.5) * resolution, 6)
+    )
+
+
+def group_by_grid_cell(items: Iterable[T], key=lambda item: item.grid_cell) -> Dict[str, List[T]]:
+    groups = defaultdict(list)
+    for item in items:
+        groups[key(item)].append(item)
+
+    return dict(groups)
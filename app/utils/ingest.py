@@ -0,0 +1,242 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+import crud
+from core.config import settings
+from utils.quality_control import QC_DEPTHS, sm_column, quality_control_flags
+from utils.rain import RAIN_MODE_CUMULATIVE, detect_rain_mode_of_readings, decode_rain_increments
+
+READING_REQUIRED_COLUMNS = ("dataset_id", "date", "rain", "temperature", "humidity")
+READING_COLUMNS = READING_REQUIRED_COLUMNS + tuple(sm_column(d) for d in QC_DEPTHS)
+# crud.dataset_async.get_rain_history
+RAIN_HISTORY_COLUMNS = ("id", "rain", "previous", "rain_increment")
+# Stored columns of the context readings besides READING_COLUMNS, to update their qc_flags
+CONTEXT_COLUMNS = ("id", "qc_flags")
+
+
+def readings_frame(readings: Sequence) -> pd.DataFrame:
+    """
+    Frame of readings given as objects, uploaded schemas or stored rows, in their order.
+    """
+
+    return normalize_readings_frame(pd.DataFrame(
+        [{column: getattr(r, column) for column in READING_COLUMNS} for r in readings],
+        columns=list(READING_COLUMNS)
+    ))
+
+
+def normalize_readings_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Readings of any source (upload, Parquet import) with the columns of the dataset table. Missing soil moisture
+    depths get the 0.0 sentinel like the upload schema, columns derived at upload are dropped.
+    """
+
+    missing = [column for column in READING_REQUIRED_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError("Missing columns: {}".format(", ".join(missing)))
+
+    frame = frame[[column for column in READING_COLUMNS if column in frame.columns]].copy()
+    for depth in QC_DEPTHS:
+        if sm_column(depth) not in frame.columns:
+            frame[sm_column(depth)] = 0.0
+
+    frame["dataset_id"] = frame["dataset_id"].astype(str)
+    frame["date"] = pd.to_datetime(frame["date"])
+
+    return frame.reset_index(drop=True)
+
+
+def _catalog_stats(frame: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+    depths = [sm_column(d) for d in QC_DEPTHS]
+    grouped = frame.groupby("dataset_id", sort=False)
+    active = (frame[depths].fillna(0) != 0).groupby(frame["dataset_id"], sort=False).any()
+
+    return {
+        dataset_id: {
+            "rows": int(rows),
+            "first": first.date(),
+            "last": last.date(),
+            "depths": {d for d in QC_DEPTHS if active.loc[dataset_id, sm_column(d)]},
+        }
+        for dataset_id, rows, first, last in zip(
+            grouped.size().index, grouped.size(), grouped["date"].min(), grouped["date"].max()
+        )
+    }
+
+
+def context_frame(readings: Sequence) -> pd.DataFrame:
+    """
+    Frame of stored readings preceding a batch, with their id and stored qc_flags (CONTEXT_COLUMNS).
+    """
+
+    return readings_frame(readings).assign(**{
+        column: pd.Series([getattr(r, column) for r in readings], dtype=object) for column in CONTEXT_COLUMNS
+    })
+
+
+def _rejudged_context_flags(stored: pd.DataFrame, flags: np.ndarray) -> Dict[int, int]:
+    """
+    qc_flags (id -> flags) of the stored readings the batch adds flags to. Flags are only added: the context is a
+    few readings, so a check of its first ones lacks the history they were judged with. Readings stored before
+    quality control existed keep no flags.
+    """
+
+    if not set(CONTEXT_COLUMNS) <= set(stored.columns) or stored.empty:
+        return {}
+
+    stored_flags = pd.to_numeric(stored["qc_flags"])
+    checked = stored_flags.notna().to_numpy()
+    old = stored_flags.fillna(0).to_numpy(dtype=np.int64)
+    new = old | flags
+    changed = checked & (new != old)
+
+    return dict(zip(stored["id"].to_numpy(dtype=np.int64)[changed].tolist(), new[changed].tolist()))
+
+
+def _rain_increments(rain: pd.Series, previous: pd.Series, mode: Optional[str]) -> pd.Series:
+    if mode == RAIN_MODE_CUMULATIVE:
+        return decode_rain_increments(rain, previous)
+    return rain.fillna(0)
+
+
+def _detect_rain_mode(
+        rain: pd.Series, previous: pd.Series, history: pd.DataFrame
+) -> Tuple[Optional[str], bool, Dict[int, float]]:
+    """
+    Rain mode of a dataset without a saved one, from its stored readings with rain and the batch. The mode is only
+    saved once RAIN_MODE_MIN_READINGS readings with rain were seen, until then it is detected again on every upload.
+    Returns the mode, whether to save it and, once saved, the corrected increments (id -> increment) of the stored
+    readings decoded under an earlier guess.
+    """
+
+    all_rain = pd.concat([history["rain"].astype(float), rain], ignore_index=True)
+    all_previous = pd.concat([history["previous"].astype(float), previous], ignore_index=True)
+    mode = detect_rain_mode_of_readings(all_rain, all_previous)
+
+    if (all_rain > 0).sum() < settings.RAIN_MODE_MIN_READINGS:
+        return mode, False, {}
+
+    decoded = _rain_increments(
+        history["rain"].astype(float), history["previous"].astype(float), mode
+    ).to_numpy(dtype=float)
+    stored = history["rain_increment"].to_numpy(dtype=float)
+    changed = ~np.isclose(decoded, stored)
+
+    return mode, True, dict(zip(history["id"].to_numpy(dtype=np.int64)[changed].tolist(), decoded[changed].tolist()))
+
+
+def prepare_readings(
+        frame: pd.DataFrame,
+        context: Optional[Dict[str, pd.DataFrame]] = None,
+        rain_modes: Optional[Dict[str, Optional[str]]] = None,
+        rain_history: Optional[Dict[str, pd.DataFrame]] = None
+) -> Tuple[pd.DataFrame, Dict[str, Optional[str]], Dict[str, Dict[str, Any]], Dict[int, Dict[str, Any]]]:
+    """
+    Everything computed once per reading at ingest: qc_flags, the per-interval rain and the rain mode of every
+    dataset, plus the catalog statistics of the batch.
+
+    Counters are decoded from the last stored reading on (context, dataset_id -> the stored readings preceding the
+    batch in time order, see context_frame). The context readings are judged again with the batch following them,
+    the spike check of the last one needs the reading after it. A dataset keeps the rain mode stored for it,
+    otherwise the mode is detected from its stored readings with rain (rain_history, RAIN_HISTORY_COLUMNS) and the
+    batch, see _detect_rain_mode. Returns the prepared batch, the rain modes to save, the catalog statistics and the
+    corrected columns of stored readings (id -> {column: value}): their qc_flags and rain_increment.
+    """
+
+    context = context or {}
+    rain_history = rain_history or {}
+    modes = dict(rain_modes or {})
+    corrections = {}
+
+    frame = frame.copy()
+    frame["rain"] = frame["rain"].astype(float).fillna(0)
+    qc_flags = np.zeros(len(frame), dtype=np.int64)
+    rain_increment = np.zeros(len(frame))
+
+    for dataset_id, group in frame.groupby("dataset_id", sort=False):
+        stored = context.get(dataset_id)
+        if stored is None:
+            stored = pd.DataFrame(columns=list(READING_COLUMNS))
+
+        flags = quality_control_flags(group.reset_index(drop=True), stored, include_context=True)
+        qc_flags[group.index.to_numpy()] = flags[len(stored):]
+        for id_, stored_flags in _rejudged_context_flags(stored, flags[:len(stored)]).items():
+            corrections.setdefault(id_, {})["qc_flags"] = stored_flags
+
+        group = group.sort_values("date", kind="stable")
+        stored_rain = stored["rain"].astype(float).fillna(0)
+        previous = group["rain"].shift(1)
+        if not stored_rain.empty:
+            previous.iloc[0] = stored_rain.iloc[-1]
+
+        mode = modes.get(dataset_id)
+        if mode is None:
+            history = rain_history.get(dataset_id)
+            if history is None:
+                history = pd.DataFrame(columns=list(RAIN_HISTORY_COLUMNS))
+
+            mode, save, corrected = _detect_rain_mode(group["rain"], previous, history)
+            if save:
+                modes[dataset_id] = mode
+                for id_, increment in corrected.items():
+                    corrections.setdefault(id_, {})["rain_increment"] = increment
+
+        rain_increment[group.index.to_numpy()] = _rain_increments(group["rain"], previous, mode).to_numpy()
+
+    frame["qc_flags"] = qc_flags
+    frame["rain_increment"] = rain_increment
+
+    return frame, modes, _catalog_stats(frame), corrections
+
+
+def _insert_rows(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    frame = frame.assign(date=frame["date"].dt.date)
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+
+async def ingest_readings(db: AsyncSession, frame: pd.DataFrame) -> int:
+    """
+    Bulk ingestion of readings, one transaction per call: quality control and rain decoding against the stored
+    readings preceding every dataset's batch, then the insert, the corrections of stored readings and the catalog
+    update. The catalog entries of the datasets are locked before their stored readings are read, a concurrent
+    upload to the same dataset waits and then decodes its batch from this one's readings.
+    """
+
+    if frame.empty:
+        return 0
+
+    firsts = frame.groupby("dataset_id", sort=False)["date"].min()
+    try:
+        entries = await crud.dataset_async.lock_catalog(db, list(firsts.index))
+
+        context = {}
+        for dataset_id, first in firsts.items():
+            context[dataset_id] = context_frame(
+                await crud.dataset_async.get_preceding(db, dataset_id, first.date(), settings.QC_FLATLINE_WINDOW)
+            )
+
+        rain_modes = {dataset_id: entries[dataset_id].rain_mode for dataset_id in context}
+        rain_history = {
+            dataset_id: pd.DataFrame(
+                await crud.dataset_async.get_rain_history(db, dataset_id), columns=list(RAIN_HISTORY_COLUMNS)
+            )
+            for dataset_id in context
+            if rain_modes.get(dataset_id) is None
+        }
+        prepared, rain_modes, stats, corrections = await run_in_threadpool(
+            prepare_readings, frame, context, rain_modes, rain_history
+        )
+
+        rows = await run_in_threadpool(_insert_rows, prepared)
+    except Exception:
+        # Releases the catalog locks, add_datasets commits or rolls back itself
+        await db.rollback()
+        raise
+
+    await crud.dataset_async.add_datasets(db, rows, stats, rain_modes, corrections)
+
+    return len(rows)
@@ -0,0 +1,29 @@
+from typing import Dict, List, Sequence
+
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+CHUNK_PENDING = "pending"
+CHUNK_RUNNING = "running"
+CHUNK_DONE = "done"
+CHUNK_FAILED = "failed"
+
+
+class IncompleteRunError(Exception):
+    """
+    Raised by the nightly ETo job when chunks still have locations without ETo, the run can be resumed.
+    """
+
+
+def plan_chunks(cells: Dict[str, Sequence], cells_per_chunk: int) -> List[List[int]]:
+    """
+    Location ids of the chunks of a run, cells_per_chunk whole weather grid cells each (a cell shares one fetch),
+    in cell order.
+    """
+
+    keys = sorted(cells)
+    return [
+        [l.id for key in keys[i:i + cells_per_chunk] for l in cells[key]]
+        for i in range(0, len(keys), cells_per_chunk)
+    ]
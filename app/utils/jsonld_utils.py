@@ -1,133 +1,120 @@
-from typing import List
+from typing import Any, Dict, List
 
-import utils
 import uuid
 from schemas import Dataset, DatasetAnalysis, EToResponse
+from utils.custom_schemas import context
 
 from datetime import datetime
 
-def jsonld_get_dataset(dataset: list[Dataset]):
-    context = utils.context
-    graph = []
+# The compact form references the context by its URL instead of a list
+COMPACT_CONTEXT = context[0] if len(context) == 1 else context
+
+SOIL_MOISTURE_DEPTHS = (10, 20, 30, 40, 50, 60)
+
+# Fragments without per-response values, rendered once at import and shared by every node referencing them
+_DEPTH_NODES = {
+    depth: {
+        "@id": "urn:openagri:depth:{}".format(depth),
+        "@type": "[Measure]",
+        "hasNumericValue": "{}".format(depth),
+        "hasUnit": "om:centimetre"
+    }
+    for depth in SOIL_MOISTURE_DEPTHS
+}
+_DEPTH_REFS = {depth: {"@id": node["@id"]} for depth, node in _DEPTH_NODES.items()}
+_DEPTH_ATTRIBUTES = tuple(("soil_moisture_{}".format(depth), depth) for depth in SOIL_MOISTURE_DEPTHS)
+
+# (property, reading attribute, @type, description) of the weather nodes of a reading
+_WEATHER_NODES = tuple(
+    (name, attribute, "https://smartdatamodels.org/dataModel.Weather/{}".format(name),
+     "the measured {} during monitoring of the soil moisture".format(description))
+    for name, attribute, description in (
+        ("precipitation", "rain", "precipitation"),
+        ("temperature", "temperature", "temperature"),
+        ("relativeHumidity", "humidity", "relative humidity"),
+    )
+)
+
+_MOISTURE_TYPES = ["ObservableProperty", "Moisture"]
+_EVAPORATION_TYPES = ["ObservableProperty", "Evaporation"]
+_SOIL_TYPES = ["FeatureOfInterest", "Soil"]
+_COLLECTION_TYPES = ["ObservationCollection"]
+_OBSERVATION_TYPES = ["Observation"]
+
+
+def _ref(node: Dict[str, Any]) -> Dict[str, str]:
+    return {"@id": node["@id"]}
+
+
+def jsonld_get_dataset(dataset: list[Dataset], compact: bool = False):
+    """
+    JSON-LD of the readings of a dataset. The compact form references the context by URL and lists the nodes
+    shared by the readings (observed property, feature of interest, depths, repeated weather values) once in the
+    graph, the readings refer to them by @id.
+    """
 
     uuid4_temp = uuid.uuid4()
 
-    for d in dataset:
+    observed_property = {
+        "@id": "urn:openagri:Moisture:op:{}".format(uuid4_temp),
+        "@type": _MOISTURE_TYPES,
+        "name": "The moisture level in some material"
+    }
+    feature_of_interest = {
+        "@id": "urn:openagri:soil:foi:{}".format(uuid4_temp),
+        "@type": _SOIL_TYPES
+    }
+    collection_id = "urn:openagri:soilMoistureMonitoring:{}".format(uuid4_temp)
+    member_ids = [
+        "urn:openagri:soilMoistureVwc:obs{}:{}".format(n, uuid4_temp) for n in range(1, len(SOIL_MOISTURE_DEPTHS) + 1)
+    ]
+    depths = _DEPTH_REFS if compact else _DEPTH_NODES
+    shared = {}
 
+    graph = []
+    for d in dataset:
         graph_element = {
-            "@id": "urn:openagri:soilMoistureMonitoring:{}".format(uuid4_temp),
-            "@type": ["ObservationCollection"],
+            "@id": collection_id,
+            "@type": _COLLECTION_TYPES,
             "description": "Monitoring of soil moisture levels at various depths in the soil of a parcel",
             "resultTime": "{}".format(d.date),
-            "observedProperty": {
-                "@id": "urn:openagri:Moisture:op:{}".format(uuid4_temp),
-                "@type": ["ObservableProperty", "Moisture"],
-                "name": "The moisture level in some material"
-            },
-            "hasFeatureOfInterest": {
-                "@id": "urn:openagri:soil:foi:{}".format(uuid4_temp),
-                "@type": ["FeatureOfInterest", "Soil"]
-            },
-            "precipitation": {
-                "@id": "urn:openagri:precipitation:{}".format(d.rain),
-                "@type": "https://smartdatamodels.org/dataModel.Weather/precipitation",
-                "description": "the measured precipitation during monitoring of the soil moisture",
-                "value": d.rain
-            },
-            "temperature": {
-                "@id": "urn:openagri:temperature:{}".format(d.temperature),
-                "@type": "https://smartdatamodels.org/dataModel.Weather/temperature",
-                "description": "the measured temperature during monitoring of the soil moisture",
-                "value": d.temperature
-            },
-            "relativeHumidity": {
-                "@id": "urn:openagri:relativeHumidity:{}".format(d.humidity),
-                "@type": "https://smartdatamodels.org/dataModel.Weather/relativeHumidity",
-                "description": "the measured relative humidity during monitoring of the soil moisture",
-                "value": d.humidity
-            },
-            "hasMember": [
-                {
-                    "@id": "urn:openagri:soilMoistureVwc:obs1:{}".format(uuid4_temp),
-                    "@type": ["Observation"],
-                    "hasSimpleResult": "{}".format(d.soil_moisture_10),
-                    "atDepth": {
-                        "@id": "urn:openagri:depth:10",
-                        "@type": "[Measure]",
-                        "hasNumericValue": "10",
-                        "hasUnit": "om:centimetre"
-                    }
-                },
-                {
-                    "@id": "urn:openagri:soilMoistureVwc:obs2:{}".format(uuid4_temp),
-                    "@type": ["Observation"],
-                    "hasSimpleResult": "{}".format(d.soil_moisture_20),
-                    "atDepth": {
-                        "@id": "urn:openagri:depth:20",
-                        "@type": "[Measure]",
-                        "hasNumericValue": "20",
-                        "hasUnit": "om:centimetre"
-                    }
-                },
-                {
-                    "@id": "urn:openagri:soilMoistureVwc:obs3:{}".format(uuid4_temp),
-                    "@type": ["Observation"],
-                    "hasSimpleResult": "{}".format(d.soil_moisture_30),
-                    "atDepth": {
-                        "@id": "urn:openagri:depth:30",
-                        "@type": "[Measure]",
-                        "hasNumericValue": "30",
-                        "hasUnit": "om:centimetre"
-                    }
-                },
-                {
-                    "@id": "urn:openagri:soilMoistureVwc:obs4:{}".format(uuid4_temp),
-                    "@type": ["Observation"],
-                    "hasSimpleResult": "{}".format(d.soil_moisture_40),
-                    "atDepth": {
-                        "@id": "urn:openagri:depth:40",
-                        "@type": "[Measure]",
-                        "hasNumericValue": "40",
-                        "hasUnit": "om:centimetre"
-                    }
-                },
-                {
-                    "@id": "urn:openagri:soilMoistureVwc:obs5:{}".format(uuid4_temp),
-                    "@type": ["Observation"],
-                    "hasSimpleResult": "{}".format(d.soil_moisture_50),
-                    "atDepth": {
-                        "@id": "urn:openagri:depth:50",
-                        "@type": "[Measure]",
-                        "hasNumericValue": "50",
-                        "hasUnit": "om:centimetre"
-                    }
-                },
-                {
-                    "@id": "urn:openagri:soilMoistureVwc:obs6:{}".format(uuid4_temp),
-                    "@type": ["Observation"],
-                    "hasSimpleResult": "{}".format(d.soil_moisture_60),
-                    "atDepth": {
-                        "@id": "urn:openagri:depth:60",
-                        "@type": "[Measure]",
-                        "hasNumericValue": "60",
-                        "hasUnit": "om:centimetre"
-                    }
-                }
-            ]
+            "observedProperty": _ref(observed_property) if compact else observed_property,
+            "hasFeatureOfInterest": _ref(feature_of_interest) if compact else feature_of_interest,
         }
 
+        for name, attribute, node_type, description in _WEATHER_NODES:
+            value = getattr(d, attribute)
+            node_id = "urn:openagri:{}:{}".format(name, value)
+            if compact:
+                if node_id not in shared:
+                    shared[node_id] = {"@id": node_id, "@type": node_type, "description": description, "value": value}
+                graph_element[name] = {"@id": node_id}
+            else:
+                graph_element[name] = {"@id": node_id, "@type": node_type, "description": description, "value": value}
+
+        graph_element["hasMember"] = [
+            {
+                "@id": member_id,
+                "@type": _OBSERVATION_TYPES,
+                "hasSimpleResult": "{}".format(getattr(d, attribute)),
+                "atDepth": depths[depth]
+            }
+            for member_id, (attribute, depth) in zip(member_ids, _DEPTH_ATTRIBUTES)
+        ]
+
         graph.append(graph_element)
 
+    if compact:
+        graph = [observed_property, feature_of_interest, *_DEPTH_NODES.values(), *shared.values(), *graph]
 
     doc = {
-        "@context": context,
+        "@context": COMPACT_CONTEXT if compact else context,
         "@graph": graph
     }
     return doc
 
 
 def jsonld_analyse_soil_moisture(analysis: DatasetAnalysis):
-    context = utils.context
     analysis_uuid = uuid.uuid4()
 
     def format_xsd_date(d: datetime) -> str:
@@ -203,36 +190,43 @@ def jsonld_analyse_soil_moisture(analysis: DatasetAnalysis):
     return doc
 
 
-def jsonld_eto_response(eto: EToResponse):
-    context = utils.context
-    graph = []
+def jsonld_eto_response(eto: EToResponse, compact: bool = False):
+    """
+    JSON-LD of ETo calculations, the compact form as for the dataset readings.
+    """
 
     uuid4_temp = uuid.uuid4()
 
-    calculations = eto.calculations
-
-    for c in calculations:
+    observed_property = {
+        "@id": "urn:openagri:evaporation:op:{}".format(uuid4_temp),
+        "@type": _EVAPORATION_TYPES
+    }
+    feature_of_interest = {
+        "@id": "urn:openagri:soil:foi:{}".format(uuid4_temp),
+        "@type": _SOIL_TYPES
+    }
+    calculation_id = "urn:openagri:evaporation:calculation:{}".format(uuid4_temp)
+    observed = _ref(observed_property) if compact else observed_property
+    feature = _ref(feature_of_interest) if compact else feature_of_interest
 
-        graph_element =  {
-            "@id": "urn:openagri:evaporation:calculation:{}".format(uuid4_temp),
+    graph = [
+        {
+            "@id": calculation_id,
             "@type": "Observation",
             "description": "Measurement or calculation of the evaporation of the soil on a parcel on a specific date",
             "resultTime": "{}".format(c.date),
-            "observedProperty": {
-                "@id": "urn:openagri:evaporation:op:{}".format(uuid4_temp),
-                "@type": ["ObservableProperty", "Evaporation"]
-            },
-            "hasFeatureOfInterest": {
-                "@id": "urn:openagri:soil:foi:{}".format(uuid4_temp),
-                "@type": ["FeatureOfInterest", "Soil"]
-            },
+            "observedProperty": observed,
+            "hasFeatureOfInterest": feature,
             "hasSimpleResult": "{}".format(c.value)
         }
+        for c in eto.calculations
+    ]
 
-        graph.append(graph_element)
+    if compact:
+        graph = [observed_property, feature_of_interest, *graph]
 
     doc = {
-        "@context": context,
+        "@context": COMPACT_CONTEXT if compact else context,
         "@graph": graph
     }
 
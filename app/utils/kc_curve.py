@@ -0,0 +1,60 @@
+import datetime
+from typing import Sequence
+
+import numpy as np
+
+from models import CropKc
+
+
+def kc_curves(
+        planting_dates: np.ndarray, stage_lengths: np.ndarray, kc_values: np.ndarray, dates: np.ndarray
+) -> np.ndarray:
+    """
+    FAO-56 piecewise linear Kc curves (fig. 25) for many parcels at once.
+
+    planting_dates: (parcels,) datetime64[D]
+    stage_lengths: (parcels, 4) days of the initial, development, mid-season and late-season stages
+    kc_values: (parcels, 3) kc_init, kc_mid, kc_end
+    dates: (days,) datetime64[D]
+
+    Returns (parcels, days). Days before planting get kc_init and days after the late season kc_end.
+    """
+
+    t = (dates[None, :] - planting_dates[:, None]).astype("timedelta64[D]").astype(float)
+
+    l_ini, l_dev, l_mid, l_late = (stage_lengths[:, i:i + 1].astype(float) for i in range(4))
+    kc_init, kc_mid, kc_end = (kc_values[:, i:i + 1].astype(float) for i in range(3))
+
+    end_ini = l_ini
+    end_dev = end_ini + l_dev
+    end_mid = end_dev + l_mid
+
+    development = np.clip((t - end_ini) / np.maximum(l_dev, 1), 0, 1)
+    late = np.clip((t - end_mid) / np.maximum(l_late, 1), 0, 1)
+
+    return np.select(
+        [t < end_ini, t < end_dev, t < end_mid],
+        [
+            np.broadcast_to(kc_init, t.shape),
+            kc_init + development * (kc_mid - kc_init),
+            np.broadcast_to(kc_mid, t.shape)
+        ],
+        default=kc_mid + late * (kc_end - kc_mid)
+    )
+
+
+def has_crop_calendar(crop_kc: CropKc) -> bool:
+    return None not in (crop_kc.l_ini, crop_kc.l_dev, crop_kc.l_mid, crop_kc.l_late)
+
+
+def crop_kc_curve(crop_kc: CropKc, planting_date: datetime.date, dates: Sequence[datetime.date]) -> np.ndarray:
+    """
+    Daily Kc of one crop planted on planting_date, for the given dates.
+    """
+
+    return kc_curves(
+        np.array([planting_date], dtype="datetime64[D]"),
+        np.array([[crop_kc.l_ini, crop_kc.l_dev, crop_kc.l_mid, crop_kc.l_late]]),
+        np.array([[crop_kc.kc_init, crop_kc.kc_mid, crop_kc.kc_end]]),
+        np.array(list(dates), dtype="datetime64[D]")
+    )[0]
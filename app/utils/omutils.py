@@ -1,19 +1,34 @@
 import datetime
+import functools
+import math
+from collections import defaultdict
 from datetime import timezone, timedelta
-from typing import Optional
+from typing import Optional, List, Tuple
 
-import openmeteo_requests
-import requests_cache
-from retry_requests import retry
+import numpy as np
+import requests
+from requests import RequestException
 from sqlalchemy.orm import Session
 
 import crud
 from schemas import EToResponse, Calculation, EtoCreate, Crop, KcStage
 from models import CropKc
+from core.config import settings
+from core.metrics import track_outbound
+from utils.grid import grid_cell_key, grid_cell_center
+from utils.kc_curve import crop_kc_curve, has_crop_calendar
+from utils.water_balance import stage_kc
 
-cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
-openmeteo = openmeteo_requests.Client(session=retry_session)
+
+@functools.lru_cache(maxsize=None)
+def _openmeteo_client():
+    # Built on first use, the SQLite response cache and the client libraries are not needed before a historical fetch
+    import openmeteo_requests
+    import requests_cache
+    from retry_requests import retry
+
+    cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
+    return openmeteo_requests.Client(session=retry(cache_session, retries=5, backoff_factor=0.2))
 
 
 def fetch_historical_eto_for_location(
@@ -25,30 +40,41 @@ def fetch_historical_eto_for_location(
         db: Session,
         crop: Optional[Crop] = None,
         stage: Optional[KcStage] = None,
+        planting_date: Optional[datetime.date] = None,
 ) -> Optional[EToResponse]:
 
-    kc_value = None
-    if crop and stage:
+    kc_row = None
+    if crop and (stage or planting_date):
         kc_row = db.query(CropKc).filter(CropKc.crop == crop.value).first()
-        if kc_row:
-            if stage == KcStage.kc_init:
-                kc_value = kc_row.kc_init
-            elif stage == KcStage.kc_mid:
-                kc_value = kc_row.kc_mid
-            elif stage == KcStage.kc_end:
-                kc_value = kc_row.kc_end
-
-    existing_db_records = crud.eto.get_calculations(
+
+    # The backfill is shared by every location of the weather grid cell: one fetch at the cell center,
+    # stored for each member that lacks the dates
+    location_db = crud.location.get(db=db, id=location_id)
+    if location_db is not None:
+        cell = location_db.grid_cell or grid_cell_key(location_db.latitude, location_db.longitude)
+        member_ids = {l.id for l in crud.location.get_by_grid_cell(db=db, grid_cell=cell)} | {location_id}
+        latitude, longitude = grid_cell_center(cell)
+    else:
+        member_ids = {location_id}
+
+    existing_db_records = crud.eto.get_calculations_for_locations(
         db=db,
         from_date=from_date,
         to_date=to_date,
-        location_id=location_id
+        location_ids=list(member_ids)
     )
-    existing_data_map = {record.date: record.value for record in existing_db_records}
+    existing_by_location = defaultdict(dict)
+    for record in existing_db_records:
+        existing_by_location[record.location_id][record.date] = record.value
+    existing_data_map = existing_by_location[location_id]
 
     delta = to_date - from_date
     requested_dates = [from_date + timedelta(days=i) for i in range(delta.days + 1)]
-    missing_dates = [d for d in requested_dates if d not in existing_data_map]
+    missing_by_location = {
+        member_id: {d for d in requested_dates if d not in existing_by_location[member_id]}
+        for member_id in member_ids
+    }
+    missing_dates = set().union(*missing_by_location.values())
 
     fetched_data_map = {}
 
@@ -56,21 +82,23 @@ def fetch_historical_eto_for_location(
         fetch_start = min(missing_dates)
         fetch_end = max(missing_dates)
 
-        url = "https://historical-forecast-api.open-meteo.com/v1/forecast"
+        url = settings.OPEN_METEO_HISTORICAL_BASE_URL.rstrip("/") + "/v1/forecast"
         params = {
             "latitude": latitude,
             "longitude": longitude,
             "start_date": fetch_start.strftime("%Y-%m-%d"),
             "end_date": fetch_end.strftime("%Y-%m-%d"),
-            "daily": "et0_fao_evapotranspiration",
+            "daily": ["et0_fao_evapotranspiration", "precipitation_sum"],
         }
 
         try:
-            responses = openmeteo.weather_api(url, params=params)
+            with track_outbound("open_meteo"):
+                responses = _openmeteo_client().weather_api(url, params=params)
             response = responses[0]
 
             daily = response.Daily()
             daily_et0 = daily.Variables(0).ValuesAsNumpy()
+            daily_precipitation = daily.Variables(1).ValuesAsNumpy()
             start_time = daily.Time()
             interval = daily.Interval()
 
@@ -82,14 +110,17 @@ def fetch_historical_eto_for_location(
 
                 if current_date in missing_dates:
                     py_eto_val = float(eto_value)
+                    py_precipitation_val = float(daily_precipitation[i])
                     fetched_data_map[current_date] = py_eto_val
 
-                    new_eto_records.append(
+                    new_eto_records.extend(
                         EtoCreate(
                             date=current_date,
                             value=py_eto_val,
-                            location_id=location_id
-                        )
+                            precipitation=None if math.isnan(py_precipitation_val) else py_precipitation_val,
+                            location_id=member_id
+                        ) for member_id, member_missing in missing_by_location.items()
+                        if current_date in member_missing
                     )
 
             if new_eto_records:
@@ -100,15 +131,58 @@ def fetch_historical_eto_for_location(
         except Exception as e:
             return None
 
-    calculations_list = []
-    for req_date in requested_dates:
-        val = existing_data_map.get(req_date)
-        if val is None:
-            val = fetched_data_map.get(req_date)
+    values = np.array([
+        v if (v := existing_data_map.get(d, fetched_data_map.get(d))) is not None else np.nan for d in requested_dates
+    ], dtype=float)
+
+    # ETc with the crop's Kc curve when a planting date is given, otherwise with the stage's fixed Kc
+    if kc_row is not None and planting_date is not None and has_crop_calendar(kc_row):
+        values = values * crop_kc_curve(kc_row, planting_date, requested_dates)
+    elif kc_row is not None and stage:
+        values = values * stage_kc(kc_row, stage.value)
 
-        if val is not None and kc_value is not None:
-            val = val * kc_value
+    return EToResponse(calculations=[
+        Calculation(date=d, value=None if np.isnan(v) else v) for d, v in zip(requested_dates, values.tolist())
+    ])
 
-        calculations_list.append(Calculation(date=req_date, value=val))
 
-    return EToResponse(calculations=calculations_list)
\ No newline at end of file
+def fetch_daily_forecasts(
+        points: List[Tuple[float, float]], variables: List[str], forecast_days: int
+) -> List[Optional[dict]]:
+    """
+    Daily Open-Meteo forecasts for many points, with up to OPEN_METEO_MAX_LOCATIONS coordinates per request.
+    Returns the "daily" block of each point in order, None for the points of a batch that failed.
+    """
+
+    forecasts = []
+    for i in range(0, len(points), settings.OPEN_METEO_MAX_LOCATIONS):
+        batch = points[i:i + settings.OPEN_METEO_MAX_LOCATIONS]
+
+        try:
+            with track_outbound("open_meteo"):
+                response = requests.get(
+                    url=settings.OPEN_METEO_BASE_URL.rstrip("/") + "/v1/forecast",
+                    params={
+                        "latitude": ",".join(str(p[0]) for p in batch),
+                        "longitude": ",".join(str(p[1]) for p in batch),
+                        "daily": ",".join(variables),
+                        "forecast_days": forecast_days,
+                        "timezone": "auto"
+                    },
+                    timeout=120
+                )
+        except RequestException:
+            forecasts.extend([None] * len(batch))
+            continue
+
+        if (response.status_code / 100) != 2:
+            forecasts.extend([None] * len(batch))
+            continue
+
+        body = response.json()
+        # A single coordinate gets an object back, several a list
+        body = body if isinstance(body, list) else [body]
+
+        forecasts.extend(b.get("daily") for b in body)
+
+    return forecasts
@@ -0,0 +1,52 @@
+import json
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import shapely
+
+
+def _centroid_xy(geometries: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    centroids = shapely.centroid(geometries)
+    # get_x/get_y give NaN for missing geometries but fail on empty points
+    centroids[shapely.is_empty(centroids)] = None
+
+    return shapely.get_x(centroids), shapely.get_y(centroids)
+
+
+def wkt_centroids(parcels: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Centroids (latitude, longitude) of WKT parcels, parsed in one vectorized pass.
+    Follows /parcel-wkt/, where the first WKT coordinate is the latitude. Unparsable or empty parcels give NaN.
+    """
+
+    geometries = shapely.from_wkt(np.asarray(parcels, dtype=object), on_invalid="ignore")
+
+    return _centroid_xy(geometries)
+
+
+def geojson_centroids(features: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Centroids (latitude, longitude) of GeoJSON features, which are in (longitude, latitude) order.
+    Features without a valid geometry give NaN.
+    """
+
+    geometries = shapely.from_geojson(
+        np.asarray([json.dumps(f.get("geometry")) if isinstance(f, dict) else "null" for f in features], dtype=object),
+        on_invalid="ignore"
+    )
+    longitudes, latitudes = _centroid_xy(geometries)
+
+    return latitudes, longitudes
+
+
+def centroid_keys(latitudes: np.ndarray, longitudes: np.ndarray, tolerance: float) -> List[Tuple[int, int]]:
+    """
+    Keys under which centroids closer than the tolerance (degrees) collapse, used to drop duplicate parcels.
+    """
+
+    # NaN centroids get arbitrary keys, callers drop them before deduplicating
+    with np.errstate(invalid="ignore"):
+        lat_keys = np.round(latitudes / tolerance).astype(np.int64)
+        lon_keys = np.round(longitudes / tolerance).astype(np.int64)
+
+    return list(zip(lat_keys.tolist(), lon_keys.tolist()))
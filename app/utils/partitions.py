@@ -0,0 +1,240 @@
+import datetime
+import logging
+import os
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+import crud
+from core.config import settings
+from db.session import SessionLocal
+from models import Dataset, DatasetCatalog, Eto
+from utils.arrow_io import DATASET_EXPORT_COLUMNS, ETO_EXPORT_COLUMNS, stream_export
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DROP = "drop"
+RETENTION_ARCHIVE = "archive"
+
+# Tables partitioned by month of their date column (alembic d5e8a1b4c7f2), with the columns an archive keeps
+PARTITIONED_TABLES = {
+    "dataset": (Dataset, DATASET_EXPORT_COLUMNS),
+    "eto": (Eto, ETO_EXPORT_COLUMNS),
+}
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+
+def add_months(month: datetime.date, months: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    return "{}_p{:%Y_%m}".format(table, month)
+
+
+def is_partitioned(db: Session, table: str) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+
+    return db.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table"
+    ), {"table": table}).first() is not None
+
+
+def list_partitions(db: Session, table: str) -> Dict[datetime.date, str]:
+    """
+    Monthly partitions of the table by their first day, the default partition is not listed.
+    """
+
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": table}).scalars().all()
+
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match and match.group("table") == table:
+            partitions[datetime.date(int(match.group("year")), int(match.group("month")), 1)] = name
+
+    return partitions
+
+
+def create_partition(db: Session, table: str, month: datetime.date) -> str:
+    """
+    Adds the partition of the month. Rows of the month stored in the default partition meanwhile (late uploads,
+    imports of old history) are moved into it first, attaching it would fail otherwise.
+    """
+
+    name = partition_name(table, month)
+    bounds = {"start": month, "end": add_months(month, 1)}
+
+    db.execute(text("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)".format(name, table)))
+    db.execute(text(
+        "WITH moved AS (DELETE FROM {1}_default WHERE date >= :start AND date < :end RETURNING *) "
+        "INSERT INTO {0} SELECT * FROM moved".format(name, table)
+    ), bounds)
+    db.execute(text("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES FROM ('{}') TO ('{}')".format(
+        table, name, bounds["start"], bounds["end"]
+    )))
+
+    return name
+
+
+def convert_table(db: Session, table: str, partitioned: bool, premake_months: int = 0) -> None:
+    """
+    Rebuilds the table as monthly range partitions by date, or back as a plain table, with its rows, defaults, id
+    sequence, indexes and foreign keys. Runs in the caller's transaction, which holds an exclusive lock on the table
+    until it commits.
+    """
+
+    if partitioned:
+        undated = db.execute(text("SELECT count(*) FROM {} WHERE date IS NULL".format(table))).scalar()
+        if undated:
+            raise ValueError(
+                "{} has {} rows without a date, delete them before partitioning it by date".format(table, undated)
+            )
+
+    sequence = db.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": table}).scalar()
+    # Unique indexes other than the primary key would have to include the partition key, the models declare none
+    indexes = db.execute(text(
+        "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i JOIN pg_class c ON c.oid = i.indrelid "
+        "WHERE c.relname = :table AND NOT i.indisunique"
+    ), {"table": table}).scalars().all()
+    foreign_keys = db.execute(text(
+        "SELECT con.conname, pg_get_constraintdef(con.oid) FROM pg_constraint con "
+        "JOIN pg_class c ON c.oid = con.conrelid WHERE c.relname = :table AND con.contype = 'f'"
+    ), {"table": table}).all()
+
+    if partitioned:
+        db.execute(text("CREATE TABLE {0}_new (LIKE {0} INCLUDING DEFAULTS) PARTITION BY RANGE (date)".format(table)))
+        # Unique constraints of a partitioned table have to include the partition key
+        db.execute(text("ALTER TABLE {0}_new ADD CONSTRAINT {0}_new_pkey PRIMARY KEY (id, date)".format(table)))
+        db.execute(text("CREATE TABLE {0}_default PARTITION OF {0}_new DEFAULT".format(table)))
+
+        first, last = db.execute(text("SELECT min(date), max(date) FROM {}".format(table))).first()
+        current = datetime.date.today().replace(day=1)
+        month = (first or current).replace(day=1)
+        until = add_months(max((last or current).replace(day=1), current), premake_months)
+        while month <= until:
+            db.execute(text("CREATE TABLE {} PARTITION OF {}_new FOR VALUES FROM ('{}') TO ('{}')".format(
+                partition_name(table, month), table, month, add_months(month, 1)
+            )))
+            month = add_months(month, 1)
+    else:
+        db.execute(text("CREATE TABLE {0}_new (LIKE {0} INCLUDING DEFAULTS)".format(table)))
+        db.execute(text("ALTER TABLE {0}_new ADD CONSTRAINT {0}_new_pkey PRIMARY KEY (id)".format(table)))
+
+    db.execute(text("INSERT INTO {0}_new SELECT * FROM {0}".format(table)))
+    if sequence:
+        db.execute(text("ALTER SEQUENCE {} OWNED BY {}_new.id".format(sequence, table)))
+
+    # The indexes and foreign keys go with the old table, their names are free again once it is dropped
+    db.execute(text("DROP TABLE {}".format(table)))
+    db.execute(text("ALTER TABLE {0}_new RENAME TO {0}".format(table)))
+    db.execute(text("ALTER TABLE {0} RENAME CONSTRAINT {0}_new_pkey TO {0}_pkey".format(table)))
+
+    for definition in indexes:
+        # The index of a partitioned table is printed ON ONLY it, which would skip the partitions
+        db.execute(text(definition.replace(" ON ONLY ", " ON ", 1)))
+    for name, definition in foreign_keys:
+        db.execute(text("ALTER TABLE {} ADD CONSTRAINT {} {}".format(table, name, definition)))
+
+
+def archive_rows(table: str, conditions: List, name: str) -> str:
+    """
+    Writes the rows of the table matching the conditions to PARTITION_ARCHIVE_DIR/<name>.parquet, in the format of
+    the dataset and ETo exports so an archive can be imported again.
+    """
+
+    model, columns = PARTITIONED_TABLES[table]
+    os.makedirs(settings.PARTITION_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(settings.PARTITION_ARCHIVE_DIR, "{}.parquet".format(name))
+
+    with open(path + ".part", "wb") as output:
+        for chunk in stream_export(SessionLocal(), model, list(columns), columns, conditions):
+            output.write(chunk)
+    os.replace(path + ".part", path)
+
+    return path
+
+
+def expire_partitions(db: Session, table: str, cutoff: datetime.date, archive: bool) -> List[str]:
+    """
+    Drops every monthly partition ending before the cutoff and the rows of the default partition older than it,
+    archiving them first when asked. Runs in the caller's transaction.
+    """
+
+    model, _ = PARTITIONED_TABLES[table]
+    expired = [(month, name) for month, name in sorted(list_partitions(db, table).items()) if month < cutoff]
+    # Only the default partition can still hold older rows, it stays small
+    default_expired = db.execute(
+        text("SELECT 1 FROM {}_default WHERE date < :cutoff LIMIT 1".format(table)), {"cutoff": cutoff}
+    ).first() is not None
+
+    # Archives are read through their own session, before any drop locks the table
+    if archive:
+        for month, name in expired:
+            archive_rows(table, [model.date >= month, model.date < add_months(month, 1)], name)
+        if default_expired:
+            archive_rows(table, [model.date < cutoff], "{}_default_before_{:%Y_%m}".format(table, cutoff))
+
+    for _, name in expired:
+        db.execute(text("DROP TABLE {}".format(name)))
+    if default_expired:
+        db.execute(text("DELETE FROM {}_default WHERE date < :cutoff".format(table)), {"cutoff": cutoff})
+
+    return [name for _, name in expired]
+
+
+def manage_partitions(db: Session, today: Optional[datetime.date] = None) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Partition maintenance of the partitioned tables: creates the partitions of the current month and the
+    PARTITION_PREMAKE_MONTHS after it, and applies DATASET_RETENTION_MONTHS / ETO_RETENTION_MONTHS by dropping (or
+    archiving, PARTITION_RETENTION_ACTION) whole partitions instead of deleting rows. Expired readings leave the
+    dataset catalog in the same transaction. A no-op for tables that are not partitioned.
+    """
+
+    if settings.PARTITION_RETENTION_ACTION not in (RETENTION_DROP, RETENTION_ARCHIVE):
+        raise ValueError("Unknown PARTITION_RETENTION_ACTION: {}".format(settings.PARTITION_RETENTION_ACTION))
+
+    current = (today or datetime.date.today()).replace(day=1)
+    retention = {"dataset": settings.DATASET_RETENTION_MONTHS, "eto": settings.ETO_RETENTION_MONTHS}
+    summary = {}
+
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(db, table):
+            continue
+
+        existing = list_partitions(db, table)
+        created = [
+            create_partition(db, table, month)
+            for month in (add_months(current, i) for i in range(settings.PARTITION_PREMAKE_MONTHS + 1))
+            if month not in existing
+        ]
+        db.commit()
+
+        dropped = []
+        if retention[table] > 0:
+            cutoff = add_months(current, -retention[table])
+
+            affected = []
+            if table == "dataset":
+                affected = db.execute(
+                    select(DatasetCatalog.dataset_id).where(DatasetCatalog.first_date < cutoff)
+                ).scalars().all()
+
+            dropped = expire_partitions(db, table, cutoff, settings.PARTITION_RETENTION_ACTION == RETENTION_ARCHIVE)
+            crud.dataset.refresh_catalog(db, affected)
+            db.commit()
+
+        if created or dropped:
+            logger.info("Partitions of %s created: %s, expired: %s", table, created, dropped)
+        summary[table] = {"created": created, "dropped": dropped}
+
+    return summary
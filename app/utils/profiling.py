@@ -0,0 +1,176 @@
+import cProfile
+import datetime
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+from core import settings
+from core.metrics import track_stage
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("timings", "cprofile", "pyinstrument")
+
+# tracemalloc and its peak are process-wide, one run at a time tracks allocations
+_allocation_lock = threading.Lock()
+
+
+class StageRecord:
+    def __init__(self, name: str, depth: int = 0):
+        self.name = name
+        self.depth = depth
+        self.duration_s: float = 0.0
+        self.rows: Optional[int] = None
+        self.allocated_bytes: Optional[int] = None
+        self.peak_bytes: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "depth": self.depth,
+            "duration_ms": round(self.duration_s * 1000, 3),
+            "rows": self.rows,
+            "allocated_bytes": self.allocated_bytes,
+            "peak_bytes": self.peak_bytes,
+        }
+
+
+class AnalysisTrace:
+    """
+    Collects per-stage wall time, row counts and (optionally) allocations of one analysis run.
+    """
+
+    def __init__(self, track_allocations: bool = False):
+        self.track_allocations = track_allocations
+        self.stages: List[StageRecord] = []
+        self.depth = 0
+        # Highest traced memory of the nested stages of each open stage, a nested stage resets the peak
+        self.peaks: List[int] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": [stage.to_dict() for stage in self.stages],
+            # Nested stages are already part of their parent
+            "total_ms": round(sum(stage.duration_s for stage in self.stages if stage.depth == 0) * 1000, 3),
+        }
+
+
+_current_trace: ContextVar[Optional[AnalysisTrace]] = ContextVar("analysis_trace", default=None)
+
+
+@contextmanager
+def trace_stage(name: str):
+    """
+    Times a pipeline stage, always feeding the stage histogram, and records it in the active trace if any.
+
+    with trace_stage("preprocess") as stage:
+        df = preprocess_dataset(dataset)
+        stage.rows = len(df)
+    """
+    trace = _current_trace.get()
+    record = StageRecord(name, depth=trace.depth if trace is not None else 0)
+    if trace is not None:
+        trace.depth += 1
+    track_allocations = trace is not None and trace.track_allocations and tracemalloc.is_tracing()
+
+    if track_allocations:
+        allocated_before, peak_before = tracemalloc.get_traced_memory()
+        if trace.peaks:
+            trace.peaks[-1] = max(trace.peaks[-1], peak_before)
+        trace.peaks.append(0)
+        tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    try:
+        with track_stage(name):
+            yield record
+    finally:
+        record.duration_s = time.perf_counter() - start
+
+        if track_allocations:
+            allocated_after, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, trace.peaks.pop())
+            if trace.peaks:
+                trace.peaks[-1] = max(trace.peaks[-1], peak)
+            record.allocated_bytes = allocated_after - allocated_before
+            record.peak_bytes = peak - allocated_before
+
+        if trace is not None:
+            trace.depth -= 1
+            trace.stages.append(record)
+
+
+def _profile_path(label: str, extension: str) -> str:
+    os.makedirs(settings.PROFILE_OUTPUT_DIR, exist_ok=True)
+    timestamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    return os.path.join(settings.PROFILE_OUTPUT_DIR, "{}-{}.{}".format(label, timestamp, extension))
+
+
+def run_profiled(mode: str, label: str, fn: Callable, *args, **kwargs) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Runs `fn` with an active trace and returns (result, profile report).
+
+    * `timings`: stage breakdown with wall time and row counts, plus allocations (tracemalloc) when
+      PROFILING_ENABLED is set
+    * `cprofile`: stage breakdown plus a cProfile dump written to PROFILE_OUTPUT_DIR
+    * `pyinstrument`: stage breakdown plus a pyinstrument HTML report written to PROFILE_OUTPUT_DIR
+
+    The files are only logged, their server paths are not part of the report.
+    """
+    # Tracing slows down every thread of the process, it is only switched on for deployments that enable profiling,
+    # and runs tracking allocations wait for each other instead of resetting each other's peak
+    track_allocations = mode == "timings" and settings.PROFILING_ENABLED
+    if track_allocations:
+        _allocation_lock.acquire()
+
+    trace = AnalysisTrace(track_allocations=track_allocations)
+    token = _current_trace.set(trace)
+
+    started_tracemalloc = False
+    if trace.track_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracemalloc = True
+
+    report: Dict[str, Any] = {"mode": mode}
+    profile_file = None
+    try:
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            result = profiler.runcall(fn, *args, **kwargs)
+            profile_file = _profile_path(label, "prof")
+            profiler.dump_stats(profile_file)
+        elif mode == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise RuntimeError("pyinstrument is not installed, use the cprofile mode instead")
+
+            profiler = Profiler()
+            profiler.start()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                profiler.stop()
+            profile_file = _profile_path(label, "html")
+            with open(profile_file, "w") as f:
+                f.write(profiler.output_html())
+        else:
+            result = fn(*args, **kwargs)
+    finally:
+        if started_tracemalloc:
+            tracemalloc.stop()
+        _current_trace.reset(token)
+        if track_allocations:
+            _allocation_lock.release()
+
+    report.update(trace.to_dict())
+
+    if profile_file is not None:
+        logger.info("Wrote {} profile of {} to {}".format(mode, label, profile_file))
+
+    return result, report
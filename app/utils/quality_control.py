@@ -0,0 +1,122 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from core.config import settings
+
+# Depths with a soil moisture column in the dataset, each gets 4 bits of the qc_flags bitmask (10 cm -> bits 0-3)
+QC_DEPTHS = (10, 20, 30, 40, 50, 60)
+QC_BITS_PER_DEPTH = 4
+
+# Checks per depth
+QC_RANGE = 1
+QC_SPIKE = 2
+QC_FLATLINE = 4
+
+# Checks of the whole reading
+QC_DUPLICATE_TIMESTAMP = 1 << 24
+QC_TIMESTAMP_ORDER = 1 << 25
+
+
+def depth_flag(depth: int, check: int) -> int:
+    """
+    Bit of a per depth check, e.g. depth_flag(30, QC_SPIKE).
+    """
+
+    return check << (QC_BITS_PER_DEPTH * QC_DEPTHS.index(depth))
+
+
+def depth_rejected_mask(depth: int) -> int:
+    """
+    All bits of a depth, a reading with any of them set has an unusable value at that depth.
+    """
+
+    return ((1 << QC_BITS_PER_DEPTH) - 1) << (QC_BITS_PER_DEPTH * QC_DEPTHS.index(depth))
+
+
+def sm_column(depth: int) -> str:
+    return "soil_moisture_{}".format(depth)
+
+
+def _flatline(values: pd.DataFrame, window: int, max_variance: float) -> pd.DataFrame:
+    # A window is flat when its variance is ~0, every reading inside it is flagged, not just the window end
+    flat_end = (values.rolling(window, min_periods=window).var() <= max_variance).astype(float)
+    return flat_end.iloc[::-1].rolling(window, min_periods=1).max().iloc[::-1].fillna(0).astype(bool)
+
+
+def quality_control_flags(
+        df: pd.DataFrame,
+        context: Optional[pd.DataFrame] = None,
+        check_timestamps: bool = True,
+        include_context: bool = False
+) -> np.ndarray:
+    """
+    qc_flags bitmask of every reading of one dataset, readings in upload order with a "date" column.
+
+    The context, stored readings preceding the batch, serves as history for the rate-of-change and flatline checks.
+    include_context=True also returns the per depth flags of the context readings, first, judged again with the batch
+    following them: the spike check of the last stored reading needs the reading after it. Soil moisture of 0.0 is
+    the missing value sentinel and never flagged. check_timestamps=False skips the duplicate and order checks, for
+    dates without a time of day where every reading of a day shares one.
+    """
+
+    n = len(df)
+    frame = df if context is None or context.empty else pd.concat([context, df], ignore_index=True)
+    offset = len(frame) - n
+
+    flags = np.zeros(len(frame), dtype=np.int64)
+
+    depths = [d for d in QC_DEPTHS if sm_column(d) in frame.columns]
+    if depths:
+        raw = frame[[sm_column(d) for d in depths]].astype(float)
+        values = raw.where(raw != 0.0)
+
+        out_of_range = (values < settings.QC_SM_MIN_PCT) | (values > settings.QC_SM_MAX_PCT)
+        values = values.where(~out_of_range)
+
+        # Spike, a jump of at least QC_SPIKE_PCT away from the previous valid value and back at the next one
+        rise = values - values.ffill().shift(1)
+        fall = values.bfill().shift(-1) - values
+        spike = (
+            (rise.abs() >= settings.QC_SPIKE_PCT) & (fall.abs() >= settings.QC_SPIKE_PCT)
+            & (np.sign(rise) != np.sign(fall))
+        )
+
+        flat = _flatline(values.where(~spike), settings.QC_FLATLINE_WINDOW, settings.QC_FLATLINE_VARIANCE)
+
+        checks = (
+            out_of_range.to_numpy(dtype=np.int64) * QC_RANGE
+            | spike.to_numpy(dtype=np.int64) * QC_SPIKE
+            | flat.to_numpy(dtype=np.int64) * QC_FLATLINE
+        )
+        shifts = np.array([QC_BITS_PER_DEPTH * QC_DEPTHS.index(d) for d in depths], dtype=np.int64)
+        flags |= np.bitwise_or.reduce(checks << shifts, axis=1)
+
+    if not check_timestamps:
+        return flags if include_context else flags[offset:]
+
+    # Stored readings have no time of day, so the timestamp checks only compare the readings of the batch
+    batch = flags[offset:]
+    timestamps = pd.to_datetime(df["date"]).reset_index(drop=True)
+    # Repeated timestamps, the reading received first is kept
+    batch[timestamps.duplicated(keep="first").to_numpy()] |= QC_DUPLICATE_TIMESTAMP
+    # Clock jumps back, the reading is older than one received before it
+    batch[(timestamps < timestamps.cummax().shift(1)).to_numpy()] |= QC_TIMESTAMP_ORDER
+
+    return flags if include_context else batch
+
+
+def apply_qc_flags(df: pd.DataFrame, flags: np.ndarray) -> pd.DataFrame:
+    """
+    Masks the flagged soil moisture values with NaN and drops readings with an unusable timestamp.
+    """
+
+    flags = np.asarray(flags, dtype=np.int64)
+
+    for depth in QC_DEPTHS:
+        column = sm_column(depth)
+        if column in df.columns:
+            df[column] = df[column].mask((flags & depth_rejected_mask(depth)) != 0)
+
+    return df[(flags & (QC_DUPLICATE_TIMESTAMP | QC_TIMESTAMP_ORDER)) == 0]
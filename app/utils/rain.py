@@ -0,0 +1,76 @@
+from typing import Optional
+
+import pandas as pd
+
+from core.config import settings
+
+RAIN_MODE_CUMULATIVE = "cumulative"
+RAIN_MODE_INCREMENTAL = "incremental"
+
+
+def is_cumulative_rain(rain_series: pd.Series,
+                       cumulative_threshold: float = 0.90) -> bool:
+    """
+    Auto-detect whether the rain column is a cumulative tipping-bucket counter.
+
+    A cumulative counter broadcasts the same value repeatedly between tips.
+    If >= `cumulative_threshold` fraction of non-zero readings have diff == 0
+    the series is considered cumulative.
+    """
+    nonzero = rain_series[rain_series > 0]
+    if nonzero.empty:
+        return False
+    zero_diffs = (rain_series.diff()[rain_series > 0] == 0).sum()
+    return (zero_diffs / len(nonzero)) >= cumulative_threshold
+
+
+def detect_rain_mode(rain_series: pd.Series) -> Optional[str]:
+    """
+    Rain mode of a series in time order, None while it has no rain to tell the modes apart.
+    """
+
+    if not (rain_series > 0).any():
+        return None
+
+    return RAIN_MODE_CUMULATIVE if is_cumulative_rain(rain_series) else RAIN_MODE_INCREMENTAL
+
+
+def detect_rain_mode_of_readings(
+        rain: pd.Series, previous: pd.Series, cumulative_threshold: float = 0.90
+) -> Optional[str]:
+    """
+    detect_rain_mode of readings given with the rain of the reading before each (NaN for the first one), so the
+    readings without rain can be left out: they never count towards either mode.
+    """
+
+    rainy = rain > 0
+    if not rainy.any():
+        return None
+
+    zero_diffs = (rain[rainy] == previous[rainy]).sum()
+    return RAIN_MODE_CUMULATIVE if zero_diffs / rainy.sum() >= cumulative_threshold else RAIN_MODE_INCREMENTAL
+
+
+def decode_rain_increments(rain: pd.Series, previous: pd.Series) -> pd.Series:
+    """
+    Per-interval increments of cumulative counter readings given with the counter value of the reading before each,
+    the first increment is 0 without one. A drop of the counter is a logger reset, the counter restarted from zero
+    so the reading itself is the increment.
+    """
+
+    increments = rain - previous
+    reset = increments < -settings.RAIN_ZERO_TOLERANCE
+    return increments.mask(reset, rain).clip(lower=0).fillna(0)
+
+
+def decode_tipping_bucket_rain(rain_series: pd.Series, previous: Optional[float] = None) -> pd.Series:
+    """
+    Convert a cumulative tipping-bucket counter into per-interval increments.
+
+    `previous` is the counter value of the reading before the series, without it the first increment is 0.
+    """
+    previous_values = rain_series.shift(1)
+    if previous is not None and not previous_values.empty:
+        previous_values.iloc[0] = previous
+
+    return decode_rain_increments(rain_series, previous_values)
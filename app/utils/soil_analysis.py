@@ -1,4 +1,4 @@
-from typing import List, Dict, Union, Tuple, Optional
+from typing import List, Dict, Mapping, Union, Tuple, Optional
 
 from schemas import Dataset as DatasetScheme
 from schemas import DatasetAnalysis, IrrigationDatapoints, DataPoints, SoilTypes
@@ -6,14 +6,21 @@ from schemas import DatasetAnalysis, IrrigationDatapoints, DataPoints, SoilTypes
 from datetime import datetime
 
 from core import settings
+from utils.profiling import trace_stage
+from utils.depth_weights import resolve_weights
+from utils.quality_control import quality_control_flags, apply_qc_flags
+from utils.rain import is_cumulative_rain, decode_tipping_bucket_rain
 
 from typing import cast
 
 import pandas as pd
 import numpy as np
 
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+
 _SM_PATTERN = re.compile(r'(?i)soil.?moisture.?(\d+)', re.IGNORECASE)
 
 _NUMBERED_DEPTH_MAP = {1: 10, 2: 30, 3: 40, 4: 50, 5: 20, 6: 60}
@@ -48,57 +55,57 @@ def _replace_zero_sm_with_nan(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def _is_cumulative_rain(rain_series: pd.Series,
-                        cumulative_threshold: float = 0.90) -> bool:
-    """
-    Auto-detect whether the rain column is a cumulative tipping-bucket counter.
-
-    A cumulative counter broadcasts the same value repeatedly between tips.
-    If >= `cumulative_threshold` fraction of non-zero readings have diff == 0
-    the series is considered cumulative.
-    """
-    nonzero = rain_series[rain_series > 0]
-    if nonzero.empty:
-        return False
-    zero_diffs = (rain_series.diff()[rain_series > 0] == 0).sum()
-    return (zero_diffs / len(nonzero)) >= cumulative_threshold
-
-
-def decode_tipping_bucket_rain(rain_series: pd.Series) -> pd.Series:
-    """
-    Convert a cumulative tipping-bucket counter into per-interval increments.
-    """
-    increments = rain_series.diff().clip(lower=0)
-    increments.iloc[0] = 0
-    return increments
-
-
 def preprocess_dataset(data: List[DatasetScheme]) -> pd.DataFrame:
-    """Standard preprocessing: convert to DataFrame, set timestamp index, fill missing rain."""
+    """Standard preprocessing: mask values failing QC, set timestamp index, per-interval rain."""
     data_dict = [item.model_dump() for item in data]
     df = pd.DataFrame(data_dict)
 
+    if 'qc_flags' in df.columns and df['qc_flags'].notna().all():
+        flags = df['qc_flags'].to_numpy(dtype=np.int64)
+    else:
+        # Readings stored before quality control ran at upload are checked here, in time order
+        with trace_stage("quality_control") as stage:
+            df = df.sort_values('date', kind='stable', ignore_index=True)
+            # Stored dates are days, the readings of a day are not duplicates and the last one is kept below
+            dates = pd.to_datetime(df['date'])
+            flags = quality_control_flags(df, check_timestamps=bool((dates != dates.dt.normalize()).any()))
+            stage.rows = len(df)
+
+    df = apply_qc_flags(df, flags).drop(columns='qc_flags', errors='ignore')
+
     df.rename(columns={'date': 'timestamp'}, inplace=True)
     df['timestamp'] = pd.to_datetime(df['timestamp'])
     df.set_index('timestamp', inplace=True)
 
     df.sort_index(inplace=True)
+    decoded = 'rain_increment' in df.columns and df['rain_increment'].notna().all()
+    if decoded:
+        # Readings are stored per day, the last one of a timestamp is kept but the rain of all of them counts
+        df['rain_increment'] = df.groupby(level=0)['rain_increment'].transform('sum')
     df = df[~df.index.duplicated(keep='last')]
 
     df = _replace_zero_sm_with_nan(df)
 
-    df['rain'] = df['rain'].fillna(0)
-
-    if _is_cumulative_rain(df['rain']):
-        print("Rain column detected as cumulative tipping-bucket — decoding to increments.")
-        df['rain'] = decode_tipping_bucket_rain(df['rain'])
+    if decoded:
+        # Decoded once at upload
+        df['rain'] = df['rain_increment']
     else:
-        print("Rain column detected as per-interval increments — no decoding needed.")
+        df['rain'] = df['rain'].fillna(0)
 
-    return df
+        with trace_stage("cumulative_rain_detection") as stage:
+            is_cumulative = is_cumulative_rain(df['rain'])
+            stage.rows = len(df)
+
+        if is_cumulative:
+            logger.debug("Rain column detected as cumulative tipping-bucket — decoding to increments.")
+            df['rain'] = decode_tipping_bucket_rain(df['rain'])
+        else:
+            logger.debug("Rain column detected as per-interval increments — no decoding needed.")
 
+    return df.drop(columns='rain_increment', errors='ignore')
 
-def weighted_average(values: List[Tuple[int, float]], weights: Dict[int, float]) -> Optional[float]:
+
+def weighted_average(values: List[Tuple[int, float]], weights: Mapping[int, float]) -> Optional[float]:
     """
     Compute weighted average across depths given [(depth, value), ...].
     """
@@ -113,22 +120,23 @@ def weighted_average(values: List[Tuple[int, float]], weights: Dict[int, float])
 def _log_active_depths(sm_cols: Dict[int, str], df: pd.DataFrame) -> None:
     active = [col for col in sm_cols.values() if df[col].notna().any()]
     missing = [col for col in sm_cols.values() if not df[col].notna().any()]
-    print(f"Active soil moisture depths : {active}")
+    logger.debug(f"Active soil moisture depths : {active}")
     if missing:
-        print(f"Depths with no data (all NaN): {missing} - excluded from calculations")
+        logger.debug(f"Depths with no data (all NaN): {missing} - excluded from calculations")
 
 
 def calculate_field_capacity(
     df: pd.DataFrame,
     rain_threshold_mm=settings.RAIN_THRESHOLD_MM,
     time_window_hours=settings.FIELD_CAPACITY_WINDOW_HOURS,
-    rain_zero_tolerance=settings.RAIN_ZERO_TOLERANCE
+    rain_zero_tolerance=settings.RAIN_ZERO_TOLERANCE,
+    weights: Optional[Mapping[int, float]] = None
 ) -> Union[float, None]:
     """Calculates weighted field capacity using daily rain totals."""
 
     sm_cols = _extract_sm_cols(df)
     if not sm_cols:
-        print("WARNING: No soil moisture columns detected. Check schema field names.")
+        logger.warning("No soil moisture columns detected. Check schema field names.")
         return None
 
     _log_active_depths(sm_cols, df)
@@ -163,8 +171,8 @@ def calculate_field_capacity(
                 field_capacity_candidates[col].append(float(valid.max()))
 
     if not any(field_capacity_candidates.values()):
-        print(
-            "WARNING: No qualifying rain events found for field capacity calculation. "
+        logger.warning(
+            "No qualifying rain events found for field capacity calculation. "
             f"Current RAIN_THRESHOLD_MM={rain_threshold_mm}. Consider lowering it."
         )
         return None
@@ -181,25 +189,26 @@ def calculate_field_capacity(
         if val is not None and pd.notna(val)
     ]
 
-    return weighted_average(fc_list, settings.GLOBAL_WEIGHTS)
+    return weighted_average(fc_list, resolve_weights(weights))
 
 
-def detect_weighted_moisture(df: pd.DataFrame) -> pd.Series:
+def detect_weighted_moisture(df: pd.DataFrame, weights: Optional[Mapping[int, float]] = None) -> pd.Series:
     """Compute vectorized weighted soil moisture across all timestamps."""
+    depth_weights = resolve_weights(weights)
     sm_cols = _extract_sm_cols(df)
     valid_depths = [
         depth for depth, col in sm_cols.items()
-        if depth in settings.GLOBAL_WEIGHTS and df[col].notna().any()
+        if depth in depth_weights and df[col].notna().any()
     ]
     if not valid_depths:
         return pd.Series([], dtype=float)
 
-    weights = np.array([settings.GLOBAL_WEIGHTS[d] for d in valid_depths])
+    weight_values = np.array([depth_weights[d] for d in valid_depths])
     soil_cols = [sm_cols[d] for d in valid_depths]
 
     moisture_values = df[soil_cols].div(100)
-    weighted_sum = moisture_values.mul(weights, axis=1).sum(axis=1)
-    weighted_avg = weighted_sum / weights.sum()  # normalize to present depths only
+    weighted_sum = moisture_values.mul(weight_values, axis=1).sum(axis=1)
+    weighted_avg = weighted_sum / weight_values.sum()  # normalize to present depths only
     return weighted_avg
 
 
@@ -209,9 +218,10 @@ def detect_irrigation_from_sm_resposne(
         high_dose_threshold_mm: float,
         sm_jump_pct: float = settings.SM_IRRIGATION_JUMP_PCT,
         gauge_blackout_days: int = settings.SM_GAUGE_BLACKOUT_DAYS,
+        weights: Optional[Mapping[int, float]] = None
 ) -> pd.Series:
 
-    weighted_moisture = detect_weighted_moisture(df)
+    weighted_moisture = detect_weighted_moisture(df, weights)
     if weighted_moisture.empty:
         return pd.Series(dtype=float)
 
@@ -231,30 +241,33 @@ def detect_irrigation_from_sm_resposne(
 
 
 def detect_weighted_stress_days(df: pd.DataFrame, weighted_fc: float,
-                                stress_threshold_fraction=settings.STRESS_THRESHOLD_FRACTION) -> List[datetime]:
+                                stress_threshold_fraction=settings.STRESS_THRESHOLD_FRACTION,
+                                weights: Optional[Mapping[int, float]] = None) -> List[datetime]:
     """Vectorized detection of stress days."""
     if not weighted_fc:
         return []
-    weighted_moisture = detect_weighted_moisture(df)
+    weighted_moisture = detect_weighted_moisture(df, weights)
     stress_threshold = weighted_fc * stress_threshold_fraction
     return weighted_moisture[weighted_moisture < stress_threshold].index.tolist()
 
 
-def detect_weighted_oversaturation(df: pd.DataFrame, weighted_fc: float) -> List[datetime]:
+def detect_weighted_oversaturation(df: pd.DataFrame, weighted_fc: float,
+                                   weights: Optional[Mapping[int, float]] = None) -> List[datetime]:
     """Vectorized detection of oversaturation days."""
     if not weighted_fc:
         return []
-    weighted_moisture = detect_weighted_moisture(df)
+    weighted_moisture = detect_weighted_moisture(df, weights)
     return weighted_moisture[weighted_moisture > weighted_fc].index.tolist()
 
 
 def suggest_wilting_point_fraction(df: pd.DataFrame,
                                    field_capacity: float,
-                                   baseline_wp_fraction: float = 0.5) -> float:
+                                   baseline_wp_fraction: float = 0.5,
+                                   weights: Optional[Mapping[int, float]] = None) -> float:
     if field_capacity is None or field_capacity == 0:
         return baseline_wp_fraction
 
-    weighted_moisture = detect_weighted_moisture(df)
+    weighted_moisture = detect_weighted_moisture(df, weights)
     if weighted_moisture.empty:
         return baseline_wp_fraction
 
@@ -270,12 +283,13 @@ def suggest_wilting_point_fraction(df: pd.DataFrame,
 
 def suggest_stress_threshold_fraction(df: pd.DataFrame,
                                       field_capacity: float,
-                                      wilting_point_fraction: float) -> float:
+                                      wilting_point_fraction: float,
+                                      weights: Optional[Mapping[int, float]] = None) -> float:
     """Auto-tune stress threshold, always strictly above the wilting point."""
     if field_capacity is None or field_capacity == 0:
         return 0.5
 
-    weighted_moisture = detect_weighted_moisture(df)
+    weighted_moisture = detect_weighted_moisture(df, weights)
     if weighted_moisture.empty:
         return 0.5
 
@@ -290,8 +304,11 @@ def suggest_stress_threshold_fraction(df: pd.DataFrame,
 
 def calculate_soil_analysis_metrics(dataset: List[DatasetScheme],
                                     field_capacity: Optional[float] = None,
-                                    wilting_point: Optional[float] = None) -> DatasetAnalysis:
-    df = preprocess_dataset(dataset)
+                                    wilting_point: Optional[float] = None,
+                                    weights: Optional[Mapping[int, float]] = None) -> DatasetAnalysis:
+    with trace_stage("preprocess") as stage:
+        df = preprocess_dataset(dataset)
+        stage.rows = len(df)
 
     start_date = df.index.min().isoformat()
     end_date = df.index.max().isoformat()
@@ -309,20 +326,25 @@ def calculate_soil_analysis_metrics(dataset: List[DatasetScheme],
     precipitation_events_dates = [d.isoformat() for d in precipitation_series.index]
 
     gauge_high_dose = daily_rain[daily_rain >= settings.HIGH_DOSE_THRESHOLD_MM]
-    sm_detected = detect_irrigation_from_sm_resposne(
-        df,
-        daily_rain,
-        high_dose_threshold_mm=settings.HIGH_DOSE_THRESHOLD_MM,
-        sm_jump_pct=settings.SM_IRRIGATION_JUMP_PCT,
-        gauge_blackout_days=settings.SM_GAUGE_BLACKOUT_DAYS
-    )
+    with trace_stage("sm_jump_detector") as stage:
+        sm_detected = detect_irrigation_from_sm_resposne(
+            df,
+            daily_rain,
+            high_dose_threshold_mm=settings.HIGH_DOSE_THRESHOLD_MM,
+            sm_jump_pct=settings.SM_IRRIGATION_JUMP_PCT,
+            gauge_blackout_days=settings.SM_GAUGE_BLACKOUT_DAYS,
+            weights=weights
+        )
+        stage.rows = len(df)
 
     all_high_dose_dates = sorted(gauge_high_dose.index.union(sm_detected.index))
     high_dose_irrigation_events = len(all_high_dose_dates)
     high_dose_irrigation_events_dates = [d.isoformat() for d in all_high_dose_dates]
 
 
-    calculated_fc = calculate_field_capacity(df)
+    with trace_stage("field_capacity") as stage:
+        calculated_fc = calculate_field_capacity(df, weights=weights)
+        stage.rows = len(df)
 
     weighted_fc = 0.0
     stress_level = 0.0
@@ -340,14 +362,18 @@ def calculate_soil_analysis_metrics(dataset: List[DatasetScheme],
         else:
             baseline_wp_fraction = 0.5
 
-        wp_fraction = suggest_wilting_point_fraction(df, weighted_fc, baseline_wp_fraction)
-        wilting_point_val = weighted_fc * wp_fraction
+        with trace_stage("quantile_suggestions") as stage:
+            stage.rows = len(df)
+            wp_fraction = suggest_wilting_point_fraction(df, weighted_fc, baseline_wp_fraction, weights)
+            wilting_point_val = weighted_fc * wp_fraction
 
-        stress_threshold_fraction = suggest_stress_threshold_fraction(df, weighted_fc, wp_fraction)
-        stress_level = weighted_fc * stress_threshold_fraction
+            stress_threshold_fraction = suggest_stress_threshold_fraction(df, weighted_fc, wp_fraction, weights)
+            stress_level = weighted_fc * stress_threshold_fraction
 
-    oversaturation_dates = detect_weighted_oversaturation(df, weighted_fc)
-    stress_dates = detect_weighted_stress_days(df, weighted_fc, stress_threshold_fraction)
+    with trace_stage("stress_detectors") as stage:
+        stage.rows = len(df)
+        oversaturation_dates = detect_weighted_oversaturation(df, weighted_fc, weights)
+        stress_dates = detect_weighted_stress_days(df, weighted_fc, stress_threshold_fraction, weights)
 
     distinct_saturation_dates = sorted({
         datetime(d.year, d.month, d.day) for d in oversaturation_dates
@@ -377,19 +403,25 @@ def calculate_soil_analysis_metrics(dataset: List[DatasetScheme],
 
 def calculate_irrigation_datapoints(dataset: List[DatasetScheme],
                                     field_capacity: Optional[float] = None,
-                                    wilting_point: Optional[float] = None) -> IrrigationDatapoints:
-    df = preprocess_dataset(dataset)
+                                    wilting_point: Optional[float] = None,
+                                    weights: Optional[Mapping[int, float]] = None) -> IrrigationDatapoints:
+    with trace_stage("preprocess") as stage:
+        df = preprocess_dataset(dataset)
+        stage.rows = len(df)
 
     daily_rain = df['rain'].resample("1D").sum()
 
     gauge_high_dose = daily_rain[daily_rain >= settings.HIGH_DOSE_THRESHOLD_MM]
-    sm_detected = detect_irrigation_from_sm_resposne(
-        df,
-        daily_rain,
-        high_dose_threshold_mm=settings.HIGH_DOSE_THRESHOLD_MM,
-        sm_jump_pct=settings.SM_IRRIGATION_JUMP_PCT,
-        gauge_blackout_days=settings.SM_GAUGE_BLACKOUT_DAYS
-    )
+    with trace_stage("sm_jump_detector") as stage:
+        sm_detected = detect_irrigation_from_sm_resposne(
+            df,
+            daily_rain,
+            high_dose_threshold_mm=settings.HIGH_DOSE_THRESHOLD_MM,
+            sm_jump_pct=settings.SM_IRRIGATION_JUMP_PCT,
+            gauge_blackout_days=settings.SM_GAUGE_BLACKOUT_DAYS,
+            weights=weights
+        )
+        stage.rows = len(df)
 
     all_high_dose_dates = sorted(gauge_high_dose.index.union(sm_detected.index))
     high_dose_irrigation_events_dates = [d.isoformat() for d in all_high_dose_dates]
@@ -408,7 +440,9 @@ def calculate_irrigation_datapoints(dataset: List[DatasetScheme],
 
     data_points_list = [DataPoints(**record) for record in data_records]
 
-    calculated_fc = calculate_field_capacity(df)
+    with trace_stage("field_capacity") as stage:
+        calculated_fc = calculate_field_capacity(df, weights=weights)
+        stage.rows = len(df)
 
     weighted_fc = 0.0
     stress_level = 0.0
@@ -426,11 +460,13 @@ def calculate_irrigation_datapoints(dataset: List[DatasetScheme],
         else:
             baseline_wp_fraction = 0.5
 
-        wp_fraction = suggest_wilting_point_fraction(df, weighted_fc, baseline_wp_fraction)
-        wilting_point_val = weighted_fc * wp_fraction
+        with trace_stage("quantile_suggestions") as stage:
+            stage.rows = len(df)
+            wp_fraction = suggest_wilting_point_fraction(df, weighted_fc, baseline_wp_fraction, weights)
+            wilting_point_val = weighted_fc * wp_fraction
 
-        stress_threshold_fraction = suggest_stress_threshold_fraction(df, weighted_fc, wp_fraction)
-        stress_level = weighted_fc * stress_threshold_fraction
+            stress_threshold_fraction = suggest_stress_threshold_fraction(df, weighted_fc, wp_fraction, weights)
+            stress_level = weighted_fc * stress_threshold_fraction
 
     return IrrigationDatapoints(
         high_dose_irrigation_days=high_dose_irrigation_events_dates,
@@ -0,0 +1,145 @@
+import math
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from models import Location
+
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = 111320.0
+
+_TOKEN_QUERY = select(func.count(Location.id), func.max(Location.id))
+_POINTS_QUERY = select(Location.id, Location.latitude, Location.longitude).order_by(Location.id)
+
+
+def haversine_m(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+@dataclass(frozen=True)
+class _IndexSnapshot:
+    """
+    One build of the index, replaced as a whole so a query never mixes the tree of one build with the ids of another.
+    """
+
+    token: Optional[Tuple]
+    tree: Optional[STRtree]
+    ids: np.ndarray
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+
+
+_EMPTY = _IndexSnapshot(None, None, np.empty(0, dtype=np.int64), np.empty(0), np.empty(0))
+
+
+class LocationIndex:
+    """
+    In-memory R-tree (shapely STRtree) over the location points, one per process.
+    The tree is rebuilt when the (count, max id) token of the location table changes, so creations and
+    deletions are picked up on the next query. The *_async methods read the table through the async session and
+    build and query the tree in the threadpool, off the event loop.
+    """
+
+    def __init__(self):
+        # Builds are serialized, readers take no lock and read the snapshot once per query
+        self._lock = threading.Lock()
+        self._snapshot = _EMPTY
+
+    def _build(self, token: Tuple, rows: List) -> _IndexSnapshot:
+        with self._lock:
+            if token == self._snapshot.token:
+                return self._snapshot
+
+            ids = np.array([r[0] for r in rows], dtype=np.int64)
+            latitudes = np.array([r[1] for r in rows], dtype=float)
+            longitudes = np.array([r[2] for r in rows], dtype=float)
+            tree = STRtree(shapely.points(latitudes, longitudes)) if len(rows) else None
+
+            self._snapshot = _IndexSnapshot(token, tree, ids, latitudes, longitudes)
+            return self._snapshot
+
+    def _refresh(self, db: Session) -> _IndexSnapshot:
+        snapshot = self._snapshot
+        token = tuple(db.execute(_TOKEN_QUERY).one())
+        if token == snapshot.token:
+            return snapshot
+
+        return self._build(token, db.execute(_POINTS_QUERY).all())
+
+    async def _refresh_async(self, db: AsyncSession) -> _IndexSnapshot:
+        snapshot = self._snapshot
+        token = tuple((await db.execute(_TOKEN_QUERY)).one())
+        if token == snapshot.token:
+            return snapshot
+
+        return await run_in_threadpool(self._build, token, (await db.execute(_POINTS_QUERY)).all())
+
+    @staticmethod
+    def _nearest(
+            snapshot: _IndexSnapshot, latitude: float, longitude: float, max_distance_m: float
+    ) -> Optional[Tuple[int, float]]:
+        tree, ids, latitudes, longitudes = snapshot.tree, snapshot.ids, snapshot.latitudes, snapshot.longitudes
+        if tree is None:
+            return None
+
+        lat_delta = max_distance_m / METERS_PER_DEGREE
+        lon_delta = max_distance_m / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+        candidates = tree.query(shapely.box(
+            latitude - lat_delta, longitude - lon_delta, latitude + lat_delta, longitude + lon_delta
+        ))
+        if len(candidates) == 0:
+            return None
+
+        distances = haversine_m(latitude, longitude, latitudes[candidates], longitudes[candidates])
+        closest = int(np.argmin(distances))
+        if distances[closest] > max_distance_m:
+            return None
+
+        return int(ids[candidates[closest]]), float(distances[closest])
+
+    def nearest(
+            self, db: Session, latitude: float, longitude: float, max_distance_m: float
+    ) -> Optional[Tuple[int, float]]:
+        """
+        ID of and distance (meters) to the closest location within max_distance_m, None if there is none.
+        """
+
+        return self._nearest(self._refresh(db), latitude, longitude, max_distance_m)
+
+    async def nearest_async(
+            self, db: AsyncSession, latitude: float, longitude: float, max_distance_m: float
+    ) -> Optional[Tuple[int, float]]:
+        snapshot = await self._refresh_async(db)
+        return await run_in_threadpool(self._nearest, snapshot, latitude, longitude, max_distance_m)
+
+    def within_bbox(
+            self, db: Session, min_latitude: float, min_longitude: float, max_latitude: float, max_longitude: float
+    ) -> List[int]:
+        """
+        IDs of the locations inside the bounding box, in ID order.
+        """
+
+        snapshot = self._refresh(db)
+        tree, ids = snapshot.tree, snapshot.ids
+        if tree is None:
+            return []
+
+        matches = tree.query(shapely.box(min_latitude, min_longitude, max_latitude, max_longitude))
+
+        return sorted(ids[matches].tolist())
+
+
+location_index = LocationIndex()
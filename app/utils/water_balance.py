@@ -0,0 +1,208 @@
+import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from models import CropKc, Eto, Location, SoilTypeValues
+from schemas import KcStage
+from utils.kc_curve import kc_curves, has_crop_calendar
+
+
+def total_available_water(
+        field_capacity: np.ndarray, wilting_point_fraction: np.ndarray, root_depth_m: np.ndarray
+) -> np.ndarray:
+    """
+    TAW (mm) = 1000 * (θFC - θWP) * Zr, with the wilting point stored as a fraction of the field capacity.
+    """
+
+    return 1000 * field_capacity * (1 - wilting_point_fraction) * root_depth_m
+
+
+def run_water_balance(
+        eto: np.ndarray,
+        precipitation: np.ndarray,
+        kc: np.ndarray,
+        taw: np.ndarray,
+        raw: np.ndarray,
+        initial_depletion: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """
+    Root zone depletion for every parcel and day (FAO-56 eq. 85), vectorized across parcels.
+
+    Rainfall is taken as effective (no runoff), water above field capacity drains as deep percolation and the
+    crop is stressed (Ks < 1) once the depletion of the previous day exceeds RAW. Days without ETo carry the
+    depletion forward. The irrigation requirement is the depletion on days it exceeds RAW, i.e. the dose that
+    refills the root zone to field capacity; it is not applied to the balance since actual irrigations are unknown.
+    """
+
+    parcels, days = eto.shape
+
+    depletion = np.empty((parcels, days))
+    ks = np.empty((parcels, days))
+    etc_adj = np.empty((parcels, days))
+
+    rain = np.nan_to_num(precipitation, nan=0.0)
+    etc = kc * eto
+    has_eto = ~np.isnan(etc)
+    etc = np.where(has_eto, etc, 0.0)
+
+    # TAW == RAW only for degenerate soils, avoid dividing by zero
+    stress_span = np.maximum(taw - raw, 1e-9)
+
+    previous = np.clip(initial_depletion, 0, taw)
+    for day in range(days):
+        ks_day = np.where(previous > raw, np.clip((taw - previous) / stress_span, 0, 1), 1.0)
+        etc_day = ks_day * etc[:, day]
+
+        current = np.clip(previous - rain[:, day] + etc_day, 0, taw)
+        current = np.where(has_eto[:, day], current, previous)
+
+        ks[:, day] = ks_day
+        etc_adj[:, day] = np.where(has_eto[:, day], etc_day, np.nan)
+        depletion[:, day] = current
+        previous = current
+
+    irrigation_requirement = np.where(depletion > raw[:, None], depletion, 0.0)
+
+    return {"ks": ks, "etc_adj": etc_adj, "depletion": depletion, "irrigation_requirement": irrigation_requirement}
+
+
+def pivot_daily(
+        rows: Sequence[tuple], location_ids: Sequence[int], dates: Sequence[datetime.date]
+) -> np.ndarray:
+    """
+    (location_id, date, value) rows to a (locations, dates) array, NaN where there is no row.
+    """
+
+    if not rows:
+        return np.full((len(location_ids), len(dates)), np.nan)
+
+    frame = pd.DataFrame.from_records(rows, columns=["location_id", "date", "value"])
+    pivot = frame.pivot_table(index="location_id", columns="date", values="value", aggfunc="last")
+
+    return pivot.reindex(index=list(location_ids), columns=list(dates)).to_numpy(dtype=float)
+
+
+def stage_kc(crop_kc: CropKc, stage: Optional[str]) -> float:
+    if stage == KcStage.kc_init.value:
+        return crop_kc.kc_init
+    if stage == KcStage.kc_end.value:
+        return crop_kc.kc_end
+
+    return crop_kc.kc_mid
+
+
+def location_parameters(
+        db: Session, locations: Sequence[Location], dates: Sequence[datetime.date]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Per-day Kc (locations, dates) and TAW/RAW (locations,) from the soil type and crop of each location.
+    Kc follows the crop's curve when the location has a planting date, otherwise the fixed Kc of its crop_stage.
+    """
+
+    soils = {s.soil_type: s for s in db.query(SoilTypeValues).all()}
+    crops = {c.crop: c for c in db.query(CropKc).all()}
+
+    field_capacity = np.array([soils[l.soil_type].field_capacity for l in locations])
+    wilting_point = np.array([soils[l.soil_type].wilting_point for l in locations])
+    root_depth = np.array([crops[l.crop].root_depth_m for l in locations])
+    depletion_fraction = np.array([crops[l.crop].depletion_fraction for l in locations])
+    kc = np.repeat(
+        np.array([stage_kc(crops[l.crop], l.crop_stage) for l in locations])[:, None], len(dates), axis=1
+    )
+
+    # Locations with a planting date follow their crop's Kc curve
+    with_calendar = [
+        i for i, l in enumerate(locations) if l.planting_date is not None and has_crop_calendar(crops[l.crop])
+    ]
+    if with_calendar:
+        calendar_crops = [crops[locations[i].crop] for i in with_calendar]
+        kc[with_calendar] = kc_curves(
+            np.array([locations[i].planting_date for i in with_calendar], dtype="datetime64[D]"),
+            np.array([[c.l_ini, c.l_dev, c.l_mid, c.l_late] for c in calendar_crops]),
+            np.array([[c.kc_init, c.kc_mid, c.kc_end] for c in calendar_crops]),
+            np.array(list(dates), dtype="datetime64[D]")
+        )
+
+    taw = total_available_water(field_capacity, wilting_point, root_depth)
+
+    return kc, taw, depletion_fraction * taw
+
+
+def compute_water_balance(
+        db: Session,
+        locations: Sequence[Location],
+        from_date: datetime.date,
+        to_date: datetime.date,
+        initial_depletion: np.ndarray
+) -> List[Dict[str, Any]]:
+    """
+    Water balance of the locations over [from_date, to_date] from stored ETo/precipitation, the location's soil
+    type (SoilTypeValues) and crop (CropKc). Days before the first and after the last stored ETo of a location
+    are left out, the next incremental run picks the latter up once the ETo is there. Returns water_balance rows
+    as dicts, ready for a bulk insert.
+    """
+
+    dates = [from_date + datetime.timedelta(days=i) for i in range((to_date - from_date).days + 1)]
+    location_ids = [l.id for l in locations]
+
+    rows = db.query(Eto.location_id, Eto.date, Eto.value, Eto.precipitation).filter(
+        Eto.location_id.in_(location_ids), Eto.date >= from_date, Eto.date <= to_date
+    ).all()
+    eto = pivot_daily([(r[0], r[1], r[2]) for r in rows], location_ids, dates)
+    precipitation = pivot_daily([(r[0], r[1], r[3]) for r in rows], location_ids, dates)
+
+    kc, taw, raw = location_parameters(db, locations, dates)
+
+    result = run_water_balance(eto, precipitation, kc, taw, raw, initial_depletion)
+
+    # Only the span between the first and last stored ETo of each location is kept
+    has_eto = ~np.isnan(eto)
+    first_day = np.argmax(has_eto, axis=1)
+    last_day = np.where(has_eto.any(axis=1), len(dates) - 1 - np.argmax(has_eto[:, ::-1], axis=1), -1)
+
+    def _value(array: np.ndarray, i: int, d: int) -> Optional[float]:
+        return None if np.isnan(array[i, d]) else float(array[i, d])
+
+    return [
+        {
+            "location_id": location_id,
+            "date": dates[d],
+            "eto": _value(eto, i, d),
+            "precipitation": _value(precipitation, i, d),
+            "kc": float(kc[i, d]),
+            "ks": float(result["ks"][i, d]),
+            "etc_adj": _value(result["etc_adj"], i, d),
+            "depletion_mm": float(result["depletion"][i, d]),
+            "taw_mm": float(taw[i]),
+            "raw_mm": float(raw[i]),
+            "irrigation_mm": float(result["irrigation_requirement"][i, d])
+        }
+        for i, location_id in enumerate(location_ids)
+        for d in range(first_day[i], last_day[i] + 1)
+    ]
+
+
+def project_next_irrigation(
+        eto: np.ndarray,
+        precipitation: np.ndarray,
+        kc: np.ndarray,
+        taw: np.ndarray,
+        raw: np.ndarray,
+        initial_depletion: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Project the depletion over forecast days and return, per parcel, the index of the first day it exceeds RAW
+    (-1 if it doesn't within the forecast) and the dose refilling the root zone on that day (NaN if none).
+    """
+
+    depletion = run_water_balance(eto, precipitation, kc, taw, raw, initial_depletion)["depletion"]
+
+    exceeds = depletion > raw[:, None]
+    any_exceeds = exceeds.any(axis=1)
+    first_day = np.where(any_exceeds, np.argmax(exceeds, axis=1), -1)
+    dose = np.where(any_exceeds, depletion[np.arange(len(first_day)), np.maximum(first_day, 0)], np.nan)
+
+    return first_day, dose
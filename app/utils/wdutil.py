@@ -5,6 +5,7 @@ from fastapi import HTTPException
 from requests import RequestException
 
 from core import settings
+from core.metrics import track_outbound
 from enum import Enum
 
 WEATHER_DATA_API_CALL_URL = str(settings.GATEKEEPER_BASE_URL).strip("/") + "/api/proxy/weather_data"
@@ -24,18 +25,19 @@ def fetch_weather_data(
         how_often: TimeUnit = TimeUnit.DAILY
 ) -> dict:
     try:
-        response = requests.post(
-            url=WEATHER_DATA_API_CALL_URL + "/api/v1/history/{}/".format(how_often.value),
-            headers={"Content-Type": "application/json", "Authorization": "Bearer {}".format(access_token)},
-            json={
-                "lat": latitude,
-                "lon": longitude,
-                "start": start_date.isoformat(),
-                "end": end_date.isoformat(),
-                "variables": variables,
-                "radius_km": radius_km
-            }
-        )
+        with track_outbound("weather_data"):
+            response = requests.post(
+                url=WEATHER_DATA_API_CALL_URL + "/api/v1/history/{}/".format(how_often.value),
+                headers={"Content-Type": "application/json", "Authorization": "Bearer {}".format(access_token)},
+                json={
+                    "lat": latitude,
+                    "lon": longitude,
+                    "start": start_date.isoformat(),
+                    "end": end_date.isoformat(),
+                    "variables": variables,
+                    "radius_km": radius_km
+                }
+            )
     except RequestException:
         raise HTTPException(
             status_code=400,
@@ -0,0 +1,34 @@
+"""
+Benchmarks for the soil analysis, JSON-LD and ETo hot paths.
+
+Run from the repository root:
+
+    python -m benchmarks.run --sizes 1000 100000 1000000 --output benchmarks/results/current.json
+"""
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# The service settings require connection/auth values that the benchmarks never use
+for _key, _value in {
+    "POSTGRES_USER": "benchmark",
+    "POSTGRES_PASSWORD": "benchmark",
+    "POSTGRES_DB": "benchmark",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "ACCESS_TOKEN_EXPIRATION_TIME": "60",
+    "REFRESH_TOKEN_EXPIRATION_TIME": "800",
+    "JWT_KEY": "benchmark",
+    "JWT_ALGORITHM": "HS256",
+    "SERVICE_PORT": "8005",
+    "USING_GATEKEEPER": "False",
+    "GATEKEEPER_USERNAME": "benchmark",
+    "GATEKEEPER_PASSWORD": "benchmark",
+    "SERVICE_NAME": "irrigation",
+    "USING_FRONTEND": "False",
+    "CORS_ORIGINS": "[]",
+}.items():
+    os.environ.setdefault(_key, _value)
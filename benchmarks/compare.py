@@ -0,0 +1,38 @@
+import argparse
+import json
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.10, help="Ratio above which a result is a regression")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    baseline_results = {(r["benchmark"], r["rows"]): r for r in baseline["results"]}
+
+    print("baseline  {}\ncandidate {}\n".format(baseline["commit"], candidate["commit"]))
+    regressions = 0
+    for r in candidate["results"]:
+        key = (r["benchmark"], r["rows"])
+        if key not in baseline_results:
+            continue
+        ratio = r["median_s"] / baseline_results[key]["median_s"]
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print("{:<36} {:>9} rows  {:>10.4f}s -> {:>10.4f}s  x{:.2f}{}".format(
+            key[0], key[1], baseline_results[key]["median_s"], r["median_s"], ratio, flag
+        ))
+
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
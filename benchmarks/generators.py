@@ -0,0 +1,111 @@
+import datetime
+from typing import List, Sequence, Optional
+
+import numpy as np
+import pandas as pd
+
+from schemas import Dataset as DatasetScheme
+
+ALL_DEPTHS = (10, 20, 30, 40, 50, 60)
+
+
+def generate_sensor_data(
+        rows: int,
+        interval_minutes: int = 30,
+        depths: Sequence[int] = ALL_DEPTHS,
+        cumulative_rain: bool = True,
+        nan_gap_fraction: float = 0.0,
+        seed: int = 0,
+        dataset_id: str = "benchmark",
+        start: Optional[datetime.datetime] = None
+) -> List[DatasetScheme]:
+    """
+    Synthetic probe recordings shaped like the uploads the service receives.
+
+    * `depths`: installed sensors, the others are sent as 0.0 like the real loggers do
+    * `cumulative_rain`: tipping-bucket counter instead of per-interval increments
+    * `nan_gap_fraction`: share of readings that fall into sensor outage gaps (None)
+    """
+    rng = np.random.default_rng(seed)
+    start = start or datetime.datetime(2024, 1, 1)
+    timestamps = pd.date_range(start=start, periods=rows, freq="{}min".format(interval_minutes))
+
+    # Rain: short storms every few days, with a drizzle of small tips in between
+    rain = np.zeros(rows)
+    storm_starts = rng.choice(rows, size=max(1, rows // 200), replace=False)
+    storm_length = max(1, 360 // interval_minutes)
+    for s in storm_starts:
+        rain[s:s + storm_length] += rng.gamma(2.0, 1.5, size=len(rain[s:s + storm_length]))
+    rain = np.round(rain / 0.2) * 0.2
+
+    # Soil moisture responds to rain and dries out exponentially, deeper sensors are damped
+    wetting = pd.Series(rain).ewm(halflife=max(1, 2880 // interval_minutes)).mean().to_numpy()
+    soil_moisture = {}
+    for i, depth in enumerate(ALL_DEPTHS):
+        if depth not in depths:
+            soil_moisture[depth] = np.zeros(rows)
+            continue
+        base = 18 + 2 * i
+        values = base + 12 * wetting / (1 + 0.3 * i) + rng.normal(0, 0.3, size=rows)
+        soil_moisture[depth] = np.clip(values, 1, 60)
+
+    if nan_gap_fraction > 0:
+        gap_length = max(1, 1440 // interval_minutes)
+        n_gaps = int(rows * nan_gap_fraction / gap_length)
+        gap_mask = np.zeros(rows, dtype=bool)
+        for g in rng.choice(max(1, rows - gap_length), size=n_gaps, replace=False):
+            gap_mask[g:g + gap_length] = True
+    else:
+        gap_mask = None
+
+    rain_values = np.cumsum(rain) if cumulative_rain else rain
+    temperature = 15 + 10 * np.sin(np.arange(rows) * 2 * np.pi * interval_minutes / 1440) + rng.normal(0, 1, rows)
+    humidity = np.clip(60 + rng.normal(0, 10, rows), 5, 100)
+
+    sm_columns = {
+        depth: [None if gap_mask is not None and gap_mask[j] else float(v) for j, v in enumerate(values)]
+        for depth, values in soil_moisture.items()
+    }
+
+    # model_construct skips validation, the values are known to be well formed
+    return [
+        DatasetScheme.model_construct(
+            dataset_id=dataset_id,
+            date=timestamps[j].to_pydatetime(),
+            soil_moisture_10=sm_columns[10][j],
+            soil_moisture_20=sm_columns[20][j],
+            soil_moisture_30=sm_columns[30][j],
+            soil_moisture_40=sm_columns[40][j],
+            soil_moisture_50=sm_columns[50][j],
+            soil_moisture_60=sm_columns[60][j],
+            rain=float(rain_values[j]),
+            temperature=float(temperature[j]),
+            humidity=float(humidity[j]),
+        )
+        for j in range(rows)
+    ]
+
+
+def generate_weather_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Daily weather in the shape the nightly ETo job passes to `ETo`.
+    """
+    rng = np.random.default_rng(seed)
+    # Second resolution so that 1M days still fit in the index
+    index = pd.date_range(start="2000-01-01", periods=rows, freq="D", unit="s")
+    season = np.sin((index.dayofyear.to_numpy() - 80) * 2 * np.pi / 365)
+
+    t_mean = 14 + 10 * season + rng.normal(0, 2, rows)
+    spread = np.abs(rng.normal(5, 1.5, rows))
+
+    return pd.DataFrame(
+        data={
+            "T_min": t_mean - spread,
+            "T_max": t_mean + spread,
+            "T_mean": t_mean,
+            "RH_mean": np.clip(65 - 15 * season + rng.normal(0, 8, rows), 10, 100),
+            "U_z": np.abs(rng.normal(3, 1.2, rows)),
+            "P": 101.3 + rng.normal(0, 0.5, rows),
+        },
+        index=index
+    )
@@ -0,0 +1,68 @@
+import argparse
+import statistics
+import time
+from typing import Callable, List
+
+import benchmarks  # noqa: F401, puts app/ on the path
+from benchmarks.generators import generate_sensor_data
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils import jsonld_get_dataset
+
+ROUNDED = ("soil_moisture_10", "soil_moisture_20", "soil_moisture_30", "soil_moisture_40", "soil_moisture_50",
+           "soil_moisture_60", "rain", "temperature", "humidity")
+
+
+def _median(fn: Callable, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def _readings(rows: int, decimals: int) -> List:
+    readings = generate_sensor_data(rows)
+    # Sensors report one or two decimals, which is what makes weather values repeat between readings
+    for reading in readings:
+        for attribute in ROUNDED:
+            value = getattr(reading, attribute)
+            if value is not None:
+                setattr(reading, attribute, round(value, decimals))
+    return readings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure build time, serialization time and payload size of the "
+                                                 "dataset JSON-LD, full and compact")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--decimals", type=int, default=1, help="Decimals of the synthetic readings")
+    args = parser.parse_args()
+
+    print("{:<28} {:>8} {:>11} {:>11} {:>11} {:>13}".format(
+        "form", "rows", "build s", "serialize s", "total s", "bytes"
+    ))
+    for rows in args.rows:
+        readings = _readings(rows, args.decimals)
+
+        variants = (
+            # How the endpoint answered before: FastAPI ran the document through jsonable_encoder
+            ("full, jsonable_encoder", False, lambda doc: JSONResponse(jsonable_encoder(doc)).body),
+            ("full", False, lambda doc: JSONResponse(doc).body),
+            ("compact", True, lambda doc: JSONResponse(doc).body),
+        )
+        for name, compact, serialize in variants:
+            doc = jsonld_get_dataset(readings, compact)
+            build = _median(lambda: jsonld_get_dataset(readings, compact), args.repeat)
+            render = _median(lambda: serialize(doc), args.repeat)
+            print("{:<28} {:>8} {:>11.4f} {:>11.4f} {:>11.4f} {:>13}".format(
+                name, rows, build, render, build + render, len(serialize(doc))
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import warnings
+from typing import Callable, Dict, List, Any, Tuple
+
+import benchmarks  # noqa: F401, puts app/ on the path
+from benchmarks.generators import generate_sensor_data, generate_weather_frame
+
+import pandas as pd
+from eto import ETo
+
+from schemas import EToResponse, Calculation
+from utils import (
+    preprocess_dataset, calculate_field_capacity, calculate_soil_analysis_metrics, calculate_irrigation_datapoints,
+    jsonld_get_dataset, jsonld_analyse_soil_moisture, jsonld_eto_response
+)
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+# name -> (setup(rows, data) -> args, function), setup runs before every repetition and is not timed
+Benchmark = Tuple[Callable[[int, Dict[str, Any]], tuple], Callable]
+
+
+def _soil_benchmarks() -> Dict[str, Benchmark]:
+    return {
+        "preprocess_dataset": (
+            lambda rows, data: (data["sensor"],),
+            preprocess_dataset
+        ),
+        "calculate_field_capacity": (
+            # calculate_field_capacity fills gaps in place, so every repetition gets a fresh frame
+            lambda rows, data: (data["preprocessed"].copy(),),
+            calculate_field_capacity
+        ),
+        "calculate_soil_analysis_metrics": (
+            lambda rows, data: (data["sensor"],),
+            calculate_soil_analysis_metrics
+        ),
+        "calculate_irrigation_datapoints": (
+            lambda rows, data: (data["sensor"],),
+            calculate_irrigation_datapoints
+        ),
+        "jsonld_get_dataset": (
+            lambda rows, data: (data["sensor"],),
+            jsonld_get_dataset
+        ),
+        "jsonld_get_dataset_compact": (
+            lambda rows, data: (data["sensor"], True),
+            jsonld_get_dataset
+        ),
+        "jsonld_analyse_soil_moisture": (
+            lambda rows, data: (data["analysis"],),
+            jsonld_analyse_soil_moisture
+        ),
+    }
+
+
+def _eto_fao(df: pd.DataFrame) -> pd.Series:
+    # Same call as the nightly job
+    return ETo(df=df, lat=45.0, lon=20.0, freq="D", z_msl=120, z_u=10).eto_fao()
+
+
+def _eto_benchmarks() -> Dict[str, Benchmark]:
+    return {
+        "eto_fao": (
+            lambda rows, data: (data["weather"].copy(),),
+            _eto_fao
+        ),
+        "jsonld_eto_response": (
+            lambda rows, data: (data["eto_response"],),
+            jsonld_eto_response
+        ),
+    }
+
+
+def _prepare(rows: int, args: argparse.Namespace) -> Dict[str, Any]:
+    sensor = generate_sensor_data(
+        rows,
+        interval_minutes=args.interval_minutes,
+        depths=args.depths,
+        cumulative_rain=not args.incremental_rain,
+        nan_gap_fraction=args.nan_gap_fraction,
+    )
+    weather = generate_weather_frame(rows)
+
+    return {
+        "sensor": sensor,
+        "preprocessed": preprocess_dataset(sensor),
+        "analysis": calculate_soil_analysis_metrics(sensor),
+        "weather": weather,
+        "eto_response": EToResponse(calculations=[
+            Calculation(date=d.date(), value=v) for d, v in zip(weather.index, weather["T_mean"] / 5)
+        ]),
+    }
+
+
+def _time(setup: Callable, fn: Callable, rows: int, data: Dict[str, Any], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        call_args = setup(rows, data)
+        start = time.perf_counter()
+        fn(*call_args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    selected = {**_soil_benchmarks(), **_eto_benchmarks()}
+    if args.only:
+        selected = {name: bench for name, bench in selected.items() if name in args.only}
+
+    results = []
+    for rows in args.sizes:
+        print("Generating {} rows ...".format(rows))
+        data = _prepare(rows, args)
+
+        for name, (setup, fn) in selected.items():
+            repeat = args.repeat if rows < 1_000_000 else max(1, args.repeat // 3)
+            timings = _time(setup, fn, rows, data, repeat)
+            result = {
+                "benchmark": name,
+                "rows": rows,
+                "repeat": repeat,
+                "min_s": min(timings),
+                "median_s": statistics.median(timings),
+                "mean_s": statistics.fmean(timings),
+            }
+            results.append(result)
+            print("{:<36} {:>9} rows  median {:>10.4f}s  min {:>10.4f}s".format(
+                name, rows, result["median_s"], result["min_s"]
+            ))
+
+    return {
+        "commit": _git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "parameters": {
+            "interval_minutes": args.interval_minutes,
+            "depths": list(args.depths),
+            "cumulative_rain": not args.incremental_rain,
+            "nan_gap_fraction": args.nan_gap_fraction,
+        },
+        "results": results,
+    }
+
+
+def main():
+    # The ETo library emits pandas chained-assignment warnings on every call
+    warnings.filterwarnings("ignore", category=FutureWarning)
+
+    parser = argparse.ArgumentParser(description="Benchmark the soil analysis, JSON-LD and ETo hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="Run only the named benchmarks")
+    parser.add_argument("--interval-minutes", type=int, default=30)
+    parser.add_argument("--depths", type=int, nargs="+", default=[10, 20, 30, 40, 50, 60])
+    parser.add_argument("--incremental-rain", action="store_true", help="Per-interval rain instead of a counter")
+    parser.add_argument("--nan-gap-fraction", type=float, default=0.02)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Results written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks import APP_DIR
+
+REPO_ROOT = os.path.dirname(APP_DIR)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _import_seconds(env: Dict[str, str]) -> float:
+    # A fresh interpreter every time, nothing of the service is imported yet
+    output = subprocess.run(
+        [sys.executable, "-c", "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"],
+        env=env, cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _slowest_imports(env: Dict[str, str], top: int) -> List[str]:
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stderr
+
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+
+    return ["{:>9.1f} ms  {}".format(us / 1000, name) for us, name in sorted(rows, reverse=True)[:top]]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("the service exited with status {}".format(process.returncode))
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError("{} did not become ready within {}s".format(url, timeout))
+
+
+def _ready_seconds(env: Dict[str, str], timeout: float) -> float:
+    """
+    Process start until the first answered request, uvicorn serves requests only after the lifespan startup
+    (seeding, scheduler, Gatekeeper registration) has completed.
+    """
+
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--app-dir", APP_DIR, "main:app", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, cwd=REPO_ROOT
+    )
+    try:
+        _wait_ready("http://127.0.0.1:{}/api/v1/openapi.json".format(port), process, timeout)
+        return time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _prepare_sqlite(database_file: str) -> None:
+    # Smoke runs only, the Alembic migrations target PostgreSQL
+    os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///{}".format(database_file)
+    import models  # noqa: F401
+    from db.base_class import Base
+    from db.session import engine
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+def _check(name: str, seconds: float, budget: Optional[float]) -> bool:
+    over = budget is not None and seconds > budget
+    print("{:<16} median {:>7.3f}s{}".format(
+        name, seconds, "" if budget is None else "  budget {:.3f}s{}".format(budget, "  OVER BUDGET" if over else "")
+    ))
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time and start-to-ready time of the service")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database-url", help="Migrated database the service starts against, a fresh SQLite "
+                                               "file when omitted")
+    parser.add_argument("--import-budget-s", type=float, help="Fail when `import main` takes longer (median)")
+    parser.add_argument("--ready-budget-s", type=float, help="Fail when start-to-ready takes longer (median)")
+    parser.add_argument("--ready-timeout-s", type=float, default=60)
+    parser.add_argument("--gatekeeper-url", help="Start with Gatekeeper registration against this URL, e.g. "
+                                                 "a running loadtest.stubs")
+    parser.add_argument("--import-profile", type=int, default=0, metavar="N",
+                        help="Also list the N slowest modules of `import main` (python -X importtime)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url
+        if not database_url:
+            database_file = os.path.join(tmp, "startup.db")
+            _prepare_sqlite(database_file)
+            database_url = "sqlite:///{}".format(database_file)
+
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI=database_url, LOG_LEVEL="WARNING")
+        env.pop("ASYNC_SQLALCHEMY_DATABASE_URI", None)
+        if args.gatekeeper_url:
+            env.update({"USING_GATEKEEPER": "True", "GATEKEEPER_BASE_URL": args.gatekeeper_url})
+
+        import_times = [_import_seconds(env) for _ in range(args.repeat)]
+        # The first start seeds the database, the following ones find the seed rows in place
+        ready_times = [_ready_seconds(env, args.ready_timeout_s) for _ in range(args.repeat)]
+
+        over = _check("import main", statistics.median(import_times), args.import_budget_s)
+        over |= _check("start-to-ready", statistics.median(ready_times), args.ready_budget_s)
+        print("first start      {:>7.3f}s".format(ready_times[0]))
+
+        if args.import_profile:
+            print("\nslowest imports (cumulative):")
+            print("\n".join(_slowest_imports(env, args.import_profile)))
+
+    raise SystemExit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+End-to-end load tests of the API against local stand-ins for Gatekeeper, WeatherData, FarmCalendar,
+Open-Meteo and OpenTopoData.
+
+    python -m loadtest.run --database sqlite --duration 30 --concurrency 16
+"""
@@ -0,0 +1,326 @@
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple, Callable, Any
+
+import httpx
+
+import benchmarks  # noqa: F401, puts app/ on the path and fills in the settings the harness doesn't need
+from benchmarks.generators import generate_sensor_data
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(REPO_ROOT, "app")
+
+DEFAULT_MIX = "ingest=1,analysis=3,irrigation_datapoints=1,eto_stored=3,eto_coordinates=2,eto_gk=1"
+ANALYSED_DATASET = "loadtest-analysis"
+AUTH_HEADERS = {"Authorization": "Bearer stub-access-token"}
+
+
+def _app_env(args: argparse.Namespace) -> Dict[str, str]:
+    stub_url = "http://127.0.0.1:{}".format(args.stub_port)
+    database_url = args.database_url
+    if args.database == "sqlite" and not database_url:
+        database_url = "sqlite:///{}".format(os.path.abspath("loadtest.db"))
+
+    env = dict(os.environ)
+    env.update({
+        "SQLALCHEMY_DATABASE_URI": database_url,
+        "USING_GATEKEEPER": "True",
+        "GATEKEEPER_BASE_URL": stub_url,
+        "OPEN_METEO_BASE_URL": stub_url,
+        "OPEN_METEO_HISTORICAL_BASE_URL": stub_url,
+        "OPENTOPODATA_BASE_URL": stub_url,
+        "SERVICE_PORT": str(args.app_port),
+        "LOG_LEVEL": "WARNING",
+    })
+    return env
+
+
+def _prepare_database(args: argparse.Namespace, env: Dict[str, str]) -> None:
+    os.environ.update(env)
+
+    if args.database == "sqlite":
+        database_file = env["SQLALCHEMY_DATABASE_URI"][len("sqlite:///"):]
+        if os.path.exists(database_file):
+            os.remove(database_file)
+
+        # Smoke runs only, the Alembic migrations target PostgreSQL
+        import models  # noqa: F401
+        from db.base_class import Base
+        from db.session import engine
+        Base.metadata.create_all(engine)
+        return
+
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(REPO_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(REPO_ROOT, "alembic"))
+    config.set_main_option("sqlalchemy.url", env["SQLALCHEMY_DATABASE_URI"])
+    cwd = os.getcwd()
+    os.chdir(REPO_ROOT)
+    try:
+        command.upgrade(config, "head")
+    finally:
+        os.chdir(cwd)
+
+
+def _seed_eto(location_ids: List[int], days: int) -> None:
+    from db.session import SessionLocal
+    from models import Eto
+
+    today = datetime.date.today()
+    session = SessionLocal()
+    try:
+        session.add_all([
+            Eto(date=today - datetime.timedelta(days=d), value=round(random.uniform(1, 6), 2), location_id=location_id)
+            for location_id in location_ids
+            for d in range(1, days + 1)
+        ])
+        session.commit()
+    finally:
+        session.close()
+
+
+def _start(cmd: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(cmd, env=env, cwd=REPO_ROOT)
+
+
+async def _wait_ready(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError("{} did not become ready within {}s".format(url, timeout))
+
+
+def _readings(dataset_id: str, rows: int, start: datetime.datetime, seed: int) -> List[Dict[str, Any]]:
+    data = generate_sensor_data(rows, dataset_id=dataset_id, start=start, seed=seed)
+    return [d.model_dump(mode="json") for d in data]
+
+
+class Scenarios:
+    """
+    Request factories for the traffic mix, each returns (method, path, request kwargs).
+    """
+
+    def __init__(self, location_ids: List[int], ingest_batch: int):
+        self.location_ids = location_ids
+        self.ingest_batch = ingest_batch
+        self.ingest_offsets: Dict[int, int] = defaultdict(int)
+
+    def ingest(self, worker: int) -> Tuple[str, str, dict]:
+        offset = self.ingest_offsets[worker]
+        self.ingest_offsets[worker] += self.ingest_batch
+        start = datetime.datetime(2024, 1, 1) + datetime.timedelta(minutes=30 * offset)
+        body = _readings("loadtest-ingest-{}".format(worker), self.ingest_batch, start, seed=offset)
+        return "POST", "/api/v1/dataset/", {"json": body}
+
+    def analysis(self, worker: int) -> Tuple[str, str, dict]:
+        return "GET", "/api/v1/dataset/{}/analysis/".format(ANALYSED_DATASET), {"params": {"formatting": "JSON"}}
+
+    def irrigation_datapoints(self, worker: int) -> Tuple[str, str, dict]:
+        return "GET", "/api/v1/dataset/{}/irrigation-datapoints/".format(ANALYSED_DATASET), {}
+
+    def eto_stored(self, worker: int) -> Tuple[str, str, dict]:
+        today = datetime.date.today()
+        path = "/api/v1/eto/get-calculations/{}/from/{}/to/{}/".format(
+            random.choice(self.location_ids), today - datetime.timedelta(days=30), today
+        )
+        return "GET", path, {}
+
+    def eto_coordinates(self, worker: int) -> Tuple[str, str, dict]:
+        today = datetime.date.today()
+        return "GET", "/api/v1/eto/calculate-coordinates/", {"params": {
+            "latitude": round(random.uniform(40, 50), 4),
+            "longitude": round(random.uniform(15, 25), 4),
+            "from_date": (today - datetime.timedelta(days=14)).isoformat(),
+            "to_date": today.isoformat(),
+        }}
+
+    def eto_gk(self, worker: int) -> Tuple[str, str, dict]:
+        today = datetime.date.today()
+        return "GET", "/api/v1/eto/calculate-gk/", {"params": {
+            "parcel_id": "parcel-{}".format(random.randint(1, 500)),
+            "from_date": (today - datetime.timedelta(days=14)).isoformat(),
+            "to_date": today.isoformat(),
+        }}
+
+
+def _parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, weight = part.split("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+async def _drive(
+        base_url: str, scenarios: Scenarios, mix: Dict[str, float], concurrency: int, duration: float, warmup: float
+) -> Tuple[Dict[str, List[float]], Dict[str, int], float]:
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    factories: Dict[str, Callable] = {n: getattr(scenarios, n) for n in names}
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers=AUTH_HEADERS, timeout=120, limits=limits) as client:
+
+        async def worker(worker_id: int):
+            while time.monotonic() < stop_at:
+                name = random.choices(names, weights)[0]
+                method, path, kwargs = factories[name](worker_id)
+                sent = time.monotonic()
+                try:
+                    response = await client.request(method, path, **kwargs)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                received = time.monotonic()
+
+                if sent < measure_from:
+                    continue
+                latencies[name].append(received - sent)
+                if failed:
+                    errors[name] += 1
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+    return latencies, errors, duration
+
+
+def _percentile(values: List[float], q: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def _report(latencies: Dict[str, List[float]], errors: Dict[str, int], duration: float) -> Dict[str, Any]:
+    endpoints = {}
+    for name, values in sorted(latencies.items()):
+        endpoints[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "throughput_rps": len(values) / duration,
+            "p50_ms": _percentile(values, 50) * 1000,
+            "p95_ms": _percentile(values, 95) * 1000,
+            "p99_ms": _percentile(values, 99) * 1000,
+        }
+
+    total = sum(len(v) for v in latencies.values())
+    print("\n{:<24} {:>8} {:>7} {:>9} {:>9} {:>9} {:>9}".format(
+        "endpoint", "requests", "errors", "req/s", "p50 ms", "p95 ms", "p99 ms"
+    ))
+    for name, r in endpoints.items():
+        print("{:<24} {:>8} {:>7} {:>9.1f} {:>9.1f} {:>9.1f} {:>9.1f}".format(
+            name, r["requests"], r["errors"], r["throughput_rps"], r["p50_ms"], r["p95_ms"], r["p99_ms"]
+        ))
+    print("{:<24} {:>8} {:>7} {:>9.1f}".format("total", total, sum(errors.values()), total / duration))
+
+    return {"duration_s": duration, "total_requests": total, "throughput_rps": total / duration, "endpoints": endpoints}
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    env = _app_env(args)
+    _prepare_database(args, env)
+
+    stub_env = dict(env, STUB_LATENCY_MS=str(args.latency_ms))
+    processes = [
+        _start([sys.executable, "-m", "uvicorn", "loadtest.stubs:app", "--port", str(args.stub_port),
+                "--log-level", "warning"], stub_env),
+        _start([sys.executable, "-m", "uvicorn", "--app-dir", APP_DIR, "main:app", "--port", str(args.app_port),
+                "--workers", str(args.workers), "--log-level", "warning"], env),
+    ]
+    base_url = "http://127.0.0.1:{}".format(args.app_port)
+
+    try:
+        await _wait_ready("http://127.0.0.1:{}/docs".format(args.stub_port))
+        await _wait_ready(base_url + "/api/v1/openapi.json")
+
+        async with httpx.AsyncClient(base_url=base_url, headers=AUTH_HEADERS, timeout=300) as client:
+            response = await client.post(
+                "/api/v1/dataset/",
+                json=_readings(ANALYSED_DATASET, args.seed_rows, datetime.datetime(2024, 3, 1), seed=1)
+            )
+            response.raise_for_status()
+
+            for i in range(args.locations):
+                lat, lon = 44 + i * 0.05, 20 + i * 0.05
+                response = await client.post("/api/v1/location/parcel-wkt/", json={
+                    "coordinates": "POLYGON (({0} {1}, {0} {3}, {2} {3}, {2} {1}, {0} {1}))".format(
+                        lat, lon, lat + 0.01, lon + 0.01
+                    )
+                })
+                response.raise_for_status()
+
+            response = await client.get("/api/v1/location/")
+            location_ids = [location["id"] for location in response.json()["locations"]]
+
+        _seed_eto(location_ids, days=60)
+
+        scenarios = Scenarios(location_ids, ingest_batch=args.ingest_batch)
+        print("Running {} workers for {}s (+{}s warm-up) against {}".format(
+            args.concurrency, args.duration, args.warmup, base_url
+        ))
+        latencies, errors, duration = await _drive(
+            base_url, scenarios, _parse_mix(args.mix), args.concurrency, args.duration, args.warmup
+        )
+        return _report(latencies, errors, duration)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against local service stand-ins")
+    parser.add_argument("--database", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--database-url", help="SQLAlchemy URL, required for postgres (use an empty database)")
+    parser.add_argument("--app-port", type=int, default=8105)
+    parser.add_argument("--stub-port", type=int, default=9105)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers of the API")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--latency-ms", type=float, default=20, help="Latency of the stand-in services")
+    parser.add_argument("--seed-rows", type=int, default=5000, help="Readings of the analysed dataset")
+    parser.add_argument("--ingest-batch", type=int, default=48, help="Readings per ingestion request")
+    parser.add_argument("--locations", type=int, default=10)
+    parser.add_argument("--output", help="Write the report as JSON to this path")
+    args = parser.parse_args()
+
+    if args.database == "postgres" and not args.database_url:
+        parser.error("--database-url is required with --database postgres")
+
+    report = asyncio.run(_main(args))
+    report["parameters"] = vars(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print("Report written to {}".format(args.output))
+
+
+if __name__ == "__main__":
+    main()
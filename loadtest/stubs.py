@@ -0,0 +1,146 @@
+"""
+Stand-ins for the external services the API talks to, with configurable latency.
+
+Latency is read from the environment (milliseconds): STUB_LATENCY_MS applies to every service and can be
+overridden per service with STUB_LATENCY_MS_GATEKEEPER, STUB_LATENCY_MS_WEATHER_DATA,
+STUB_LATENCY_MS_FARMCALENDAR, STUB_LATENCY_MS_OPEN_METEO and STUB_LATENCY_MS_OPENTOPODATA.
+STUB_LATENCY_JITTER adds a uniform +/- fraction on top (default 0.2).
+
+The Gatekeeper proxy routes (/api/proxy/...) are served by the same app, so the API only needs
+GATEKEEPER_BASE_URL, OPEN_METEO_BASE_URL and OPENTOPODATA_BASE_URL pointed at it.
+"""
+import asyncio
+import datetime
+import math
+import os
+import random
+from typing import Optional
+
+from fastapi import FastAPI, Request
+
+app = FastAPI(title="Irrigation load test stubs")
+
+
+async def _latency(service: str) -> None:
+    base = float(os.environ.get("STUB_LATENCY_MS_{}".format(service.upper()), os.environ.get("STUB_LATENCY_MS", "20")))
+    jitter = float(os.environ.get("STUB_LATENCY_JITTER", "0.2"))
+    delay = base * (1 + random.uniform(-jitter, jitter)) / 1000
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+def _et0(day: datetime.date, latitude: float) -> float:
+    season = math.sin((day.timetuple().tm_yday - 80) * 2 * math.pi / 365)
+    return round(max(0.3, 3.2 + 2.8 * season - abs(latitude - 45) * 0.02), 2)
+
+
+# Gatekeeper
+
+@app.post("/api/login/")
+async def login():
+    await _latency("gatekeeper")
+    return {"success": True, "access": "stub-access-token", "refresh": "stub-refresh-token"}
+
+
+@app.post("/api/logout/")
+async def logout():
+    await _latency("gatekeeper")
+    return {"success": True}
+
+
+@app.post("/api/validate_token/")
+async def validate_token():
+    await _latency("gatekeeper")
+    return {"success": True}
+
+
+@app.post("/api/register_service/")
+async def register_service():
+    await _latency("gatekeeper")
+    return {"success": True}
+
+
+# WeatherData (through the Gatekeeper proxy)
+
+@app.post("/api/proxy/weather_data/api/v1/history/{how_often}/")
+async def weather_history(how_often: str, request: Request):
+    await _latency("weather_data")
+    body = await request.json()
+    start = datetime.date.fromisoformat(body["start"])
+    end = datetime.date.fromisoformat(body["end"])
+
+    data = []
+    day = start
+    while day <= end:
+        data.append({"date": day.isoformat(), "values": {"et0_fao_evapotranspiration": _et0(day, body["lat"])}})
+        day += datetime.timedelta(days=1)
+
+    return {"data": data}
+
+
+# FarmCalendar (through the Gatekeeper proxy)
+
+@app.get("/api/proxy/farmcalendar/api/v1/FarmParcels/{parcel_id}/")
+async def farm_parcel(parcel_id: str):
+    await _latency("farmcalendar")
+    seed = sum(ord(c) for c in parcel_id)
+    lat, lon = 44 + (seed % 100) / 50, 20 + (seed % 37) / 20
+    return {
+        "@id": parcel_id,
+        "location": {"lat": lat, "long": lon},
+        "hasGeometry": {
+            "asWKT": "POLYGON (({0} {1}, {0} {3}, {2} {3}, {2} {1}, {0} {1}))".format(lat, lon, lat + 0.01, lon + 0.01)
+        }
+    }
+
+
+# Open-Meteo (JSON forecast used by the nightly job)
+
+@app.get("/v1/forecast")
+async def open_meteo_forecast(
+        latitude: str, longitude: str, past_days: int = 0, forecast_days: int = 1,
+        start_date: Optional[datetime.date] = None, end_date: Optional[datetime.date] = None
+):
+    await _latency("open_meteo")
+    latitudes = [float(x) for x in latitude.split(",")]
+    longitudes = [float(x) for x in longitude.split(",")]
+    if start_date and end_date:
+        days = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    else:
+        today = datetime.date.today()
+        days = [today + datetime.timedelta(days=i) for i in range(-past_days, forecast_days)]
+
+    def single(lat: float, lon: float) -> dict:
+        return {
+            "latitude": lat,
+            "longitude": lon,
+            "elevation": 120.0,
+            "daily": {
+                "time": [d.isoformat() for d in days],
+                "temperature_2m_min": [12.0 for _ in days],
+                "temperature_2m_max": [26.0 for _ in days],
+                "temperature_2m_mean": [19.0 for _ in days],
+                "relative_humidity_2m_mean": [60.0 for _ in days],
+                "wind_speed_10m_mean": [9.0 for _ in days],
+                "surface_pressure_mean": [1000.0 for _ in days],
+                "pressure_msl_mean": [1013.0 for _ in days],
+                "et0_fao_evapotranspiration": [_et0(d, lat) for d in days],
+                "precipitation_sum": [0.0 for _ in days],
+            }
+        }
+
+    results = [single(lat, lon) for lat, lon in zip(latitudes, longitudes)]
+    return results[0] if len(results) == 1 else results
+
+
+# OpenTopoData
+
+@app.get("/v1/{dataset}")
+async def opentopodata(dataset: str, locations: str):
+    await _latency("opentopodata")
+    results = []
+    for pair in locations.split("|"):
+        lat, lon = (float(x) for x in pair.split(","))
+        results.append({"dataset": dataset, "elevation": round(100 + abs(lat * 7 + lon * 3) % 400, 1),
+                        "location": {"lat": lat, "lng": lon}})
+    return {"status": "OK", "results": results}
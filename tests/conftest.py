@@ -0,0 +1,107 @@
+"""
+Tests of the service, against a throwaway SQLite database. Run from the repository root:
+
+    python -m pytest
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# Never the database of the environment, the tables are dropped after every test
+_DATABASE_DIR = tempfile.mkdtemp(prefix="irrigation-tests-")
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///{}".format(os.path.join(_DATABASE_DIR, "test.db"))
+os.environ.pop("ASYNC_SQLALCHEMY_DATABASE_URI", None)
+
+# The service settings require connection/auth values that the tests never use
+for _key, _value in {
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "ACCESS_TOKEN_EXPIRATION_TIME": "60",
+    "REFRESH_TOKEN_EXPIRATION_TIME": "800",
+    "JWT_KEY": "test",
+    "JWT_ALGORITHM": "HS256",
+    "SERVICE_PORT": "8005",
+    "USING_GATEKEEPER": "False",
+    "GATEKEEPER_USERNAME": "test",
+    "GATEKEEPER_PASSWORD": "test",
+    "SERVICE_NAME": "irrigation",
+    "USING_FRONTEND": "False",
+    "CORS_ORIGINS": "[]",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+
+@pytest.fixture
+def db():
+    """
+    Sync session on freshly created tables.
+    """
+
+    import models  # noqa: F401
+    from db.base_class import Base
+    from db.session import engine, SessionLocal
+
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+
+
+@pytest.fixture
+def run(db):
+    """
+    Runs a coroutine to completion on a new event loop, the async connections do not outlive it.
+    """
+
+    from db.session import async_engine
+
+    def run(coroutine):
+        async def main():
+            try:
+                return await coroutine
+            finally:
+                await async_engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    """
+    TestClient of the service, authenticated as a fresh user.
+    """
+
+    from fastapi.testclient import TestClient
+
+    import main
+    from core.security import create_token
+    from crud import user
+    from db.session import async_engine
+    from jobs.scheduler import create_scheduler
+    from schemas import UserCreate
+
+    # A scheduler is bound to the event loop it was started on, every client runs the app on a new one
+    monkeypatch.setattr(main, "scheduler", create_scheduler())
+    account = user.create(db, UserCreate(email="tester@example.com", password="Passw0rdTest"))
+
+    with TestClient(main.app) as test_client:
+        test_client.headers["Authorization"] = "Bearer {}".format(create_token(account.id, 60))
+        yield test_client
+
+    # The async connections belong to the client's event loop, which is gone
+    asyncio.run(async_engine.dispose())
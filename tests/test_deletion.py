@@ -0,0 +1,93 @@
+import datetime
+
+import pytest
+
+from core.config import settings
+from jobs.background_tasks import run_deletion_tasks
+from models import Dataset, DatasetCatalog, DeletionTask, Eto, Location, WaterBalance
+from utils.deletion import DELETION_DATASET, DELETION_DONE, DELETION_RUNNING
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "BULK_DELETE_BACKGROUND_ROWS", 5)
+    monkeypatch.setattr(settings, "BULK_DELETE_CHUNK_ROWS", 3)
+
+
+def _readings(dataset_id: str, n: int):
+    return [
+        {"dataset_id": dataset_id, "date": (datetime.datetime(2024, 5, 1) + datetime.timedelta(days=i)).isoformat(),
+         "soil_moisture_10": 20, "rain": 0, "temperature": 20, "humidity": 50}
+        for i in range(n)
+    ]
+
+
+def test_small_dataset_is_deleted_within_the_request(client, db):
+    client.post("/api/v1/dataset/", json=_readings("small", 4))
+
+    assert client.delete("/api/v1/dataset/small/").status_code == 200
+    assert db.query(Dataset).count() == 0
+
+
+def test_large_dataset_is_deleted_in_chunks(client, db):
+    client.post("/api/v1/dataset/", json=_readings("big", 11) + _readings("kept", 2))
+
+    response = client.delete("/api/v1/dataset/big/")
+    assert response.status_code == 202
+
+    # The TestClient runs the background task before returning
+    task = client.get("/api/v1/dataset/deletions/{}/".format(response.json()["id"])).json()
+    assert (task["status"], task["total_rows"], task["deleted_rows"]) == (DELETION_DONE, 11, 11)
+    assert [dataset_id for (dataset_id,) in db.query(Dataset.dataset_id).distinct()] == ["kept"]
+    assert db.get(DatasetCatalog, "big") is None
+
+
+def test_large_location_is_deleted_with_its_eto(client, db):
+    location = Location(latitude=44.0, longitude=20.0)
+    db.add(location)
+    db.commit()
+    db.add_all([
+        Eto(date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i), value=1.0, location_id=location.id)
+        for i in range(12)
+    ])
+    db.add(WaterBalance(
+        location_id=location.id, date=datetime.date(2024, 1, 1), kc=1, ks=1, depletion_mm=0, taw_mm=1, raw_mm=1,
+        irrigation_mm=0
+    ))
+    db.commit()
+
+    response = client.delete("/api/v1/location/{}/".format(location.id))
+    assert response.status_code == 202
+
+    task = client.get("/api/v1/location/deletions/{}/".format(response.json()["id"])).json()
+    assert (task["status"], task["deleted_rows"]) == (DELETION_DONE, 12)
+    db.expire_all()
+    assert (db.query(Location).count(), db.query(Eto).count(), db.query(WaterBalance).count()) == (0, 0, 0)
+
+
+def test_stopped_deletion_is_resumed(db):
+    db.add_all([
+        Dataset(dataset_id="big", date=datetime.date(2024, 5, 1) + datetime.timedelta(days=i), rain=0,
+                temperature=20, humidity=50)
+        for i in range(7)
+    ])
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    # A worker deleted a chunk and stopped, and another one is still working on its task
+    stopped = DeletionTask(
+        kind=DELETION_DATASET, target="big", status=DELETION_RUNNING, total_rows=10, deleted_rows=3,
+        created_at=now, updated_at=now - datetime.timedelta(seconds=settings.DELETION_TASK_STALE_S + 1)
+    )
+    active = DeletionTask(
+        kind=DELETION_DATASET, target="other", status=DELETION_RUNNING, total_rows=10, deleted_rows=3,
+        created_at=now, updated_at=now
+    )
+    db.add_all([stopped, active])
+    db.commit()
+
+    assert run_deletion_tasks()
+    assert not run_deletion_tasks()
+
+    db.expire_all()
+    assert (stopped.status, stopped.deleted_rows) == (DELETION_DONE, 10)
+    assert active.status == DELETION_RUNNING
+    assert db.query(Dataset).count() == 0
@@ -0,0 +1,157 @@
+import datetime
+
+import pytest
+from sqlalchemy import func
+
+import crud
+from core.config import settings
+from db.session import SessionLocal
+from jobs import background_tasks
+from jobs.background_tasks import resume_weather_data
+from jobs.scheduler import run_job
+from models import Eto, EtoJobChunk, JobRun, Location
+from schemas import EToInputData
+from utils.grid import grid_cell_key
+from utils.job_runs import CHUNK_DONE, CHUNK_FAILED, CHUNK_PENDING, CHUNK_RUNNING, JOB_FAILED, JOB_SUCCEEDED
+
+WEATHER = EToInputData(t_min=12, t_max=26, t_mean=19, rh_mean=60, u_z=2.5, p=101.3, sea_level=1013)
+
+
+class Crash(BaseException):
+    """
+    The process dying midway, nothing catches it.
+    """
+
+
+@pytest.fixture
+def cells(db, monkeypatch):
+    monkeypatch.setattr(settings, "ETO_JOB_CHUNK_CELLS", 2)
+
+    # Six locations in six weather grid cells, three chunks
+    for i in range(6):
+        latitude, longitude = 44 + i * 0.5, 20.0
+        db.add(Location(latitude=latitude, longitude=longitude, elevation=100,
+                        grid_cell=grid_cell_key(latitude, longitude)))
+    db.commit()
+
+    return sorted({location.grid_cell for location in db.query(Location)})
+
+
+@pytest.fixture
+def weather(monkeypatch):
+    """
+    Cells whose fetch fails, or crashes the process.
+    """
+
+    outage = {"failing": set(), "crashing": set()}
+
+    def fetch(cell, date):
+        if cell in outage["crashing"]:
+            raise Crash()
+        return None if cell in outage["failing"] else (WEATHER, 0.0, 100.0)
+
+    monkeypatch.setattr(background_tasks, "_fetch_cell_weather", fetch)
+    return outage
+
+
+def _eto_per_location(db):
+    db.expire_all()
+    return dict(db.query(Eto.location_id, func.count()).group_by(Eto.location_id).all())
+
+
+def _chunks(db):
+    return [(chunk.chunk, chunk.status) for chunk in db.query(EtoJobChunk).order_by(EtoJobChunk.chunk)]
+
+
+def test_failed_locations_are_resumed(db, cells, weather):
+    weather["failing"].add(cells[2])
+    run_job("get_weather_data")
+
+    run = db.query(JobRun).one()
+    assert run.status == JOB_FAILED
+    assert _chunks(db) == [(0, CHUNK_DONE), (1, CHUNK_FAILED), (2, CHUNK_DONE)]
+    assert len(_eto_per_location(db)) == 5
+
+    weather["failing"].clear()
+    resume_weather_data(run.id)
+
+    db.expire_all()
+    assert run.status == JOB_SUCCEEDED
+    assert _chunks(db) == [(0, CHUNK_DONE), (1, CHUNK_DONE), (2, CHUNK_DONE)]
+    # Only the failed location was computed again
+    assert set(_eto_per_location(db).values()) == {1} and len(_eto_per_location(db)) == 6
+    assert db.query(EtoJobChunk).filter(EtoJobChunk.chunk == 1).one().attempts == 2
+
+
+def test_interrupted_run_keeps_its_finished_chunks(db, cells, weather):
+    weather["crashing"].add(cells[3])
+    with pytest.raises(Crash):
+        run_job("get_weather_data")
+
+    # The rows of a chunk are stored with its checkpoint, the first cell of the interrupted one is not
+    assert _chunks(db) == [(0, CHUNK_DONE), (1, CHUNK_RUNNING), (2, CHUNK_PENDING)]
+    assert len(_eto_per_location(db)) == 2
+
+    weather["crashing"].clear()
+    run_id = db.query(JobRun).one().id
+    # The chunk the crash interrupted is only claimed again once its claim is stale
+    resume_weather_data(run_id)
+    assert _chunks(db) == [(0, CHUNK_DONE), (1, CHUNK_RUNNING), (2, CHUNK_DONE)]
+
+    interrupted = db.query(EtoJobChunk).filter(EtoJobChunk.chunk == 1).one()
+    interrupted.started_at -= datetime.timedelta(seconds=settings.ETO_JOB_CHUNK_STALE_S + 1)
+    db.commit()
+    resume_weather_data(run_id)
+
+    assert _chunks(db) == [(0, CHUNK_DONE), (1, CHUNK_DONE), (2, CHUNK_DONE)]
+    assert _eto_per_location(db) == {location.id: 1 for location in db.query(Location)}
+
+
+def test_chunk_is_computed_by_one_runner(db, cells, weather, monkeypatch):
+    fetch = background_tasks._fetch_cell_weather
+    resumed = []
+
+    def fetch_and_resume(cell, date):
+        # A resume of the run starts while the run computes its first chunk
+        if not resumed:
+            resumed.append(cell)
+            with SessionLocal() as session:
+                run_id = session.query(JobRun).one().id
+            resume_weather_data(run_id)
+        return fetch(cell, date)
+
+    monkeypatch.setattr(background_tasks, "_fetch_cell_weather", fetch_and_resume)
+    run_job("get_weather_data")
+
+    assert db.query(JobRun).one().status == JOB_SUCCEEDED
+    assert _chunks(db) == [(0, CHUNK_DONE), (1, CHUNK_DONE), (2, CHUNK_DONE)]
+    # Each chunk computed once, the resume left the claimed first chunk alone
+    assert _eto_per_location(db) == {location.id: 1 for location in db.query(Location)}
+    assert {chunk.attempts for chunk in db.query(EtoJobChunk)} == {1}
+
+
+def test_stale_claim_cannot_checkpoint(db, cells, weather):
+    run_job("get_weather_data")
+    chunk = db.query(EtoJobChunk).filter(EtoJobChunk.chunk == 0).one()
+    chunk.status = CHUNK_FAILED
+    db.commit()
+
+    stopped, taking_over = SessionLocal(), SessionLocal()
+    first = stopped.get(EtoJobChunk, chunk.id)
+    first_attempt = crud.eto_job_chunk.claim(stopped, first)
+    assert first_attempt == 2
+    # Not claimable by another worker while the first claim is not stale
+    assert crud.eto_job_chunk.claim(taking_over, taking_over.get(EtoJobChunk, chunk.id)) is None
+
+    first.started_at -= datetime.timedelta(seconds=settings.ETO_JOB_CHUNK_STALE_S + 1)
+    stopped.commit()
+    second = taking_over.get(EtoJobChunk, chunk.id)
+    second_attempt = crud.eto_job_chunk.claim(taking_over, second)
+    assert second_attempt == 3
+
+    row = {"date": chunk.date, "value": 1.0, "precipitation": 0.0, "location_id": chunk.location_ids[0]}
+    assert not crud.eto_job_chunk.complete(stopped, first, first_attempt, [row], [], 1.0)
+    assert crud.eto_job_chunk.complete(taking_over, second, second_attempt, [row], [], 1.0)
+    stopped.close()
+    taking_over.close()
+    assert _eto_per_location(db)[chunk.location_ids[0]] == 2
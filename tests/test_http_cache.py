@@ -0,0 +1,77 @@
+import datetime
+import random
+
+import pytest
+
+from api.api_v1.endpoints import dataset as dataset_endpoints
+from models import Eto, Location
+
+
+def _upload(client, start: datetime.datetime, n: int) -> None:
+    random.seed(n)
+    response = client.post("/api/v1/dataset/", json=[
+        {"dataset_id": "ds", "date": (start + datetime.timedelta(hours=i)).isoformat(),
+         "soil_moisture_10": 20 + random.random() * 10, "rain": 0, "temperature": 20, "humidity": 50}
+        for i in range(n)
+    ])
+    assert response.status_code == 200
+
+
+@pytest.fixture
+def uploaded(client):
+    _upload(client, datetime.datetime(2024, 5, 1), 100)
+
+
+def _revalidate(client, path: str, **headers):
+    return client.get(path, headers={key.replace("_", "-"): value for key, value in headers.items()})
+
+
+def test_dataset_is_revalidated(client, uploaded):
+    response = client.get("/api/v1/dataset/ds/")
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    cached = _revalidate(client, "/api/v1/dataset/ds/", If_None_Match=etag)
+    assert (cached.status_code, cached.content, cached.headers["etag"]) == (304, b"", etag)
+    assert _revalidate(client, "/api/v1/dataset/ds/", If_Modified_Since=last_modified).status_code == 304
+    assert _revalidate(client, "/api/v1/dataset/ds/", If_None_Match='"other"').status_code == 200
+    # Every variant of the resource has its own tag
+    assert _revalidate(client, "/api/v1/dataset/ds/?formatting=JSON", If_None_Match=etag).status_code == 200
+
+    _upload(client, datetime.datetime(2024, 6, 1), 5)
+    assert _revalidate(client, "/api/v1/dataset/ds/", If_None_Match=etag).status_code == 200
+
+
+def test_current_analysis_is_not_computed_again(client, uploaded, monkeypatch):
+    etag = client.get("/api/v1/dataset/ds/analysis/").headers["etag"]
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("The analysis ran")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(dataset_endpoints, "calculate_soil_analysis_metrics", unexpected)
+        patch.setattr(dataset_endpoints.crud_dataset, "get_datasets", unexpected)
+        assert _revalidate(client, "/api/v1/dataset/ds/analysis/", If_None_Match=etag).status_code == 304
+
+    # Profiled requests always run the analysis
+    assert _revalidate(client, "/api/v1/dataset/ds/analysis/?profile=timings", If_None_Match=etag).status_code == 200
+
+    weights = {"10": 0.5, "20": 0.5, "30": 0, "40": 0, "50": 0, "60": 0}
+    assert client.post("/api/v1/dataset/weights/?dataset_id=ds", json=weights).status_code == 200
+    assert _revalidate(client, "/api/v1/dataset/ds/analysis/", If_None_Match=etag).status_code == 200
+
+
+def test_eto_is_revalidated(client, db):
+    location = Location(latitude=44.0, longitude=20.0, elevation=100)
+    db.add(location)
+    db.commit()
+    db.add_all([Eto(location_id=location.id, date=datetime.date(2025, 1, 1 + i), value=1 + i) for i in range(5)])
+    db.commit()
+
+    path = "/api/v1/eto/get-calculations/{}/from/2025-01-01/to/2025-01-31/".format(location.id)
+    etag = client.get(path).headers["etag"]
+    assert _revalidate(client, path, If_None_Match=etag).status_code == 304
+
+    db.add(Eto(location_id=location.id, date=datetime.date(2025, 1, 9), value=3))
+    db.commit()
+    assert _revalidate(client, path, If_None_Match=etag).status_code == 200
@@ -0,0 +1,106 @@
+import asyncio
+import datetime
+
+import pandas as pd
+import pytest
+
+from core.config import settings
+from db.session import AsyncSessionLocal
+from models import Dataset, DatasetCatalog
+from schemas import Dataset as DatasetScheme
+from utils.ingest import ingest_readings, normalize_readings_frame
+from utils.quality_control import QC_SPIKE, depth_flag
+from utils.rain import RAIN_MODE_CUMULATIVE
+from utils.soil_analysis import preprocess_dataset
+
+DAY = datetime.datetime(2024, 5, 2)
+
+
+def _readings(start: datetime.datetime, counters, step=datetime.timedelta(hours=1)) -> pd.DataFrame:
+    return normalize_readings_frame(pd.DataFrame([
+        {"dataset_id": "ds", "date": start + i * step, "rain": counter, "temperature": 20.0, "humidity": 50.0,
+         "soil_moisture_10": 25.0 + i % 3}
+        for i, counter in enumerate(counters)
+    ]))
+
+
+def _upload(run, frame: pd.DataFrame) -> int:
+    async def upload():
+        async with AsyncSessionLocal() as session:
+            return await ingest_readings(session, frame)
+
+    return run(upload())
+
+
+def _stored_rain(db) -> float:
+    return sum(increment for (increment,) in db.query(Dataset.rain_increment).all())
+
+
+def test_same_day_batches_decode_from_the_same_day_counter(db, run):
+    # The previous day ends at 3 mm, the day reaches 10 mm in the first upload and 15 mm in the second
+    _upload(run, pd.concat([
+        _readings(DAY - datetime.timedelta(hours=22), [0, 0] + [3] * 20),
+        _readings(DAY, [3] * 5 + [5] * 5 + [10] * 5),
+    ], ignore_index=True))
+    _upload(run, _readings(DAY + datetime.timedelta(hours=15), [10] * 5 + [15] * 5))
+
+    assert db.get(DatasetCatalog, "ds").rain_mode == RAIN_MODE_CUMULATIVE
+    assert _stored_rain(db) == pytest.approx(15)
+
+
+def test_rain_mode_is_saved_once_enough_rain_was_seen(db, run):
+    # A cumulative counter sent one reading per upload, 10 mm of rain
+    counters = [0, 0, 0] + [10] * 20
+    for i, counter in enumerate(counters):
+        _upload(run, _readings(DAY + datetime.timedelta(hours=i), [counter]))
+
+        rainy = sum(1 for c in counters[:i + 1] if c > 0)
+        db.expire_all()
+        expected_mode = RAIN_MODE_CUMULATIVE if rainy >= settings.RAIN_MODE_MIN_READINGS else None
+        assert db.get(DatasetCatalog, "ds").rain_mode == expected_mode
+
+    assert _stored_rain(db) == pytest.approx(10)
+
+
+def test_concurrent_uploads_decode_from_each_other(db, run):
+    _upload(run, _readings(DAY - datetime.timedelta(hours=22), [0, 0] + [3] * 20))
+
+    async def upload(frame):
+        async with AsyncSessionLocal() as session:
+            return await ingest_readings(session, frame)
+
+    async def uploads():
+        # The second upload waits for the first one, then decodes its counters from the first one's readings
+        await asyncio.gather(
+            upload(_readings(DAY, [3] * 5 + [10] * 5)), upload(_readings(DAY + datetime.timedelta(hours=10), [15] * 5))
+        )
+
+    run(uploads())
+    assert _stored_rain(db) == pytest.approx(15)
+
+
+def test_analysis_adds_up_the_rain_of_a_day(db, run):
+    _upload(run, pd.concat([
+        _readings(DAY - datetime.timedelta(hours=22), [0, 0] + [3] * 20),
+        _readings(DAY, [3] * 5 + [5] * 5 + [10] * 5 + [15] * 5),
+    ], ignore_index=True))
+
+    stored = [DatasetScheme(**row.__dict__) for row in db.query(Dataset).order_by(Dataset.id).all()]
+    rain = preprocess_dataset(stored)["rain"]
+
+    # One row per stored day, the last reading of the day with the rain of all of them
+    assert rain.to_dict() == pytest.approx({
+        pd.Timestamp(DAY - datetime.timedelta(days=1)): 3, pd.Timestamp(DAY): 12
+    })
+
+
+@pytest.mark.parametrize("per_upload", [4, 1])
+def test_spike_is_flagged_across_uploads(db, run, per_upload):
+    moisture = [25.0, 25.5, 45.0, 25.2]
+    frame = _readings(DAY, [0] * len(moisture)).assign(soil_moisture_10=moisture)
+    for start in range(0, len(frame), per_upload):
+        _upload(run, frame.iloc[start:start + per_upload].reset_index(drop=True))
+
+    # The 45 is the last reading of its upload when sent one at a time, the next upload flags it
+    flags = [qc_flags for (qc_flags,) in db.query(Dataset.qc_flags).order_by(Dataset.id)]
+    assert [bool(f & depth_flag(10, QC_SPIKE)) for f in flags] == [False, False, True, False]
@@ -0,0 +1,42 @@
+import datetime
+
+import pandas as pd
+
+from schemas import Dataset as DatasetScheme
+from utils.quality_control import quality_control_flags, QC_DUPLICATE_TIMESTAMP, QC_TIMESTAMP_ORDER
+from utils.soil_analysis import preprocess_dataset
+
+DAY = datetime.datetime(2024, 5, 2)
+
+
+def _frame(dates) -> pd.DataFrame:
+    return pd.DataFrame({"date": dates, "soil_moisture_10": [25.0 + i % 3 for i in range(len(dates))]})
+
+
+def test_timestamp_checks_flag_repeated_and_older_readings():
+    hours = [0, 1, 1, 3, 2, 4]
+    flags = quality_control_flags(_frame([DAY + datetime.timedelta(hours=h) for h in hours]))
+
+    assert [bool(f & QC_DUPLICATE_TIMESTAMP) for f in flags] == [False, False, True, False, False, False]
+    assert [bool(f & QC_TIMESTAMP_ORDER) for f in flags] == [False, False, False, False, True, False]
+
+
+def test_timestamp_checks_can_be_skipped():
+    flags = quality_control_flags(_frame([DAY] * 4), check_timestamps=False)
+
+    assert not any(f & (QC_DUPLICATE_TIMESTAMP | QC_TIMESTAMP_ORDER) for f in flags)
+
+
+def test_stored_days_without_qc_keep_the_last_reading_of_a_day():
+    # Readings stored before quality control ran at upload, four per day, rain as per-interval increments
+    readings = [
+        DatasetScheme(dataset_id="ds", date=DAY + datetime.timedelta(days=day), soil_moisture_10=20.0 + i,
+                      rain=rain, temperature=20.0, humidity=50.0)
+        for day, rains in enumerate([[0, 0, 0, 6], [0, 0, 0, 0], [0, 0, 0, 8]])
+        for i, rain in enumerate(rains)
+    ]
+
+    df = preprocess_dataset(readings)
+
+    assert df["soil_moisture_10"].tolist() == [23.0, 23.0, 23.0]
+    assert df["rain"].tolist() == [6, 0, 8]
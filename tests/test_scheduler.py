@@ -0,0 +1,63 @@
+import datetime
+import sys
+
+import pytest
+
+import crud
+from jobs import scheduler
+from models import JobRun, SchedulerLease
+from utils.job_runs import JOB_FAILED, JOB_SUCCEEDED
+
+
+def test_one_holder_at_a_time(db):
+    assert crud.scheduler_lease.acquire(db, "scheduler", "a", 60)
+    assert not crud.scheduler_lease.acquire(db, "scheduler", "b", 60)
+    # Renewal by the holder
+    assert crud.scheduler_lease.acquire(db, "scheduler", "a", 60)
+
+    crud.scheduler_lease.release(db, "scheduler", "a")
+    assert crud.scheduler_lease.acquire(db, "scheduler", "b", 60)
+
+
+def test_expired_lease_is_taken_over(db):
+    assert crud.scheduler_lease.acquire(db, "scheduler", "a", 60)
+    db.get(SchedulerLease, "scheduler").expires_at -= datetime.timedelta(minutes=2)
+    db.commit()
+
+    assert crud.scheduler_lease.acquire(db, "scheduler", "b", 60)
+    assert not crud.scheduler_lease.acquire(db, "scheduler", "a", 60)
+
+
+def test_clock_of_the_process_does_not_expire_a_lease(db, monkeypatch):
+    assert crud.scheduler_lease.acquire(db, "scheduler", "a", 60)
+
+    # A replica whose clock runs an hour ahead
+    ahead = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(hours=1)
+    monkeypatch.setattr(sys.modules["crud.job_run"], "_now", lambda: ahead)
+
+    assert not crud.scheduler_lease.acquire(db, "scheduler", "b", 60)
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    def fail():
+        raise RuntimeError("unreachable")
+
+    monkeypatch.setitem(scheduler.JOBS, "idle", (lambda: False, "interval", {"minutes": 5}))
+    monkeypatch.setitem(scheduler.JOBS, "busy", (lambda: None, "interval", {"minutes": 5}))
+    monkeypatch.setitem(scheduler.JOBS, "broken", (fail, "interval", {"minutes": 5}))
+
+
+def _runs(db):
+    db.expire_all()
+    return {run.job_id: run.status for run in db.query(JobRun).all()}
+
+
+def test_runs_without_work_are_not_recorded(db, jobs):
+    scheduler.run_job("idle")
+    scheduler.run_job("run_deletion_tasks")
+    assert _runs(db) == {}
+
+    scheduler.run_job("busy")
+    scheduler.run_job("broken")
+    assert _runs(db) == {"busy": JOB_SUCCEEDED, "broken": JOB_FAILED}
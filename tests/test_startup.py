@@ -0,0 +1,32 @@
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+# Median of `import main` in a fresh interpreter, benchmarks.startup measures it with the start-to-ready time
+IMPORT_BUDGET_S = float(os.environ.get("TEST_IMPORT_BUDGET_S", "3"))
+# Loaded on first use of the utils that need them, never by `import utils`
+LAZY_MODULES = ("pandas", "shapely", "openmeteo_requests")
+
+
+def _run(code: str) -> str:
+    # A fresh interpreter, nothing of the service is imported yet
+    return subprocess.run(
+        [sys.executable, "-c", code], env=dict(os.environ), cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+
+
+def test_import_of_the_service_is_within_budget():
+    seconds = statistics.median(
+        float(_run("import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"))
+        for _ in range(3)
+    )
+
+    assert seconds <= IMPORT_BUDGET_S, "import main took {:.3f}s".format(seconds)
+
+
+def test_utils_package_loads_no_heavy_dependency():
+    loaded = _run("import sys, utils; print([m for m in {} if m in sys.modules])".format(LAZY_MODULES))
+
+    assert loaded == "[]", "import utils loaded {}".format(loaded)